@@ -0,0 +1,66 @@
+"""orders_archive
+
+Revision ID: b2c4e8a1d3f7
+Revises: e37b755f52f1
+Create Date: 2026-10-16 22:05:13.482190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2c4e8a1d3f7'
+down_revision: Union[str, Sequence[str], None] = 'e37b755f52f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('orders_archive',
+    sa.Column('id', sa.BigInteger(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('stock_id', sa.Integer(), nullable=False),
+    sa.Column('side', sa.String(length=4), nullable=False),
+    sa.Column('order_type', sa.String(length=6), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('remaining_qty', sa.Integer(), nullable=False),
+    sa.Column('price', sa.Float(), nullable=True),
+    sa.Column('status', sa.String(length=9), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_orders_archive_user_created', 'orders_archive', ['user_id', 'created_at'], unique=False)
+    op.create_index('ix_orders_archive_created', 'orders_archive', ['created_at'], unique=False)
+
+    op.create_index(
+        'ix_orders_live', 'orders', ['stock_id', 'side', 'price'], unique=False,
+        postgresql_where=sa.text("status IN ('OPEN', 'PARTIAL')"),
+    )
+    op.create_index('ix_orders_user_created', 'orders', ['user_id', 'created_at'], unique=False)
+
+    # Executed trades keep order ids after their orders move to the archive
+    op.drop_constraint('executed_trades_buy_order_id_fkey', 'executed_trades', type_='foreignkey')
+    op.drop_constraint('executed_trades_sell_order_id_fkey', 'executed_trades', type_='foreignkey')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Archived orders go back first so the foreign keys can be restored
+    op.execute(
+        "INSERT INTO orders (id, user_id, stock_id, side, order_type, quantity, remaining_qty, price, status, created_at, updated_at) "
+        "SELECT id, user_id, stock_id, side, order_type, quantity, remaining_qty, price, status, created_at, updated_at "
+        "FROM orders_archive"
+    )
+    op.create_foreign_key('executed_trades_sell_order_id_fkey', 'executed_trades', 'orders', ['sell_order_id'], ['id'])
+    op.create_foreign_key('executed_trades_buy_order_id_fkey', 'executed_trades', 'orders', ['buy_order_id'], ['id'])
+    op.drop_index('ix_orders_user_created', table_name='orders')
+    op.drop_index('ix_orders_live', table_name='orders')
+    op.drop_index('ix_orders_archive_created', table_name='orders_archive')
+    op.drop_index('ix_orders_archive_user_created', table_name='orders_archive')
+    op.drop_table('orders_archive')
@@ -0,0 +1,127 @@
+"""executions_single_source
+
+Revision ID: c8e2f4a6b9d1
+Revises: b2c4e8a1d3f7
+Create Date: 2026-10-16 23:40:27.118304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8e2f4a6b9d1'
+down_revision: Union[str, Sequence[str], None] = 'b2c4e8a1d3f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Buyer and seller perspectives of executed_trades, in the old tables' shape
+# (timestamps as naive UTC like the columns they replace)
+TRANSACTIONS_SELECT = (
+    "SELECT id AS transaction_id, buyer_id AS user_id, stock_id, 'BUY' AS type, quantity, "
+    "price AS price_at_transaction, timezone('UTC', timestamp) AS timestamp "
+    "FROM executed_trades WHERE buyer_id IS NOT NULL "
+    "UNION ALL "
+    "SELECT id, seller_id, stock_id, 'SELL', quantity, price, timezone('UTC', timestamp) "
+    "FROM executed_trades WHERE seller_id IS NOT NULL"
+)
+TRADE_HISTORY_SELECT = (
+    "SELECT id, stock_id, price, quantity, timezone('UTC', timestamp) AS timestamp FROM executed_trades"
+)
+
+# A legacy row counts as already executed when an execution for the same
+# stock, price and quantity lies within a few seconds of it (the old rows took
+# the app clock, executions take the database's transaction time)
+SAME_EXECUTION = (
+    "e.stock_id = {row}.stock_id AND e.quantity = {row}.quantity AND e.price = {row}.{price} "
+    "AND e.timestamp BETWEEN ({row}.timestamp AT TIME ZONE 'UTC') - interval '5 seconds' "
+    "AND ({row}.timestamp AT TIME ZONE 'UTC') + interval '5 seconds'"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_executed_trades_buyer_ts', 'executed_trades', ['buyer_id', 'timestamp'], unique=False)
+    op.create_index('ix_executed_trades_seller_ts', 'executed_trades', ['seller_id', 'timestamp'], unique=False)
+    op.drop_index(op.f('ix_executed_trades_buyer_id'), table_name='executed_trades')
+    op.drop_index(op.f('ix_executed_trades_seller_id'), table_name='executed_trades')
+
+    # Backfill what only the legacy tables know: trades from before the order
+    # book (one counterparty, no orders) and ticks without a transaction
+    op.execute(
+        "INSERT INTO executed_trades (stock_id, buyer_id, seller_id, price, quantity, aggressor_side, timestamp) "
+        "SELECT t.stock_id, "
+        "CASE WHEN t.type = 'BUY' THEN t.user_id END, "
+        "CASE WHEN t.type = 'SELL' THEN t.user_id END, "
+        "t.price_at_transaction, t.quantity, t.type, t.timestamp AT TIME ZONE 'UTC' "
+        "FROM transactions t "
+        "WHERE NOT EXISTS (SELECT 1 FROM executed_trades e WHERE "
+        + SAME_EXECUTION.format(row="t", price="price_at_transaction")
+        + " AND (CASE WHEN t.type = 'BUY' THEN e.buyer_id ELSE e.seller_id END) = t.user_id) "
+        "ORDER BY t.transaction_id"
+    )
+    op.execute(
+        "INSERT INTO executed_trades (stock_id, price, quantity, aggressor_side, timestamp) "
+        "SELECT h.stock_id, h.price, h.quantity, 'BUY', h.timestamp AT TIME ZONE 'UTC' "
+        "FROM trade_history h "
+        "WHERE NOT EXISTS (SELECT 1 FROM executed_trades e WHERE "
+        + SAME_EXECUTION.format(row="h", price="price")
+        + ") ORDER BY h.id"
+    )
+
+    op.drop_index(op.f('ix_trade_history_id'), table_name='trade_history')
+    op.drop_table('trade_history')
+    op.drop_table('transactions')
+
+    # Read-only stand-ins for ad-hoc SQL against the old table names
+    op.execute(f"CREATE VIEW transactions AS {TRANSACTIONS_SELECT}")
+    op.execute(f"CREATE VIEW trade_history AS {TRADE_HISTORY_SELECT}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP VIEW trade_history")
+    op.execute("DROP VIEW transactions")
+
+    op.create_table('transactions',
+    sa.Column('transaction_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('stock_id', sa.Integer(), nullable=False),
+    sa.Column('type', sa.String(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('price_at_transaction', sa.Float(), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['stock_id'], ['stocks.stock_id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('transaction_id')
+    )
+    op.create_index(op.f('ix_transactions_transaction_id'), 'transactions', ['transaction_id'], unique=False)
+    op.create_table('trade_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('stock_id', sa.Integer(), nullable=False),
+    sa.Column('price', sa.Float(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['stock_id'], ['stocks.stock_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_trade_history_id'), 'trade_history', ['id'], unique=False)
+
+    # Both sides of every execution, backfilled legacy rows included
+    op.execute(
+        "INSERT INTO transactions (user_id, stock_id, type, quantity, price_at_transaction, timestamp) "
+        f"SELECT user_id, stock_id, type, quantity, price_at_transaction, timestamp FROM ({TRANSACTIONS_SELECT}) s "
+        "ORDER BY timestamp, transaction_id"
+    )
+    op.execute(
+        "INSERT INTO trade_history (stock_id, price, quantity, timestamp) "
+        f"SELECT stock_id, price, quantity, timestamp FROM ({TRADE_HISTORY_SELECT}) s ORDER BY id"
+    )
+
+    op.create_index(op.f('ix_executed_trades_seller_id'), 'executed_trades', ['seller_id'], unique=False)
+    op.create_index(op.f('ix_executed_trades_buyer_id'), 'executed_trades', ['buyer_id'], unique=False)
+    op.drop_index('ix_executed_trades_seller_ts', table_name='executed_trades')
+    op.drop_index('ix_executed_trades_buyer_ts', table_name='executed_trades')
@@ -0,0 +1,64 @@
+"""buying_power_reservations
+
+Revision ID: d4a7c1e9f2b6
+Revises: c8e2f4a6b9d1
+Create Date: 2026-10-16 23:58:12.604417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7c1e9f2b6'
+down_revision: Union[str, Sequence[str], None] = 'c8e2f4a6b9d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+RESTING = "o.order_type = 'LIMIT' AND o.status IN ('OPEN', 'PARTIAL') AND o.remaining_qty > 0"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('reserved_cash', sa.Float(), server_default='0', nullable=False))
+    op.add_column('portfolio', sa.Column('reserved_margin', sa.Float(), server_default='0', nullable=False))
+
+    # Resting buys hold price x remaining
+    op.execute(
+        "UPDATE users u SET reserved_cash = b.total FROM ("
+        "SELECT o.user_id, SUM(o.price * o.remaining_qty) AS total FROM orders o "
+        f"WHERE o.side = 'BUY' AND {RESTING} GROUP BY o.user_id"
+        ") b WHERE u.user_id = b.user_id"
+    )
+
+    # Resting sells hold their price for every share the long position does not
+    # cover, the long covering the cheapest sells first (TradeService._sell_reserve)
+    op.execute(
+        "WITH sells AS ("
+        "SELECT o.user_id, o.stock_id, o.price, o.remaining_qty AS qty, "
+        "SUM(o.remaining_qty) OVER (PARTITION BY o.user_id, o.stock_id ORDER BY o.price, o.id) AS cum "
+        f"FROM orders o WHERE o.side = 'SELL' AND {RESTING}"
+        "), reserves AS ("
+        "SELECT s.user_id, s.stock_id, "
+        "SUM(s.price * GREATEST(0, LEAST(s.qty, s.cum - GREATEST(COALESCE(p.quantity, 0), 0)))) AS reserve "
+        "FROM sells s LEFT JOIN portfolio p ON p.user_id = s.user_id AND p.stock_id = s.stock_id "
+        "GROUP BY s.user_id, s.stock_id"
+        ") "
+        "INSERT INTO portfolio (user_id, stock_id, quantity, avg_entry_price, margin_held, reserved_margin) "
+        "SELECT user_id, stock_id, 0, 0, 0, reserve FROM reserves "
+        "ON CONFLICT (user_id, stock_id) DO UPDATE SET reserved_margin = EXCLUDED.reserved_margin"
+    )
+    op.execute(
+        "UPDATE users u SET reserved_cash = u.reserved_cash + p.total FROM ("
+        "SELECT user_id, SUM(reserved_margin) AS total FROM portfolio GROUP BY user_id"
+        ") p WHERE u.user_id = p.user_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('portfolio', 'reserved_margin')
+    op.drop_column('users', 'reserved_cash')
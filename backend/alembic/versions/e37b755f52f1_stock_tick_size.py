@@ -0,0 +1,29 @@
+"""stock_tick_size
+
+Revision ID: e37b755f52f1
+Revises: fd5c169441ea
+Create Date: 2026-10-16 09:12:41.306518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e37b755f52f1'
+down_revision: Union[str, Sequence[str], None] = 'fd5c169441ea'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('stocks', sa.Column('tick_size', sa.Float(), server_default='0.01', nullable=False))
+    op.alter_column('stocks', 'tick_size', server_default=None)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('stocks', 'tick_size')
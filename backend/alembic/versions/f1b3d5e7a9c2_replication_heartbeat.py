@@ -0,0 +1,32 @@
+"""replication_heartbeat
+
+Revision ID: f1b3d5e7a9c2
+Revises: d4a7c1e9f2b6
+Create Date: 2026-10-17 00:41:37.215904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b3d5e7a9c2'
+down_revision: Union[str, Sequence[str], None] = 'd4a7c1e9f2b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('replication_heartbeat',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('beat_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('replication_heartbeat')
@@ -5,6 +5,26 @@ from typing import Optional
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./stock_market.db"
+    # Async handlers use the same database through aiosqlite / asyncpg ("" = derived from DATABASE_URL)
+    ASYNC_DATABASE_URL: str = ""
+    # Connection pools per workload (app.core.engines); the sync and async engines of a
+    # workload each get one. Async handlers can have far more requests waiting than
+    # threads, so size api for concurrent queries, not requests.
+    DB_API_POOL_SIZE: int = 5
+    DB_API_MAX_OVERFLOW: int = 10
+    DB_BACKGROUND_POOL_SIZE: int = 2
+    DB_BACKGROUND_MAX_OVERFLOW: int = 3
+    DB_READONLY_POOL_SIZE: int = 5
+    DB_READONLY_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_S: float = 30.0  # wait for a free connection before raising
+
+    # Read replicas of DATABASE_URL for read-only routes, comma-separated ("" = none).
+    # A replica serves reads while its heartbeat is at most MAX_LAG_S old; otherwise
+    # reads go to the primary's readonly pool. Heartbeats are written and checked
+    # every CHECK_INTERVAL_S.
+    READ_REPLICA_URLS: str = ""
+    READ_REPLICA_MAX_LAG_S: float = 5.0
+    READ_REPLICA_CHECK_INTERVAL_S: float = 1.0
     
     # JWT Settings
     SECRET_KEY: str = "change-this-secret-key-in-production"
@@ -14,6 +34,28 @@ class Settings(BaseSettings):
     # CORS
     CORS_ORIGINS: str = "*"
 
+    # Matching: number of worker processes, sharded by stock_id (0 = in the API process)
+    MATCHING_WORKERS: int = 0
+
+    # Order journal for fast book recovery on restart ("" = disabled)
+    ORDER_JOURNAL_DIR: str = ""
+    ORDER_JOURNAL_SEGMENT_MB: int = 64
+    ORDER_JOURNAL_SNAPSHOT_EVERY: int = 10_000  # records per stock between snapshots
+    ORDER_JOURNAL_FSYNC: bool = False
+
+    # Group commit: queued orders for a stock share one transaction, up to MAX per
+    # commit, waiting up to WAIT_MS for more to arrive (MAX 1 = one commit per order)
+    ORDER_GROUP_COMMIT_MAX: int = 1
+    ORDER_GROUP_COMMIT_WAIT_MS: float = 0.0
+
+    # Aggregated price levels per side kept for book endpoints and book events
+    BOOK_DEPTH_LEVELS: int = 20
+
+    # Move FILLED/CANCELLED orders older than ORDER_ARCHIVE_AFTER_S to orders_archive (interval 0 = disabled)
+    ORDER_ARCHIVE_INTERVAL_S: int = 60
+    ORDER_ARCHIVE_AFTER_S: int = 3600
+    ORDER_ARCHIVE_BATCH: int = 5000
+
     # Background services (v1: legacy random market maker disabled by default)
     ENABLE_LEGACY_MARKET_MAKER: bool = False
     
@@ -39,5 +81,9 @@ class Settings(BaseSettings):
             return ["*"]
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",")]
 
+    @property
+    def read_replica_urls_list(self) -> list[str]:
+        return [url.strip() for url in self.READ_REPLICA_URLS.split(",") if url.strip()]
+
 
 settings = Settings()
\ No newline at end of file
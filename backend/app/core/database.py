@@ -1,20 +1,12 @@
-from sqlalchemy import create_engine
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from app.core.config import settings
-
-# Create engine
-if settings.DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        settings.DATABASE_URL,
-        connect_args={"check_same_thread": False}
-    )
-else:
-    engine = create_engine(
-        settings.DATABASE_URL,
-        pool_pre_ping=True,
-        pool_recycle=300,
-    )
+from sqlalchemy.orm import Session, sessionmaker
+from app.core.engines import db_engines
+from app.core.read_routing import PRIMARY, read_router
+
+# Engines for request handlers and order matching (pools: app.core.engines)
+engine = db_engines.sync_engine("api")
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(
@@ -23,6 +15,20 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+# Async engine for request handlers: waiting on the database parks a coroutine
+# instead of holding one of the threadpool's worker threads
+async_engine = db_engines.async_engine("api")
+
+# expire_on_commit off: reading an expired attribute would be implicit I/O
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# Background tasks (market maker, candles, archiver) draw from their own pool
+background_engine = db_engines.sync_engine("background")
+
 # Create Base class for models
 Base = declarative_base()
 
@@ -33,4 +39,57 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Dependency to get an async DB session (async def handlers)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Read-only sessions: a replica within READ_REPLICA_MAX_LAG_S, else the primary
+# (app.core.read_routing). Only for routes that never write and can show data
+# that many seconds old.
+def ReadSession() -> Session:
+    target = read_router.pick()
+    return Session(bind=db_engines.sync_engine(target), autoflush=False, info={"read_target": target})
+
+
+def AsyncReadSession() -> AsyncSession:
+    target = read_router.pick()
+    return AsyncSession(
+        bind=db_engines.async_engine(target),
+        autoflush=False,
+        expire_on_commit=False,
+        info={"read_target": target},
+    )
+
+
+def _replica_failed(db, error: Exception) -> None:
+    """Stop routing to a replica whose connection failed, until its next good check."""
+    target = db.info["read_target"]
+    if target != PRIMARY and isinstance(error, exc.DBAPIError):
+        read_router.observe(target, None)
+
+
+# Dependency to get a read-only DB session
+def get_read_db():
+    db = ReadSession()
+    try:
+        yield db
+    except Exception as e:
+        _replica_failed(db, e)
+        raise
+    finally:
+        db.close()
+
+
+# Dependency to get a read-only async DB session
+async def get_async_read_db():
+    async with AsyncReadSession() as db:
+        try:
+            yield db
+        except Exception as e:
+            _replica_failed(db, e)
+            raise
@@ -0,0 +1,199 @@
+"""
+EngineRegistry: One connection pool per database workload.
+
+  api         request handlers and the order sequencer's jobs
+  background  market maker, candle engine, order archiver
+  readonly    read-only queries on the primary (no replica fresh enough)
+  replica<N>  read-only queries on the Nth of READ_REPLICA_URLS (app.core.read_routing)
+
+Each workload has a sync engine and, for async handlers, an async engine
+(aiosqlite / asyncpg), created on first use. Their pools are sized by
+DB_<WORKLOAD>_POOL_SIZE and DB_<WORKLOAD>_MAX_OVERFLOW, so a process opens at
+most the sum of pool_size + max_overflow over the pools it uses. That sum,
+times the API processes and matching workers, is what has to fit in Postgres
+max_connections. Replica pools are sized like readonly and open their
+connections on the replica.
+
+Every pool is instrumented: stats() reports connections in use, idle and in
+overflow, plus cumulative checkouts, checkout wait time and timeouts. Matching
+worker processes (MATCHING_WORKERS > 0) build their own registry and pools.
+"""
+import threading
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+from app.core.config import settings
+
+WORKLOADS = ("api", "background", "readonly")
+
+
+def replica_names() -> list[str]:
+    """Workload names of the configured read replicas, in READ_REPLICA_URLS order."""
+    return [f"replica{i}" for i in range(len(settings.read_replica_urls_list))]
+
+
+def async_database_url(url: str) -> str:
+    """The same database through its asyncio driver (aiosqlite / asyncpg)."""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    for prefix in ("postgresql+psycopg2:", "postgresql:", "postgres:"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg:" + url[len(prefix):]
+    return url
+
+
+@dataclass
+class PoolStats:
+    """Cumulative checkout counters for one pool (shared by its recreated instances)."""
+
+    checkouts: int = 0
+    timeouts: int = 0
+    wait_s_total: float = 0.0
+    wait_s_max: float = 0.0
+    peak_in_use: int = 0
+    peak_overflow: int = 0
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    def record(self, wait_s: float, in_use: int, overflow: int) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_s_total += wait_s
+            self.wait_s_max = max(self.wait_s_max, wait_s)
+            self.peak_in_use = max(self.peak_in_use, in_use)
+            self.peak_overflow = max(self.peak_overflow, overflow)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+
+def _instrumented(pool_class: type[QueuePool], stats: PoolStats) -> type[QueuePool]:
+    """A pool_class that times every checkout into stats (engine.dispose() keeps the class)."""
+
+    class InstrumentedPool(pool_class):
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                connection = super().connect()
+            except exc.TimeoutError:
+                stats.record_timeout()
+                raise
+            stats.record(time.perf_counter() - start, self.checkedout(), max(self.overflow(), 0))
+            return connection
+
+    InstrumentedPool.__name__ = f"Instrumented{pool_class.__name__}"
+    return InstrumentedPool
+
+
+class EngineRegistry:
+    """Process-wide engines keyed by workload; sync and async pools per workload."""
+
+    def __init__(self):
+        self._engines: dict[str, Engine] = {}
+        self._async_engines: dict[str, AsyncEngine] = {}
+        self._stats: dict[str, PoolStats] = {}
+        self._max_overflow: dict[str, int] = {}  # pool name -> configured max_overflow
+        self._guard = threading.Lock()
+
+    @staticmethod
+    def url(workload: str) -> str:
+        if workload in WORKLOADS:
+            return settings.DATABASE_URL
+        if workload in replica_names():
+            return settings.read_replica_urls_list[int(workload[len("replica"):])]
+        raise ValueError(f"Unknown database workload: {workload}")
+
+    @staticmethod
+    def async_url(workload: str) -> str:
+        if settings.ASYNC_DATABASE_URL and EngineRegistry.url(workload) == settings.DATABASE_URL:
+            return settings.ASYNC_DATABASE_URL
+        return async_database_url(EngineRegistry.url(workload))
+
+    def _pool_args(self, name: str, workload: str, url: str) -> dict:
+        prefix = f"DB_{workload.upper()}" if workload in WORKLOADS else "DB_READONLY"
+        self._max_overflow[name] = getattr(settings, f"{prefix}_MAX_OVERFLOW")
+        args = {
+            "pool_size": getattr(settings, f"{prefix}_POOL_SIZE"),
+            "max_overflow": getattr(settings, f"{prefix}_MAX_OVERFLOW"),
+            "pool_timeout": settings.DB_POOL_TIMEOUT_S,
+        }
+        if not url.startswith("sqlite"):
+            args.update(pool_pre_ping=True, pool_recycle=300)
+        return args
+
+    def sync_engine(self, workload: str) -> Engine:
+        engine = self._engines.get(workload)
+        if engine is None:
+            with self._guard:
+                engine = self._engines.get(workload)
+                if engine is None:
+                    url = self.url(workload)
+                    stats = self._stats.setdefault(workload, PoolStats())
+                    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+                    engine = create_engine(
+                        url,
+                        poolclass=_instrumented(QueuePool, stats),
+                        connect_args=connect_args,
+                        **self._pool_args(workload, workload, url),
+                    )
+                    self._engines[workload] = engine
+        return engine
+
+    def async_engine(self, workload: str) -> AsyncEngine:
+        engine = self._async_engines.get(workload)
+        if engine is None:
+            with self._guard:
+                engine = self._async_engines.get(workload)
+                if engine is None:
+                    url = self.async_url(workload)
+                    stats = self._stats.setdefault(f"{workload}_async", PoolStats())
+                    # A queue pool for aiosqlite too (its default opens a connection and thread per session)
+                    engine = create_async_engine(
+                        url,
+                        poolclass=_instrumented(AsyncAdaptedQueuePool, stats),
+                        **self._pool_args(f"{workload}_async", workload, url),
+                    )
+                    self._async_engines[workload] = engine
+        return engine
+
+    def stats(self) -> dict[str, dict]:
+        """Usage and checkout counters of every pool opened so far."""
+        pools: dict[str, Pool] = {name: engine.pool for name, engine in self._engines.items()}
+        pools.update((f"{name}_async", engine.pool) for name, engine in self._async_engines.items())
+        report = {}
+        for name, pool in sorted(pools.items()):
+            stats = self._stats[name]
+            report[name] = {
+                "pool_size": pool.size(),
+                "max_overflow": self._max_overflow[name],
+                "in_use": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "peak_in_use": stats.peak_in_use,
+                "peak_overflow": stats.peak_overflow,
+                "checkouts": stats.checkouts,
+                "timeouts": stats.timeouts,
+                "wait_ms_avg": round(1000 * stats.wait_s_total / stats.checkouts, 3) if stats.checkouts else 0.0,
+                "wait_ms_max": round(1000 * stats.wait_s_max, 3),
+            }
+        return report
+
+    def max_connections(self) -> int:
+        """Connections this process may open across the pools opened so far."""
+        return sum(pool["pool_size"] + pool["max_overflow"] for pool in self.stats().values())
+
+    async def dispose(self) -> None:
+        for engine in list(self._async_engines.values()):
+            await engine.dispose()
+        for engine in list(self._engines.values()):
+            engine.dispose()
+
+
+db_engines = EngineRegistry()
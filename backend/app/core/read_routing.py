@@ -0,0 +1,76 @@
+"""
+ReadRouter: Sends read-only sessions to a replica that is fresh enough.
+
+READ_REPLICA_URLS lists replicas of DATABASE_URL: streaming Postgres standbys,
+or for local testing a copy of the SQLite file. The replica monitor
+(app.services.replica_monitor) stamps a heartbeat row on the primary every
+READ_REPLICA_CHECK_INTERVAL_S and reads it back from each replica. A replica
+holds every commit made before the heartbeat it shows, so the age of that
+heartbeat bounds how stale its reads are. The age keeps growing between
+checks, so a replica that stops replaying (or a monitor that stops) ages out
+on its own.
+
+pick() only looks at that state, with no I/O on the request path. It rotates
+over the replicas whose heartbeat is at most READ_REPLICA_MAX_LAG_S old and
+falls back to the primary's readonly pool when there is none: no replicas
+configured, none checked yet, all lagging or unreachable.
+"""
+import itertools
+import threading
+from datetime import datetime
+from typing import Optional
+
+from app.core.config import settings
+from app.core.engines import replica_names
+
+PRIMARY = "readonly"
+
+
+class ReadRouter:
+    """Last heartbeat seen on each replica; picks the engine for a read session."""
+
+    def __init__(self):
+        self.replicas = replica_names()
+        self._beats: dict[str, Optional[datetime]] = {name: None for name in self.replicas}
+        self._turn = itertools.count()
+        self._guard = threading.Lock()
+
+    def observe(self, name: str, beat_at: Optional[datetime]) -> None:
+        """Record the heartbeat read from a replica (None: unreachable or not replicated yet)."""
+        with self._guard:
+            self._beats[name] = beat_at
+
+    def lag_s(self, name: str, now: Optional[datetime] = None) -> Optional[float]:
+        """Upper bound on how far the replica trails the primary, None if unknown."""
+        beat_at = self._beats.get(name)
+        if beat_at is None:
+            return None
+        return max(((now or datetime.utcnow()) - beat_at).total_seconds(), 0.0)
+
+    def fresh(self) -> list[str]:
+        now = datetime.utcnow()
+        return [
+            name
+            for name in self.replicas
+            if (lag := self.lag_s(name, now)) is not None and lag <= settings.READ_REPLICA_MAX_LAG_S
+        ]
+
+    def pick(self) -> str:
+        """Engine name for the next read session: a fresh replica, else the primary."""
+        fresh = self.fresh()
+        if not fresh:
+            return PRIMARY
+        return fresh[next(self._turn) % len(fresh)]
+
+    def status(self) -> dict[str, dict]:
+        fresh = self.fresh()
+        return {
+            name: {
+                "lag_s": None if (lag := self.lag_s(name)) is None else round(lag, 3),
+                "serving": name in fresh,
+            }
+            for name in self.replicas
+        }
+
+
+read_router = ReadRouter()
@@ -1,8 +1,12 @@
 from datetime import datetime, timedelta
 from typing import Optional
+from fastapi import HTTPException, status
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
+from app.models.user import User
 
 # Argon2 password hashing context
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
@@ -39,3 +43,42 @@ def verify_token(token: str) -> Optional[dict]:
     except JWTError:
         return None
 
+
+def credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def token_email(token: str) -> str:
+    """The email (sub) of a valid JWT."""
+    payload = verify_token(token)
+    if payload is None:
+        raise credentials_exception()
+    
+    email: str = payload.get("sub")
+    if email is None:
+        raise credentials_exception()
+    return email
+
+
+def verified_user(user: User | None) -> User:
+    if user is None:
+        raise credentials_exception()
+
+    if not user.is_verified:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Verify email first"
+        )
+    
+    return user
+
+
+async def user_from_token(token: str, db: AsyncSession) -> User:
+    """The verified user a JWT belongs to. Raises HTTPException (401 / 403)."""
+    email = token_email(token)
+    result = await db.execute(select(User).where(User.email == email))
+    return verified_user(result.scalar_one_or_none())
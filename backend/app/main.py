@@ -4,11 +4,16 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.engines import db_engines
+from app.core.read_routing import read_router
 from app.routers import auth, stocks, trades, portfolio, transactions, balance, orders, websocket
 from app.utils.init_db import init_database
 from app.services.market_maker import market_maker
 from app.services.candle_engine import candle_engine
+from app.services.order_archiver import order_archiver
+from app.services.replica_monitor import replica_monitor
 from app.services import ws_hub
+from app.services.order_sequencer import order_sequencer
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +28,14 @@ async def lifespan(app: FastAPI):
     # Initialize WebSocket hub
     await ws_hub.init_hub()
     
+    # Matching workers (in-process unless MATCHING_WORKERS > 0)
+    order_sequencer.start(
+        workers=settings.MATCHING_WORKERS,
+        journal_dir=settings.ORDER_JOURNAL_DIR,
+        group_commit_max=settings.ORDER_GROUP_COMMIT_MAX,
+        group_commit_wait_ms=settings.ORDER_GROUP_COMMIT_WAIT_MS,
+    )
+    
     # Start background tasks
     tasks = []
     
@@ -33,6 +46,16 @@ async def lifespan(app: FastAPI):
     # Candle aggregation engine
     logger.info("Starting candle engine...")
     tasks.append(asyncio.create_task(candle_engine()))
+
+    # Terminal-order archiver
+    if settings.ORDER_ARCHIVE_INTERVAL_S > 0:
+        logger.info("Starting order archiver...")
+        tasks.append(asyncio.create_task(order_archiver()))
+
+    # Replication lag of read replicas (reads stay on the primary without it)
+    if read_router.replicas:
+        logger.info("Starting replica monitor...")
+        tasks.append(asyncio.create_task(replica_monitor()))
     
     yield
     
@@ -51,6 +74,11 @@ async def lifespan(app: FastAPI):
             except asyncio.CancelledError:
                 pass
     
+    # Stop per-stock order workers
+    await order_sequencer.shutdown()
+
+    await db_engines.dispose()
+    
     logger.info("Shutdown complete")
 
 
@@ -89,6 +117,16 @@ def health_check():
     return {"status": "ok", "service": "TradeSphere API"}
 
 
+@app.get("/healthz/db")
+def db_pool_health():
+    """Connection pool usage and checkout wait per workload pool (this process), replica lag."""
+    return {
+        "max_connections": db_engines.max_connections(),
+        "pools": db_engines.stats(),
+        "read_replicas": read_router.status(),
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="localhost", port=5000)
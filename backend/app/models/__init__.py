@@ -1,20 +1,20 @@
 # SQLAlchemy models
 from app.models.user import User
 from app.models.stock import Stock
-from app.models.transaction import Transaction
 from app.models.portfolio import Portfolio
-from app.models.trade_history import TradeHistory
 from app.models.order import Order
+from app.models.order_archive import OrderArchive
 from app.models.executed_trade import ExecutedTrade
 from app.models.candle import Candle
+from app.models.replication_heartbeat import ReplicationHeartbeat
 
 __all__ = [
     "User",
     "Stock",
-    "Transaction",
     "Portfolio",
-    "TradeHistory",
     "Order",
+    "OrderArchive",
     "ExecutedTrade",
     "Candle",
+    "ReplicationHeartbeat",
 ]
@@ -7,7 +7,7 @@ from app.core.database import Base
 class Candle(Base):
     __tablename__ = "candles"
 
-    id = Column(BigInteger, primary_key=True, index=True)
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, index=True)  # SQLite only autoincrements INTEGER keys
     stock_id = Column(Integer, ForeignKey("stocks.stock_id"), nullable=False, index=True)
     resolution = Column(String(3), nullable=False)  # 1m | 5m | 1h
     open_time = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -8,14 +8,15 @@ from app.core.database import Base
 class ExecutedTrade(Base):
     __tablename__ = "executed_trades"
 
-    id = Column(BigInteger, primary_key=True, index=True)
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, index=True)  # SQLite only autoincrements INTEGER keys
     stock_id = Column(Integer, ForeignKey("stocks.stock_id"), nullable=False, index=True)
 
-    buy_order_id = Column(BigInteger, ForeignKey("orders.id"), nullable=True)
-    sell_order_id = Column(BigInteger, ForeignKey("orders.id"), nullable=True)
+    # No FK: terminal orders move to orders_archive, so these point into either table
+    buy_order_id = Column(BigInteger, nullable=True)
+    sell_order_id = Column(BigInteger, nullable=True)
 
-    buyer_id = Column(Integer, ForeignKey("users.user_id"), nullable=True, index=True)
-    seller_id = Column(Integer, ForeignKey("users.user_id"), nullable=True, index=True)
+    buyer_id = Column(Integer, ForeignKey("users.user_id"), nullable=True)
+    seller_id = Column(Integer, ForeignKey("users.user_id"), nullable=True)
 
     price = Column(Float, nullable=False)
     quantity = Column(Integer, nullable=False)
@@ -29,3 +30,6 @@ class ExecutedTrade(Base):
 
 
 Index("ix_executed_trades_stock_ts", ExecutedTrade.stock_id, ExecutedTrade.timestamp)
+# Per-user history (/transactions) reads each side newest-first
+Index("ix_executed_trades_buyer_ts", ExecutedTrade.buyer_id, ExecutedTrade.timestamp)
+Index("ix_executed_trades_seller_ts", ExecutedTrade.seller_id, ExecutedTrade.timestamp)
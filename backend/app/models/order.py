@@ -8,7 +8,7 @@ from app.core.database import Base
 class Order(Base):
     __tablename__ = "orders"
 
-    id = Column(BigInteger, primary_key=True, index=True)
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, index=True)  # SQLite only autoincrements INTEGER keys
     user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False, index=True)
     stock_id = Column(Integer, ForeignKey("stocks.stock_id"), nullable=False, index=True)
 
@@ -28,3 +28,13 @@ class Order(Base):
 
 
 Index("ix_orders_match", Order.stock_id, Order.side, Order.price, Order.created_at)
+# Partial index over live orders only; used when a book is (re)loaded
+Index(
+    "ix_orders_live",
+    Order.stock_id,
+    Order.side,
+    Order.price,
+    postgresql_where=Order.status.in_(("OPEN", "PARTIAL")),
+    sqlite_where=Order.status.in_(("OPEN", "PARTIAL")),
+)
+Index("ix_orders_user_created", Order.user_id, Order.created_at)
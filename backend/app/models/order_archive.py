@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Index
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class OrderArchive(Base):
+    """
+    Terminal (FILLED / CANCELLED) orders moved out of `orders` by the archiver.
+
+    Same columns and ids as `orders`, so rows can be read through OrderResponse
+    either way. No foreign keys: archived rows are history and are never joined
+    back for matching.
+    """
+
+    __tablename__ = "orders_archive"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=False)
+    user_id = Column(Integer, nullable=False)
+    stock_id = Column(Integer, nullable=False)
+
+    side = Column(String(4), nullable=False)  # BUY | SELL
+    order_type = Column(String(6), nullable=False)  # MARKET | LIMIT
+
+    quantity = Column(Integer, nullable=False)
+    remaining_qty = Column(Integer, nullable=False)
+    price = Column(Float, nullable=True)
+    status = Column(String(9), nullable=False)  # FILLED | CANCELLED
+
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+Index("ix_orders_archive_user_created", OrderArchive.user_id, OrderArchive.created_at)
+Index("ix_orders_archive_created", OrderArchive.created_at)
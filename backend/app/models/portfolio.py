@@ -11,6 +11,8 @@ class Portfolio(Base):
     quantity = Column(Integer, default=0, nullable=False)
     avg_entry_price = Column(Float, default=0.0, nullable=False)
     margin_held = Column(Float, default=0.0, nullable=False)
+    # Short margin held for this user's resting sells on the stock (part of users.reserved_cash)
+    reserved_margin = Column(Float, default=0.0, nullable=False)
     
     __table_args__ = (
         PrimaryKeyConstraint('user_id', 'stock_id'),
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, DateTime, Integer
+
+from app.core.database import Base
+
+
+class ReplicationHeartbeat(Base):
+    """
+    One row the replica monitor rewrites on the primary every check interval.
+
+    Reading it back from a replica tells how far that replica's replay has
+    got (app.core.read_routing).
+    """
+
+    __tablename__ = "replication_heartbeat"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    beat_at = Column(DateTime, nullable=False)  # naive UTC, written by the primary
@@ -14,8 +14,9 @@ class Stock(Base):
     last_traded_price = Column(Float, nullable=True)
     bid_price = Column(Float, nullable=True)
     ask_price = Column(Float, nullable=True)
+    # Minimum price increment; the order book keys prices in whole ticks
+    tick_size = Column(Float, nullable=False, default=0.01)
     
     # Relationships
-    transactions = relationship("Transaction", back_populates="stock")
     portfolio_items = relationship("Portfolio", back_populates="stock")
 
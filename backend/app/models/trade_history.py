@@ -1,16 +0,0 @@
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
-from app.core.database import Base
-from datetime import datetime
-
-class TradeHistory(Base):
-    __tablename__ = "trade_history"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    stock_id = Column(Integer, ForeignKey("stocks.stock_id"), nullable=False)
-    price = Column(Float, nullable=False)
-    quantity = Column(Integer, nullable=False)
-    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
-    
-    # Relationships
-    stock = relationship("Stock", backref="trade_history")
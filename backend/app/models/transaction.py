@@ -1,21 +0,0 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
-from app.core.database import Base
-from datetime import datetime
-
-
-class Transaction(Base):
-    __tablename__ = "transactions"
-    
-    transaction_id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
-    stock_id = Column(Integer, ForeignKey("stocks.stock_id"), nullable=False)
-    type = Column(String, nullable=False)  # 'BUY' or 'SELL'
-    quantity = Column(Integer, nullable=False)
-    price_at_transaction = Column(Float, nullable=False)
-    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
-    
-    # Relationships
-    user = relationship("User", back_populates="transactions")
-    stock = relationship("Stock", back_populates="transactions")
-
@@ -1,54 +1,172 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from datetime import datetime
 
-from app.core.database import get_db
-from app.routers.auth import get_current_user
+from app.core.database import get_async_db
+from app.routers.auth import get_current_user_async
 from app.models.user import User
 from app.models.order import Order
-from app.schemas.order import OrderRequest, OrderResponse, PlaceOrderResult
-from app.services.trade_service import TradeService
-from app.routers.websocket import emit_price_update, emit_trade_tick, emit_book_snapshot
+from app.models.order_archive import OrderArchive
+from app.schemas.order import (
+    OrderRequest,
+    OrderResponse,
+    OrderAmendRequest,
+    PlaceOrderResult,
+    OrderBatchRequest,
+    OrderBatchResponse,
+)
+from app.services.order_sequencer import (
+    order_sequencer,
+    place_order_job,
+    place_order_batch_job,
+    cancel_order_job,
+    amend_order_job,
+)
+from app.routers.websocket import (
+    emit_price_update,
+    emit_trade_tick,
+    emit_order_update,
+    emit_fill,
+    emit_balance_update,
+)
 
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
 
 @router.post("", response_model=PlaceOrderResult, status_code=status.HTTP_201_CREATED)
-def place_order(
+async def place_order(
     req: OrderRequest,
     background_tasks: BackgroundTasks,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Place a new BUY or SELL order (MARKET or LIMIT type)."""
     if req.order_type == "LIMIT" and req.price is None:
         raise HTTPException(status_code=400, detail="LIMIT orders require price")
 
-    incoming, fills, user = TradeService.place_order(
-        db=db,
-        user_id=current_user.user_id,
-        stock_id=req.stock_id,
-        side=req.side,
-        order_type=req.order_type,
-        quantity=req.quantity,
-        price=req.price,
+    # Hand the connection back before queueing: the sequencer job uses its own session
+    await db.close()
+    result = await order_sequencer.submit(
+        req.stock_id,
+        place_order_job,
+        current_user.user_id,
+        req.stock_id,
+        req.side,
+        req.order_type,
+        req.quantity,
+        req.price,
     )
+    _schedule_fill_events(background_tasks, req.stock_id, result["fills"])
+    _schedule_account_events(background_tasks, current_user.user_id, result)
+    return _place_order_result(req, result)
 
+
+@router.post("/batch", response_model=OrderBatchResponse)
+async def place_order_batch(
+    req: OrderBatchRequest,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Place up to 100 orders in one call.
+
+    Orders are grouped by stock and each group runs as one transaction on that
+    stock's sequencer worker. Results come back in request order; a rejected
+    order only fails its own slot. Market events are emitted once per stock.
+    """
+    results: list[dict | None] = [None] * len(req.orders)
+    by_stock: dict[int, list[int]] = {}
+    for index, order in enumerate(req.orders):
+        if order.order_type == "LIMIT" and order.price is None:
+            results[index] = {"status_code": 400, "detail": "LIMIT orders require price"}
+            continue
+        by_stock.setdefault(order.stock_id, []).append(index)
+
+    await db.close()
+    outcomes = await asyncio.gather(
+        *(
+            order_sequencer.submit(
+                stock_id,
+                place_order_batch_job,
+                stock_id,
+                [
+                    {
+                        "user_id": current_user.user_id,
+                        "side": req.orders[i].side,
+                        "order_type": req.orders[i].order_type,
+                        "quantity": req.orders[i].quantity,
+                        "price": req.orders[i].price,
+                    }
+                    for i in indices
+                ],
+            )
+            for stock_id, indices in by_stock.items()
+        ),
+        return_exceptions=True,
+    )
+
+    for (stock_id, indices), outcome in zip(by_stock.items(), outcomes):
+        if isinstance(outcome, HTTPException):
+            for i in indices:
+                results[i] = {"status_code": outcome.status_code, "detail": outcome.detail}
+            continue
+        if isinstance(outcome, BaseException):
+            raise outcome
+
+        placed = False
+        stock_fills = []
+        for i, item in zip(indices, outcome):
+            if "detail" in item:
+                results[i] = item
+                continue
+            results[i] = {"status_code": status.HTTP_201_CREATED, "result": _place_order_result(req.orders[i], item)}
+            stock_fills.extend(item["fills"])
+            _schedule_account_events(background_tasks, current_user.user_id, item)
+            placed = True
+
+        if placed:
+            _schedule_fill_events(background_tasks, stock_id, stock_fills)
+
+    return {"results": results}
+
+
+def _schedule_fill_events(background_tasks: BackgroundTasks, stock_id: int, fills: list) -> None:
     for fill in fills:
         background_tasks.add_task(
             emit_trade_tick,
-            req.stock_id,
+            stock_id,
             float(fill.price),
             int(fill.quantity),
             fill.aggressor_side,
         )
 
-    background_tasks.add_task(emit_price_update, req.stock_id)
-    background_tasks.add_task(emit_book_snapshot, req.stock_id)
+    background_tasks.add_task(emit_price_update, stock_id)
+
+
+def _schedule_account_events(background_tasks: BackgroundTasks, user_id: int, result: dict) -> None:
+    """Private events of one order job: the order's update, both sides of each fill, changed balances."""
+    order = result["order"]
+    background_tasks.add_task(emit_order_update, user_id, order)
+    resting_side = "SELL" if order["side"] == "BUY" else "BUY"
+    for fill in result.get("fills", ()):
+        price, quantity = float(fill.price), int(fill.quantity)
+        background_tasks.add_task(emit_fill, user_id, order["id"], order["stock_id"], order["side"], price, quantity)
+        background_tasks.add_task(
+            emit_fill, fill.resting_user_id, fill.resting_order_id, order["stock_id"], resting_side, price, quantity
+        )
+    for account in result["accounts"]:
+        background_tasks.add_task(emit_balance_update, account)
+
+
+def _place_order_result(req: OrderRequest, result: dict) -> dict:
+    incoming = result["order"]
+    fills = result["fills"]
 
-    filled_qty = req.quantity - int(incoming.remaining_qty)
+    filled_qty = req.quantity - int(incoming["remaining_qty"])
     avg_fill = None
     if fills:
         notional = sum(f.price * f.quantity for f in fills)
@@ -60,70 +178,91 @@ def place_order(
         "fills": len(fills),
         "filled_qty": filled_qty,
         "avg_fill_price": avg_fill,
-        "new_balance": float(user.balance),
-        "available_cash": float(user.available_cash),
+        "new_balance": result["new_balance"],
+        "available_cash": result["available_cash"],
     }
 
 
 @router.get("", response_model=List[OrderResponse])
-def get_user_orders(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+async def get_user_orders(
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Get all orders for the current user (open, partial, and recent fills)."""
-    orders = (
-        db.query(Order)
-        .filter(Order.user_id == current_user.user_id)
-        .order_by(Order.created_at.desc())
-        .limit(100)  # Last 100 orders
-        .all()
-    )
-    return [OrderResponse.model_validate(o) for o in orders]
+    # Last 100 across the live table and the archive
+    orders = []
+    for model in (Order, OrderArchive):
+        result = await db.execute(
+            select(model)
+            .where(model.user_id == current_user.user_id)
+            .order_by(model.created_at.desc())
+            .limit(100)
+        )
+        orders.extend(result.scalars())
+    orders.sort(key=lambda o: (o.created_at, o.id), reverse=True)
+    return [OrderResponse.model_validate(o) for o in orders[:100]]
 
 
 @router.get("/{order_id}", response_model=OrderResponse)
-def get_order(
+async def get_order(
     order_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Get details of a specific order."""
-    order = (
-        db.query(Order)
-        .filter(Order.id == order_id, Order.user_id == current_user.user_id)
-        .first()
-    )
-    if not order:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
-    return OrderResponse.model_validate(order)
+    for model in (Order, OrderArchive):
+        order = await db.scalar(
+            select(model).where(model.id == order_id, model.user_id == current_user.user_id)
+        )
+        if order:
+            return OrderResponse.model_validate(order)
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
 
 
 @router.delete("/{order_id}", status_code=status.HTTP_204_NO_CONTENT)
-def cancel_order(
+async def cancel_order(
     order_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Cancel a resting limit order. Market orders cannot be cancelled (already filled or rejected)."""
-    order = (
-        db.query(Order)
-        .filter(Order.id == order_id, Order.user_id == current_user.user_id)
-        .with_for_update()
-        .first()
+    stock_id = await _get_order_stock_id(db, current_user.user_id, order_id, "cancel")
+    await db.close()
+    result = await order_sequencer.submit(stock_id, cancel_order_job, current_user.user_id, order_id)
+    _schedule_account_events(background_tasks, current_user.user_id, result)
+    return None
+
+
+@router.patch("/{order_id}", response_model=OrderResponse)
+async def amend_order(
+    order_id: int,
+    req: OrderAmendRequest,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Reduce a resting limit order's quantity. The order keeps its queue priority."""
+    stock_id = await _get_order_stock_id(db, current_user.user_id, order_id, "amend")
+    await db.close()
+    result = await order_sequencer.submit(stock_id, amend_order_job, current_user.user_id, order_id, req.quantity)
+    _schedule_account_events(background_tasks, current_user.user_id, result)
+    return result["order"]
+
+
+async def _get_order_stock_id(db: AsyncSession, user_id: int, order_id: int, action: str) -> int:
+    stock_id = await db.scalar(
+        select(Order.stock_id).where(Order.id == order_id, Order.user_id == user_id)
     )
-    
-    if not order:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
-    
-    if order.status in ("FILLED", "CANCELLED"):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Cannot cancel order with status {order.status}",
+    if stock_id is None:
+        # Archived orders are FILLED or CANCELLED: same answer as before they were moved
+        archived_status = await db.scalar(
+            select(OrderArchive.status).where(OrderArchive.id == order_id, OrderArchive.user_id == user_id)
         )
-    
-    # If partially filled, canceling leaves the filled part as-is and cancels remaining
-    order.status = "CANCELLED"
-    order.updated_at = datetime.utcnow()
-    
-    db.commit()
-    return None
+        if archived_status is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot {action} order with status {archived_status}",
+            )
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
+    return int(stock_id)
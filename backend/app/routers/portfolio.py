@@ -1,28 +1,31 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.routers.auth import get_current_user
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_read_db
+from app.routers.auth import get_current_user_async
 from app.models.user import User
 from app.models.portfolio import Portfolio
+from app.models.stock import Stock
 from app.schemas.trade import PortfolioItem
 
 router = APIRouter(prefix="/portfolio", tags=["portfolio"])
 
 
 @router.get("", response_model=list[PortfolioItem])
-def get_portfolio(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_portfolio(
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get user's portfolio (includes long and short positions)."""
-    portfolio_items = db.query(Portfolio).filter(
-        Portfolio.user_id == current_user.user_id,
-        Portfolio.quantity != 0
-    ).all()
+    # Stock joined in the same query (no lazy loads on an async session)
+    portfolio_items = await db.execute(
+        select(Portfolio, Stock)
+        .join(Stock, Stock.stock_id == Portfolio.stock_id)
+        .where(Portfolio.user_id == current_user.user_id, Portfolio.quantity != 0)
+    )
     
     result = []
-    for item in portfolio_items:
-        stock = item.stock
+    for item, stock in portfolio_items:
         current_value = item.quantity * stock.price
         avg_entry_price = item.avg_entry_price or 0.0
         unrealised_pnl = (stock.price - avg_entry_price) * item.quantity
@@ -1,82 +1,58 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime, timedelta, timezone
 
-from app.core.database import get_db
+from app.core.database import get_async_db, get_async_read_db, get_read_db
 from app.models.stock import Stock
-from app.models.trade_history import TradeHistory
 from app.models.executed_trade import ExecutedTrade
-from app.models.order import Order
 from app.models.candle import Candle
 from app.schemas.trade import StockResponse, TradeHistoryResponse
 from app.schemas.order import BookLevel, BookSnapshot
 from app.services.candle_service import CandleService
+from app.services.execution_history import ExecutionHistory
+from app.services.book_depth import book_depth
 
 router = APIRouter(prefix="/stocks", tags=["stocks"])
 
 
 @router.get("", response_model=list[StockResponse])
-def get_stocks(db: Session = Depends(get_db)):
+async def get_stocks(db: AsyncSession = Depends(get_async_read_db)):
     """Get all stocks. Pricing is now determined by actual trades, not random fluctuations."""
-    stocks = db.query(Stock).all()
-    return stocks
+    stocks = await db.scalars(select(Stock))
+    return stocks.all()
 
 
 @router.get("/{stock_id}", response_model=StockResponse)
-def get_stock(stock_id: int, db: Session = Depends(get_db)):
+async def get_stock(stock_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a single stock by ID."""
-    stock = db.query(Stock).filter(Stock.stock_id == stock_id).first()
+    stock = await db.get(Stock, stock_id)
     if not stock:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Stock not found")
     return stock
 
 
 @router.get("/{stock_id}/book", response_model=BookSnapshot)
-def get_order_book(stock_id: int, limit: int = 5, db: Session = Depends(get_db)):
+async def get_order_book(stock_id: int, limit: int = 5, db: AsyncSession = Depends(get_async_db)):
     """
-    Get the order book (top levels) for a stock.
+    Get the order book (top aggregated price levels) for a stock.
     
-    Returns the top `limit` bid levels and ask levels.
+    Returns up to `limit` bid levels and ask levels (capped at BOOK_DEPTH_LEVELS),
+    each with the level's total quantity and order count.
     Bid side is sorted highest-first (best bid on top).
     Ask side is sorted lowest-first (best ask on top).
     """
-    stock = db.query(Stock).filter(Stock.stock_id == stock_id).first()
+    stock = await db.get(Stock, stock_id)
     if not stock:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Stock not found")
-    
-    # Fetch top bids (highest price first)
-    bids_rows = (
-        db.query(Order.price, Order.remaining_qty)
-        .filter(
-            Order.stock_id == stock_id,
-            Order.side == "BUY",
-            Order.status.in_(("OPEN", "PARTIAL")),
-            Order.remaining_qty > 0,
-        )
-        .order_by(Order.price.desc(), Order.created_at.asc())
-        .limit(limit)
-        .all()
-    )
-    
-    # Fetch top asks (lowest price first)
-    asks_rows = (
-        db.query(Order.price, Order.remaining_qty)
-        .filter(
-            Order.stock_id == stock_id,
-            Order.side == "SELL",
-            Order.status.in_(("OPEN", "PARTIAL")),
-            Order.remaining_qty > 0,
-        )
-        .order_by(Order.price.asc(), Order.created_at.asc())
-        .limit(limit)
-        .all()
-    )
-    
+
+    depth = await book_depth.get(stock_id, limit)
     return {
         "stock_id": stock_id,
-        "bids": [BookLevel(price=float(p), quantity=int(q)) for p, q in bids_rows],
-        "asks": [BookLevel(price=float(p), quantity=int(q)) for p, q in asks_rows],
+        "bids": [BookLevel(**level) for level in depth["bids"]],
+        "asks": [BookLevel(**level) for level in depth["asks"]],
     }
 
 
@@ -98,7 +74,7 @@ def get_candles(
     stock_id: int,
     resolution: str = "5m",
     limit: int = 200,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """
     Get OHLCV candles for a stock.
@@ -281,14 +257,11 @@ def get_candles(
 
 
 @router.get("/price-history/{stock_id}", response_model=list[TradeHistoryResponse])
-def get_price_history(stock_id: int, limit: int = 200, db: Session = Depends(get_db)):
+async def get_price_history(stock_id: int, limit: int = 200, db: AsyncSession = Depends(get_async_read_db)):
     """
     DEPRECATED: Use /candles endpoint instead.
     
     Get price history for a stock. Returns raw trade ticks (not aggregated into candles).
     For charting, prefer /candles which returns OHLCV data.
     """
-    history = db.query(TradeHistory).filter(
-        TradeHistory.stock_id == stock_id
-    ).order_by(TradeHistory.timestamp.asc()).limit(limit).all()
-    return history
+    return await db.run_sync(ExecutionHistory.price_ticks, stock_id, limit)
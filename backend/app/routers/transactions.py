@@ -1,38 +1,35 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.routers.auth import get_current_user
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_read_db
+from app.routers.auth import get_current_user_async
 from app.models.user import User
-from app.models.transaction import Transaction
 from app.schemas.trade import TransactionResponse
+from app.services.execution_history import ExecutionHistory
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
 
 @router.get("", response_model=list[TransactionResponse])
-def get_transactions(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+async def get_transactions(
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_read_db),
     limit: int = 50
 ):
-    """Get user's transaction history."""
-    transactions = db.query(Transaction).filter(
-        Transaction.user_id == current_user.user_id
-    ).order_by(Transaction.timestamp.desc()).limit(limit).all()
-    
+    """Get user's transaction history (their side of each executed trade)."""
+    transactions = await db.run_sync(ExecutionHistory.user_transactions, current_user.user_id, limit)
+
     result = []
     for transaction in transactions:
         result.append({
-            "transaction_id": transaction.transaction_id,
-            "user_id": transaction.user_id,
-            "stock_id": transaction.stock_id,
-            "type": transaction.type,
-            "quantity": transaction.quantity,
-            "price_at_transaction": transaction.price_at_transaction,
-            "timestamp": transaction.timestamp.isoformat(),
-            "name": transaction.stock.name,
-            "symbol": transaction.stock.symbol
+            "transaction_id": transaction["transaction_id"],
+            "user_id": transaction["user_id"],
+            "stock_id": transaction["stock_id"],
+            "type": transaction["type"],
+            "quantity": transaction["quantity"],
+            "price_at_transaction": transaction["price_at_transaction"],
+            "timestamp": transaction["timestamp"].isoformat(),
+            "name": transaction["name"],
+            "symbol": transaction["symbol"]
         })
-    
-    return result
 
+    return result
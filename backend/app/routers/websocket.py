@@ -4,131 +4,222 @@ WebSocket Router: Market event streaming endpoint.
 Clients connect to /ws/market and receive real-time:
   - price updates (stock_id, price, bid, ask)
   - trade ticks (stock_id, qty, price, aggressor_side)
-  - book snapshots (bids, asks)
+  - book deltas (aggregated bid and ask levels added, changed or removed)
+  - candle updates (stock_id, resolution, candle)
+
+Connecting with ?token=<JWT> authenticates the socket as that user. It then
+also receives the user's private events, without subscribing; no other
+socket sees them:
+  - order updates (order_id, stock_id, status, filled and remaining quantity)
+  - fills (order_id, stock_id, side, price, quantity)
+  - balance updates (balance, available_cash)
+An invalid token closes the connection with 1008 (policy violation).
+
+Market events are only sent for the topics a client subscribes to:
+
+  {"action": "subscribe", "channel": "book_delta", "stock_id": 1}
+  {"action": "subscribe", "channel": "candle_update", "stock_id": 1, "resolution": "5m"}
+  {"action": "subscribe", "channel": "price_update"}          (every stock)
+  {"action": "unsubscribe", "channel": "book_delta", "stock_id": 1}
+
+The channel is the event type; stock_id and resolution are optional filters.
+Each message is answered with a "subscribed" / "unsubscribed" message echoing
+the topic, or an "error" message with a detail (e.g. for an unknown stock_id).
+
+Order books are streamed as deltas. Every book_delta carries the stock's seq,
+one higher than the previous delta, and the changed levels:
+
+  {"type": "book_delta", "stock_id": 1, "seq": 42, "changes": [
+      {"action": "update", "side": "bid", "price": 99.5, "quantity": 300, "orders": 2},
+      {"action": "delete", "side": "ask", "price": 100.0, "quantity": 0, "orders": 0}]}
+
+Subscribing to book_delta for a stock also sends a book_snapshot of its top
+BOOK_DEPTH_LEVELS levels per side with the seq it is current to. A client
+applies the deltas with a higher seq on top of it; when a seq is skipped (the
+client fell behind and deltas were dropped) it asks for a fresh snapshot:
+
+  {"action": "snapshot", "channel": "book_delta", "stock_id": 1}
 """
 import asyncio
 import logging
 from datetime import datetime
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from typing import Optional
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from app.core.database import SessionLocal
-from app.models.order import Order
+from app.core.database import AsyncReadSession, AsyncSessionLocal, SessionLocal
+from app.core.security import user_from_token
 from app.models.stock import Stock
 from app.services import ws_hub
-from app.schemas.order import BookLevel, BookSnapshot
+from app.services.book_depth import book_depth
+from app.services.known_stocks import known_stocks
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/ws", tags=["websocket"])
 
+HEARTBEAT = ws_hub.frame({"type": "heartbeat"})
+
 
 @router.websocket("/market")
-async def market_ws(websocket: WebSocket) -> None:
+async def market_ws(websocket: WebSocket, token: Optional[str] = None) -> None:
     """
     WebSocket endpoint for market data streaming.
     
-    Connects on: ws://api/ws/market
+    Connects on: ws://api/ws/market (or ws://api/ws/market?token=<JWT>)
     
     On connect, sends initial book snapshot for all stocks.
-    Then streams events from broadcast hub:
+    Then streams the hub's events for the client's subscriptions:
       - price_update
       - trade_tick
-      - book_snapshot
+      - book_delta (plus a book_snapshot on subscribe / request)
+      - candle_update
+    and, when authenticated, the user's order_update, fill and balance_update.
     """
+    user_id = None
+    if token is not None:
+        try:
+            user_id = await _authenticate(token)
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+
     await websocket.accept()
-    client_queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+    client_queue = ws_hub.ClientBuffer(ring_size=100)
     
-    # Register client with hub
-    ws_hub.register_client(client_queue)
+    # Register client with hub (no topics until it subscribes)
+    ws_hub.register_client(client_queue, user_id=user_id)
     
     try:
         # Send initial full snapshot on connect
-        initial_snapshot = _get_full_market_snapshot()
+        initial_snapshot = await _get_full_market_snapshot()
         await websocket.send_json({
             "type": "market_snapshot",
             "data": initial_snapshot,
             "timestamp": str(datetime.utcnow().isoformat()),
         })
         
-        # Listen for events from hub
-        while True:
-            try:
-                event = await asyncio.wait_for(client_queue.get(), timeout=30.0)
-                await websocket.send_json(event)
-            except asyncio.TimeoutError:
-                await websocket.send_json({"type": "heartbeat"})
-            except WebSocketDisconnect:
-                break
+        # Stream events and read subscription messages until either side stops
+        tasks = {
+            asyncio.create_task(_send_events(websocket, client_queue)),
+            asyncio.create_task(_read_subscriptions(websocket, client_queue)),
+        }
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            task.result()
     
+    except WebSocketDisconnect:
+        pass
+
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
     
     finally:
         ws_hub.unregister_client(client_queue)
+        if client_queue.dropped:
+            logger.debug(f"WebSocket client fell behind: {client_queue.dropped} events dropped, {client_queue.conflated} conflated")
         try:
             await websocket.close()
         except Exception as close_error:
             logger.debug(f"WebSocket close ignored: {close_error}")
 
 
-def _get_full_market_snapshot() -> dict:
+async def _authenticate(token: str) -> int:
+    """The user_id of a valid token for a verified user. Raises HTTPException."""
+    async with AsyncSessionLocal() as db:
+        return (await user_from_token(token, db)).user_id
+
+
+async def _send_events(websocket: WebSocket, client_queue: ws_hub.ClientBuffer) -> None:
+    """Send queued frames (already JSON text), with a heartbeat after 30s of silence."""
+    while True:
+        # Not wait_for: before Python 3.12 it can return a frame instead of
+        # raising when cancelled at the same moment, leaving this loop running
+        get = asyncio.ensure_future(client_queue.get())
+        try:
+            done, _ = await asyncio.wait({get}, timeout=30.0)
+        finally:
+            get.cancel()
+        item = get.result() if done else HEARTBEAT
+        await websocket.send_text(item.text)
+
+
+async def _read_subscriptions(websocket: WebSocket, client_queue: ws_hub.ClientBuffer) -> None:
+    """Apply subscribe / unsubscribe / snapshot messages until the client disconnects."""
+    while True:
+        try:
+            message = await websocket.receive_json()
+        except WebSocketDisconnect:
+            return
+        except (KeyError, ValueError):  # binary frame, invalid JSON
+            message = None
+        # Replies go through the queue so that only _send_events writes to the socket
+        reply = await _apply_subscription(client_queue, message)
+        if reply["type"] != "snapshot":
+            client_queue.put_nowait(ws_hub.frame(reply))
+        # A book starts from a snapshot: on subscribe, and when the client asks after a gap
+        wants_book = reply["type"] in ("subscribed", "snapshot") and reply["channel"] == "book_delta"
+        if wants_book and reply["stock_id"] is not None:
+            client_queue.put_nowait(ws_hub.frame(await _book_snapshot(reply["stock_id"])))
+
+
+async def _apply_subscription(client_queue: ws_hub.ClientBuffer, message) -> dict:
+    """Update the client's topics from one message. Returns the reply."""
+    action = message.get("action") if isinstance(message, dict) else None
+    if action not in ("subscribe", "unsubscribe", "snapshot"):
+        return {
+            "type": "error",
+            "detail": 'Expected {"action": "subscribe" | "unsubscribe" | "snapshot", "channel", "stock_id"?, "resolution"?}',
+        }
+    try:
+        topic = ws_hub.topic(message.get("channel"), message.get("stock_id"), message.get("resolution"))
+        # A book snapshot loads the book (and starts a sequencer worker) for its stock
+        if action != "unsubscribe" and topic[1] is not None and not await known_stocks.exists(topic[1]):
+            raise ValueError(f"Unknown stock_id: {topic[1]}")
+        if action == "subscribe":
+            ws_hub.subscribe(client_queue, topic)
+        elif action == "unsubscribe":
+            ws_hub.unsubscribe(client_queue, topic)
+        elif topic[0] != "book_delta" or topic[1] is None:
+            raise ValueError("snapshot needs channel book_delta and a stock_id")
+    except ValueError as e:
+        return {"type": "error", "detail": str(e)}
+
+    channel, stock_id, resolution = topic
+    reply_type = "snapshot" if action == "snapshot" else f"{action}d"
+    return {"type": reply_type, "channel": channel, "stock_id": stock_id, "resolution": resolution}
+
+
+async def _get_full_market_snapshot() -> dict:
     """
     Get a complete snapshot of all stocks and their order books.
-    Sent to new clients on connect.
+    Sent to new clients on connect; read from a replica when one is fresh enough.
     """
-    db = SessionLocal()
-    try:
-        stocks = db.query(Stock).all()
-        snapshot = {}
-        
-        for stock in stocks:
-            snapshot[stock.symbol] = {
-                "stock_id": stock.stock_id,
-                "symbol": stock.symbol,
-                "name": stock.name,
-                "last_price": stock.last_traded_price or stock.price,
-                "bid": stock.bid_price,
-                "ask": stock.ask_price,
-                "book": _get_order_book(db, stock.stock_id),
-            }
-        
-        return snapshot
-    
-    finally:
-        db.close()
+    async with AsyncReadSession() as db:
+        stocks = (await db.scalars(select(Stock))).all()
+    snapshot = {}
 
+    for stock in stocks:
+        snapshot[stock.symbol] = {
+            "stock_id": stock.stock_id,
+            "symbol": stock.symbol,
+            "name": stock.name,
+            "last_price": stock.last_traded_price or stock.price,
+            "bid": stock.bid_price,
+            "ask": stock.ask_price,
+        }
 
-def _get_order_book(db: Session, stock_id: int, top_n: int = 5) -> dict:
-    """Get top N levels of the order book for a stock."""
-    bids = (
-        db.query(Order.price, Order.remaining_qty)
-        .filter(
-            Order.stock_id == stock_id,
-            Order.side == "BUY",
-            Order.status.in_(("OPEN", "PARTIAL")),
-            Order.remaining_qty > 0,
-        )
-        .order_by(Order.price.desc(), Order.created_at.asc())
-        .limit(top_n)
-        .all()
-    )
-    
-    asks = (
-        db.query(Order.price, Order.remaining_qty)
-        .filter(
-            Order.stock_id == stock_id,
-            Order.side == "SELL",
-            Order.status.in_(("OPEN", "PARTIAL")),
-            Order.remaining_qty > 0,
-        )
-        .order_by(Order.price.asc(), Order.created_at.asc())
-        .limit(top_n)
-        .all()
-    )
-    
-    return {
-        "bids": [{"price": float(price), "quantity": int(qty)} for price, qty in bids],
-        "asks": [{"price": float(price), "quantity": int(qty)} for price, qty in asks],
-    }
+    books = await asyncio.gather(*(_get_order_book(s["stock_id"]) for s in snapshot.values()))
+    for entry, book in zip(snapshot.values(), books):
+        entry["book"] = book
+    return snapshot
+
+
+async def _get_order_book(stock_id: int, top_n: int = 5) -> dict:
+    """Get top N aggregated price levels of the order book for a stock."""
+    return await book_depth.get(stock_id, top_n)
 
 
 async def emit_price_update(stock_id: int) -> None:
@@ -165,35 +256,66 @@ async def emit_trade_tick(stock_id: int, price: float, quantity: int, aggressor_
     await ws_hub.broadcast(event)
 
 
-async def emit_book_snapshot(stock_id: int) -> None:
-    """Broadcast an order book snapshot."""
-    db = SessionLocal()
-    try:
-        book = _get_order_book(db, stock_id, top_n=10)
-        event = {
-            "type": "book_snapshot",
-            "stock_id": stock_id,
-            "bids": book["bids"],
-            "asks": book["asks"],
-            "timestamp": str(datetime.utcnow().isoformat()),
-        }
-        await ws_hub.broadcast(event)
-    finally:
-        db.close()
+async def _book_snapshot(stock_id: int) -> dict:
+    """A book_snapshot event for one client: every cached level and the seq it is current to."""
+    await book_depth.get(stock_id)  # loads the book on first use
+    return {
+        "type": "book_snapshot",
+        "stock_id": stock_id,
+        **book_depth.snapshot(stock_id),
+        "timestamp": str(datetime.utcnow().isoformat()),
+    }
 
 
-async def emit_order_update(order: dict) -> None:
-    """Broadcast an order status update event from a detached-safe payload."""
+async def emit_book_delta(stock_id: int, delta: dict) -> None:
+    """Broadcast the levels one sequencer job changed (from book_depth.update)."""
+    event = {
+        "type": "book_delta",
+        "stock_id": stock_id,
+        "seq": delta["seq"],
+        "changes": delta["changes"],
+        "timestamp": str(datetime.utcnow().isoformat()),
+    }
+    await ws_hub.broadcast(event)
+
+
+async def emit_order_update(user_id: int, order: dict) -> None:
+    """Send an order status update (an OrderResponse dump) to the order's owner only."""
     event = {
         "type": "order_update",
-        "order_id": order["order_id"],
+        "order_id": order["id"],
         "stock_id": order["stock_id"],
         "status": order["status"],
-        "filled_qty": order["filled_qty"],
+        "filled_qty": order["quantity"] - order["remaining_qty"],
         "remaining_qty": order["remaining_qty"],
         "order_type": order["order_type"],
         "side": order["side"],
         "price": order["price"],
         "timestamp": str(datetime.utcnow().isoformat()),
     }
-    await ws_hub.broadcast(event)
+    await ws_hub.send_to_user(user_id, event)
+
+
+async def emit_fill(user_id: int, order_id: int, stock_id: int, side: str, price: float, quantity: int) -> None:
+    """Send one fill of an order to the order's owner only."""
+    event = {
+        "type": "fill",
+        "order_id": order_id,
+        "stock_id": stock_id,
+        "side": side,
+        "price": price,
+        "quantity": quantity,
+        "timestamp": str(datetime.utcnow().isoformat()),
+    }
+    await ws_hub.send_to_user(user_id, event)
+
+
+async def emit_balance_update(account: dict) -> None:
+    """Send a user's new balance and available cash to that user only."""
+    event = {
+        "type": "balance_update",
+        "balance": account["balance"],
+        "available_cash": account["available_cash"],
+        "timestamp": str(datetime.utcnow().isoformat()),
+    }
+    await ws_hub.send_to_user(account["user_id"], event)
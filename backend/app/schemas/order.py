@@ -16,6 +16,10 @@ class OrderRequest(BaseModel):
     price: Optional[float] = Field(default=None, gt=0)
 
 
+class OrderAmendRequest(BaseModel):
+    quantity: int = Field(..., gt=0)  # new total quantity; must be lower than the current one
+
+
 class OrderResponse(BaseModel):
     id: int
     stock_id: int
@@ -40,9 +44,24 @@ class PlaceOrderResult(BaseModel):
     available_cash: float
 
 
+class OrderBatchRequest(BaseModel):
+    orders: list[OrderRequest] = Field(..., min_length=1, max_length=100)
+
+
+class BatchOrderResult(BaseModel):
+    status_code: int
+    result: Optional[PlaceOrderResult] = None
+    detail: Optional[str] = None
+
+
+class OrderBatchResponse(BaseModel):
+    results: list[BatchOrderResult]
+
+
 class BookLevel(BaseModel):
     price: float
-    quantity: int
+    quantity: int  # total open quantity at this price
+    orders: int  # resting orders at this price
 
 
 class BookSnapshot(BaseModel):
@@ -22,6 +22,7 @@ class StockResponse(BaseModel):
     last_traded_price: Optional[float] = None
     bid_price: Optional[float] = None
     ask_price: Optional[float] = None
+    tick_size: float = 0.01
     
     class Config:
         from_attributes = True
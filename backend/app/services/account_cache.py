@@ -0,0 +1,148 @@
+"""
+AccountCache: In-memory balances and positions for pre-trade risk checks.
+
+An account (balance, margin_held, reserved_cash and every position) is loaded from the
+database on first use. After that it is refreshed from the settled User and
+Portfolio rows each time an order commits, so TradeService can price an
+incoming order against it without a database round trip.
+
+The cache only answers "would settlement reject this order?". Settlement
+still checks the locked rows, and TradeService confirms a rejection against a
+fresh load before returning it. A stale entry (the user settled in another
+matching process, a balance recovery) can therefore let an order through to
+settlement, but can never reject one wrongly.
+"""
+import threading
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.portfolio import Portfolio
+from app.models.user import User
+
+
+@dataclass
+class CachedPosition:
+    quantity: int = 0
+    avg_entry_price: float = 0.0
+    margin_held: float = 0.0
+    reserved_margin: float = 0.0
+
+
+@dataclass
+class Account:
+    balance: float
+    margin_held: float
+    reserved_cash: float = 0.0
+    positions: dict[int, CachedPosition] = field(default_factory=dict)  # stock_id -> position
+
+    @property
+    def available_cash(self) -> float:
+        return self.balance - self.margin_held - self.reserved_cash
+
+
+class AccountCache:
+    """Process-wide accounts keyed by user_id."""
+
+    def __init__(self):
+        self._accounts: dict[int, Account] = {}
+        self._guard = threading.Lock()
+
+    def get(self, db: Session, user_id: int) -> Optional[Account]:
+        """The cached account, loaded on a miss. None if the user does not exist."""
+        account = self._accounts.get(user_id)
+        if account is None:
+            account = self.load(db, user_id)
+        return account
+
+    def load(self, db: Session, user_id: int) -> Optional[Account]:
+        """Read the account from the database and cache it."""
+        row = (
+            db.query(User.balance, User.margin_held, User.reserved_cash).filter(User.user_id == user_id).first()
+        )
+        if row is None:
+            self.invalidate(user_id)
+            return None
+        account = Account(
+            balance=float(row.balance or 0.0),
+            margin_held=float(row.margin_held or 0.0),
+            reserved_cash=float(row.reserved_cash or 0.0),
+        )
+        for stock_id, quantity, avg_entry_price, margin_held, reserved_margin in db.query(
+            Portfolio.stock_id,
+            Portfolio.quantity,
+            Portfolio.avg_entry_price,
+            Portfolio.margin_held,
+            Portfolio.reserved_margin,
+        ).filter(Portfolio.user_id == user_id):
+            account.positions[stock_id] = CachedPosition(
+                int(quantity), float(avg_entry_price), float(margin_held), float(reserved_margin or 0.0)
+            )
+        with self._guard:
+            self._accounts[user_id] = account
+        return account
+
+    @staticmethod
+    def snapshot(stock_id: int, settled: Iterable[tuple[User, Optional[Portfolio]]]) -> list[tuple]:
+        """
+        Copy settled rows to plain values while the session still holds them.
+
+        Take it before commit (commit expires the ORM objects) and pass it to
+        store() once the commit has succeeded. A None position (a buy that only
+        reserved cash) leaves the cached position as it is.
+        """
+        return [
+            (
+                user.user_id,
+                stock_id,
+                float(user.balance or 0.0),
+                float(user.margin_held or 0.0),
+                float(user.reserved_cash or 0.0),
+                None
+                if pos is None
+                else CachedPosition(
+                    int(pos.quantity),
+                    float(pos.avg_entry_price),
+                    float(pos.margin_held),
+                    float(pos.reserved_margin or 0.0),
+                ),
+            )
+            for user, pos in settled
+        ]
+
+    @staticmethod
+    def balances(snapshot: list[tuple]) -> list[dict]:
+        """Balance and available cash of every user in a snapshot (for account events)."""
+        latest = {
+            user_id: (balance, balance - margin_held - reserved_cash)
+            for user_id, _, balance, margin_held, reserved_cash, _ in snapshot
+        }
+        return [
+            {"user_id": user_id, "balance": balance, "available_cash": available_cash}
+            for user_id, (balance, available_cash) in latest.items()
+        ]
+
+    def store(self, snapshot: list[tuple]) -> None:
+        """Apply a committed snapshot to the accounts already cached."""
+        with self._guard:
+            for user_id, stock_id, balance, margin_held, reserved_cash, position in snapshot:
+                account = self._accounts.get(user_id)
+                if account is None:
+                    continue  # loaded in full on first use instead
+                account.balance = balance
+                account.margin_held = margin_held
+                account.reserved_cash = reserved_cash
+                if position is not None:
+                    account.positions[stock_id] = position
+
+    def invalidate(self, user_id: int) -> None:
+        with self._guard:
+            self._accounts.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._guard:
+            self._accounts.clear()
+
+
+account_cache = AccountCache()
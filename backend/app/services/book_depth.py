@@ -0,0 +1,86 @@
+"""
+BookDepth: Cached aggregated order-book depth (market-by-price) per stock.
+
+Design:
+  - Levels (price, total quantity, order count) come from the in-memory book,
+    which keeps per-level totals as orders rest, fill, amend and cancel
+  - After every sequencer job the owning process (this one, or a matching
+    shard) reads the top BOOK_DEPTH_LEVELS levels and the API process caches
+    them here, so book reads never touch the `orders` table
+  - A stock with nothing cached yet is loaded once through its sequencer
+  - Each update is diffed against the cached levels: the levels added, changed
+    or removed, under a per-stock sequence number that goes up by one per
+    update that changed anything. Deltas applied in order to the snapshot of
+    the same sequence number rebuild the cached depth exactly
+"""
+import logging
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SIDES = (("bid", "bids"), ("ask", "asks"))
+
+
+def _diff(side: str, before: list[dict], after: list[dict]) -> list[dict]:
+    """Level changes that turn one side's levels into the other's."""
+    old = {level["price"]: level for level in before}
+    new = {level["price"]: level for level in after}
+    changes = []
+    for price, level in new.items():
+        previous = old.get(price)
+        if previous is None:
+            changes.append({"action": "add", "side": side, **level})
+        elif previous["quantity"] != level["quantity"] or previous["orders"] != level["orders"]:
+            changes.append({"action": "update", "side": side, **level})
+    for price in old.keys() - new.keys():
+        changes.append({"action": "delete", "side": side, "price": price, "quantity": 0, "orders": 0})
+    return changes
+
+
+class BookDepth:
+    def __init__(self):
+        self._depth: dict[int, dict] = {}
+        self._seq: dict[int, int] = {}
+
+    def update(self, stock_id: int, depth: dict) -> Optional[dict]:
+        """Cache a stock's depth. Returns the delta ({"seq", "changes"}), None if no level changed."""
+        previous = self._depth.get(stock_id, {"bids": [], "asks": []})
+        self._depth[stock_id] = depth
+        changes = [change for side, key in SIDES for change in _diff(side, previous[key], depth[key])]
+        if not changes:
+            return None
+        seq = self._seq.get(stock_id, 0) + 1
+        self._seq[stock_id] = seq
+        return {"seq": seq, "changes": changes}
+
+    def cached(self, stock_id: int, levels: int) -> Optional[dict]:
+        depth = self._depth.get(stock_id)
+        if depth is None:
+            return None
+        return {"bids": depth["bids"][:levels], "asks": depth["asks"][:levels]}
+
+    def snapshot(self, stock_id: int) -> dict:
+        """Every cached level with the sequence number of the last delta it includes."""
+        depth = self._depth.get(stock_id, {"bids": [], "asks": []})
+        return {"seq": self._seq.get(stock_id, 0), "bids": depth["bids"], "asks": depth["asks"]}
+
+    async def get(self, stock_id: int, levels: int = settings.BOOK_DEPTH_LEVELS) -> dict:
+        """Top `levels` levels per side (at most BOOK_DEPTH_LEVELS), loading the book if needed."""
+        levels = max(0, min(levels, settings.BOOK_DEPTH_LEVELS))
+        depth = self.cached(stock_id, levels)
+        if depth is None:
+            # Imported here: the sequencer imports this module to fill the cache
+            from app.services.order_sequencer import load_book_job, order_sequencer
+
+            await order_sequencer.submit(stock_id, load_book_job, stock_id)
+            depth = self.cached(stock_id, levels) or {"bids": [], "asks": []}
+        return depth
+
+    def clear(self) -> None:
+        self._depth.clear()
+        self._seq.clear()
+
+
+book_depth = BookDepth()
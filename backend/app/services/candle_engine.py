@@ -7,18 +7,16 @@ candles for all supported resolutions.
 import asyncio
 import logging
 from datetime import datetime
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from app.core.config import settings
+from app.core.database import background_engine
 from app.services import ws_hub
 from app.services.candle_service import CandleService
 from app.services.ws_hub import register_client, unregister_client
 
 logger = logging.getLogger(__name__)
 
-# Database session factory
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+# Database session factory (background pool)
+SessionLocal = sessionmaker(bind=background_engine, expire_on_commit=False)
 
 
 async def candle_engine() -> None:
@@ -32,12 +30,12 @@ async def candle_engine() -> None:
 
     logger.info("Candle engine started")
     client_queue: asyncio.Queue = asyncio.Queue(maxsize=1000)
-    register_client(client_queue)
+    register_client(client_queue, [ws_hub.topic("trade_tick")])
 
     try:
         while True:
             try:
-                event = await client_queue.get()
+                event = (await client_queue.get()).event
                 if event.get("type") != "trade_tick":
                     continue
 
@@ -92,6 +92,9 @@ class CandleService:
                 volume=trade_qty,
             )
             db.add(candle)
+            # Sessions run with autoflush off; flush so a later trade in the same
+            # transaction finds this candle instead of inserting a duplicate.
+            db.flush()
         else:
             # Update existing candle
             candle.high = max(candle.high, trade_price)
@@ -0,0 +1,79 @@
+"""
+ExecutionHistory: Read-side projections of executed_trades.
+
+executed_trades is the only table a fill writes. The per-user transaction list
+(/transactions) and the raw tick list (/stocks/price-history) are projected
+from it at read time:
+
+  - a transaction is one side of an execution: the buyer's BUY row and the
+    seller's SELL row share the execution's id, price, quantity and timestamp
+  - a price tick is the execution itself
+
+The migration that dropped the old `transactions` and `trade_history` tables
+left views of the same names with these projections for ad-hoc SQL.
+"""
+from sqlalchemy import literal, select, union_all
+from sqlalchemy.orm import Session
+
+from app.models.executed_trade import ExecutedTrade
+from app.models.stock import Stock
+
+
+class ExecutionHistory:
+    """Query adapters over executed trades."""
+
+    @staticmethod
+    def _side(user_col, side: str, user_id: int, limit: int):
+        """One user's executions on one side, newest first."""
+        return (
+            select(
+                ExecutedTrade.id.label("transaction_id"),
+                user_col.label("user_id"),
+                ExecutedTrade.stock_id,
+                literal(side).label("type"),
+                ExecutedTrade.quantity,
+                ExecutedTrade.price.label("price_at_transaction"),
+                ExecutedTrade.timestamp,
+            )
+            .where(user_col == user_id)
+            .order_by(ExecutedTrade.timestamp.desc())
+            .limit(limit)
+            .subquery()
+        )
+
+    @staticmethod
+    def user_transactions(db: Session, user_id: int, limit: int = 50) -> list[dict]:
+        """
+        The user's executions as buyer and seller, newest first.
+
+        Each side is limited on its own (buyer_id/seller_id + timestamp index)
+        before the merge, so the cost follows `limit`, not the user's history.
+        """
+        buys = ExecutionHistory._side(ExecutedTrade.buyer_id, "BUY", user_id, limit)
+        sells = ExecutionHistory._side(ExecutedTrade.seller_id, "SELL", user_id, limit)
+        both = union_all(select(buys), select(sells)).subquery()
+
+        rows = db.execute(
+            select(both, Stock.name, Stock.symbol)
+            .join(Stock, Stock.stock_id == both.c.stock_id)
+            .order_by(both.c.timestamp.desc(), both.c.transaction_id.desc())
+            .limit(limit)
+        ).mappings()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def price_ticks(db: Session, stock_id: int, limit: int = 200) -> list[dict]:
+        """Raw trade ticks for a stock, oldest first."""
+        rows = db.execute(
+            select(
+                ExecutedTrade.id,
+                ExecutedTrade.stock_id,
+                ExecutedTrade.price,
+                ExecutedTrade.quantity,
+                ExecutedTrade.timestamp,
+            )
+            .where(ExecutedTrade.stock_id == stock_id)
+            .order_by(ExecutedTrade.timestamp.asc(), ExecutedTrade.id.asc())
+            .limit(limit)
+        ).mappings()
+        return [dict(row) for row in rows]
@@ -0,0 +1,52 @@
+"""
+KnownStocks: Cached set of the stock ids that exist.
+
+Design:
+  - Per-stock state (sequencer queue and worker, in-memory book) is created on
+    first use and kept until shutdown, so a stock_id from a client is checked
+    here before anything is created for it
+  - Stocks are never deleted: ids are served from memory, and an id not seen
+    yet reloads every id from the primary, since the stock may have been added
+  - Concurrent misses share one reload, so a burst of requests for a new (or
+    unknown) id costs a single query
+"""
+import asyncio
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+
+from app.core.database import AsyncSessionLocal
+from app.models.stock import Stock
+
+
+class KnownStocks:
+    def __init__(self):
+        self._ids: frozenset[int] = frozenset()
+        self._reload: Optional[asyncio.Future] = None
+
+    async def exists(self, stock_id: int) -> bool:
+        if stock_id not in self._ids:
+            if self._reload is None:
+                self._reload = asyncio.ensure_future(self._load())
+                self._reload.add_done_callback(self._reload_done)
+            # Shielded: a cancelled caller must not cancel the others' reload
+            await asyncio.shield(self._reload)
+        return stock_id in self._ids
+
+    async def require(self, stock_id: int) -> None:
+        """Raises HTTPException 404 for a stock that does not exist."""
+        if not await self.exists(stock_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Stock not found")
+
+    async def _load(self) -> None:
+        async with AsyncSessionLocal() as db:
+            self._ids = frozenset((await db.scalars(select(Stock.stock_id))).all())
+
+    def _reload_done(self, future: asyncio.Future) -> None:
+        self._reload = None
+        if not future.cancelled():
+            future.exception()  # retrieved here; the awaiting callers raise it
+
+
+known_stocks = KnownStocks()
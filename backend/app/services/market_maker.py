@@ -17,22 +17,24 @@ import asyncio
 import random
 import logging
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine, func
+from sqlalchemy import func
 from sqlalchemy.orm import sessionmaker, Session
 
-from app.core.config import settings
+from app.core.database import background_engine
 from app.models.user import User
 from app.models.stock import Stock
 from app.models.order import Order
 from app.models.executed_trade import ExecutedTrade
 from app.services.trade_service import TradeService
+from app.services.matching_engine import order_books
+from app.services.order_sequencer import order_sequencer
+from app.services.ticks import DEFAULT_TICK_SIZE, ceil_ticks, floor_ticks, from_ticks
 from app.schemas.order import OrderRequest
 
 logger = logging.getLogger(__name__)
 
-# Database session
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine)
+# Database session (background pool)
+SessionLocal = sessionmaker(bind=background_engine)
 
 # Bot configuration
 BOT_USER_EMAIL = "bot@tradesphere.internal"
@@ -136,7 +138,7 @@ def _cancel_stale_quotes(db: Session, bot_user_id: int, stock_id: int, mid_price
         .all()
     )
     
-    cancelled = 0
+    stale: list[Order] = []
     for order in resting:
         if order.price is None:
             continue
@@ -148,10 +150,19 @@ def _cancel_stale_quotes(db: Session, bot_user_id: int, stock_id: int, mid_price
                 f"Bot: cancelling stale {order.side} order #{order.id} at {order.price} "
                 f"(mid={mid_price}, distance={distance:.2%})"
             )
+            stale.append(order)
+
+    if stale:
+        # Release holds while the orders still show their remaining quantity
+        TradeService.release_holds(db, stock_id, bot_user_id, [(order, 0) for order in stale])
+        stale_ids = [order.id for order in stale]
+        for order in stale:
             order.status = "CANCELLED"
-            cancelled += 1
-    
-    return cancelled
+        db.commit()
+        for order_id in stale_ids:
+            order_books.discard(stock_id, order_id)
+
+    return len(stale)
 
 
 def _place_bot_quotes(db: Session, bot: User, stock: Stock) -> None:
@@ -172,39 +183,28 @@ def _place_bot_quotes(db: Session, bot: User, stock: Stock) -> None:
     buy_qty = random.randint(BOT_ORDER_SIZE_MIN, BOT_ORDER_SIZE_MAX)
     sell_qty = random.randint(BOT_ORDER_SIZE_MIN, BOT_ORDER_SIZE_MAX)
     
-    # Place BUY at bid (mid - spread/2)
-    buy_price = round(mid_price * (1 - spread / 2), 2)
-    try:
-        TradeService.place_order(
-            db=db,
-            user_id=bot.user_id,
-            stock_id=stock.stock_id,
-            side="BUY",
-            order_type="LIMIT",
-            quantity=buy_qty,
-            price=buy_price,
-        )
-        logger.debug(f"Bot: placed BUY {buy_qty} @ {buy_price} for stock {stock.symbol}")
-    except Exception as e:
-        logger.error(f"Bot: failed to place BUY order: {e}")
-        db.rollback()
-    
-    # Place SELL at ask (mid + spread/2)
-    sell_price = round(mid_price * (1 + spread / 2), 2)
+    # Quotes snap outward to the stock's tick grid so they are always valid book levels
+    tick_size = stock.tick_size or DEFAULT_TICK_SIZE
+
+    # BUY at bid (mid - spread/2), SELL at ask (mid + spread/2), both in one transaction
+    buy_price = from_ticks(floor_ticks(mid_price * (1 - spread / 2), tick_size), tick_size)
+    sell_price = from_ticks(ceil_ticks(mid_price * (1 + spread / 2), tick_size), tick_size)
+    quotes = [
+        {"user_id": bot.user_id, "side": "BUY", "order_type": "LIMIT", "quantity": buy_qty, "price": buy_price},
+        {"user_id": bot.user_id, "side": "SELL", "order_type": "LIMIT", "quantity": sell_qty, "price": sell_price},
+    ]
     try:
-        TradeService.place_order(
-            db=db,
-            user_id=bot.user_id,
-            stock_id=stock.stock_id,
-            side="SELL",
-            order_type="LIMIT",
-            quantity=sell_qty,
-            price=sell_price,
-        )
-        logger.debug(f"Bot: placed SELL {sell_qty} @ {sell_price} for stock {stock.symbol}")
+        results = TradeService.place_orders(db, stock.stock_id, quotes)
     except Exception as e:
-        logger.error(f"Bot: failed to place SELL order: {e}")
+        logger.error(f"Bot: failed to place quotes: {e}")
         db.rollback()
+        return
+
+    for quote, result in zip(quotes, results):
+        if "error" in result:
+            logger.error(f"Bot: failed to place {quote['side']} order: {result['error'].detail}")
+        else:
+            logger.debug(f"Bot: placed {quote['side']} {quote['quantity']} @ {quote['price']} for stock {stock.symbol}")
 
 
 def _init_bot_user() -> int:
@@ -216,8 +216,16 @@ def _init_bot_user() -> int:
         db.close()
 
 
-def _run_market_maker_cycle(bot_user_id: int) -> None:
-    """Sync helper to run one market maker cycle in a separate thread."""
+def _list_stock_ids() -> list[int]:
+    db = SessionLocal()
+    try:
+        return [stock_id for stock_id, in db.query(Stock.stock_id).all()]
+    finally:
+        db.close()
+
+
+def _run_stock_quote_cycle(bot_user_id: int, stock_id: int) -> None:
+    """Sequencer job: refresh the bot's quotes for one stock."""
     db = SessionLocal()
     try:
         bot = db.query(User).filter(User.user_id == bot_user_id).first()
@@ -225,32 +233,42 @@ def _run_market_maker_cycle(bot_user_id: int) -> None:
             logger.error("Bot user was deleted; restarting.")
             return
 
-        stocks = db.query(Stock).all()
-        for stock in stocks:
-            try:
-                mid_price = _get_mid_price(db, stock)
-                if mid_price is None:
-                    logger.debug(f"Skipping stock {stock.symbol}: no mid price yet")
-                    continue
+        stock = db.query(Stock).filter(Stock.stock_id == stock_id).first()
+        if not stock:
+            return
 
-                cancelled = _cancel_stale_quotes(db, bot.user_id, stock.stock_id, mid_price)
-                if cancelled > 0:
-                    logger.debug(f"Bot: cancelled {cancelled} stale orders for {stock.symbol}")
+        mid_price = _get_mid_price(db, stock)
+        if mid_price is None:
+            logger.debug(f"Skipping stock {stock.symbol}: no mid price yet")
+            return
 
-                _place_bot_quotes(db, bot, stock)
+        # Cancels and new quotes must reach the in-memory book in commit order
+        with order_books.lock(stock.stock_id):
+            cancelled = _cancel_stale_quotes(db, bot.user_id, stock.stock_id, mid_price)
+            if cancelled > 0:
+                logger.debug(f"Bot: cancelled {cancelled} stale orders for {stock.symbol}")
 
-            except Exception as e:
-                logger.error(f"Market maker error for stock {stock.symbol}: {e}")
-                db.rollback()
+            _place_bot_quotes(db, bot, stock)
 
         db.commit()
     except Exception as e:
-        logger.error(f"Market maker cycle error: {e}")
+        logger.error(f"Market maker error for stock {stock_id}: {e}")
         db.rollback()
     finally:
         db.close()
 
 
+async def _run_market_maker_cycle(bot_user_id: int) -> None:
+    """Submit one quote refresh per stock to that stock's sequencer worker."""
+    try:
+        stock_ids = await asyncio.to_thread(_list_stock_ids)
+        await asyncio.gather(
+            *(order_sequencer.submit(stock_id, _run_stock_quote_cycle, bot_user_id, stock_id) for stock_id in stock_ids)
+        )
+    except Exception as e:
+        logger.error(f"Market maker cycle error: {e}")
+
+
 async def market_maker() -> None:
     """
     Background task: run the market maker bots.
@@ -270,6 +288,6 @@ async def market_maker() -> None:
         return
 
     while True:
-        await asyncio.to_thread(_run_market_maker_cycle, bot_user_id)
+        await _run_market_maker_cycle(bot_user_id)
         await asyncio.sleep(BOT_QUOTE_REFRESH_INTERVAL)
 
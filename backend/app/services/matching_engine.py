@@ -1,11 +1,20 @@
 from __future__ import annotations
 
+import logging
+import threading
 from dataclasses import dataclass
 from typing import Optional, Literal
 
+from sqlalchemy import func, update
 from sqlalchemy.orm import Session
 
 from app.models.order import Order
+from app.models.stock import Stock
+from app.services.order_book import OrderBook
+from app.services.order_journal import ACCEPT, AMEND, CANCEL, FILL, OrderJournal
+from app.services.ticks import DEFAULT_TICK_SIZE, from_ticks, to_ticks
+
+logger = logging.getLogger(__name__)
 
 
 Side = Literal["BUY", "SELL"]
@@ -13,17 +22,233 @@ Side = Literal["BUY", "SELL"]
 
 @dataclass(frozen=True)
 class Fill:
-    price: float
+    price_ticks: int
+    tick_size: float
     quantity: int
     aggressor_side: Side
     resting_order_id: int
     resting_user_id: int
 
+    @property
+    def price(self) -> float:
+        return from_ticks(self.price_ticks, self.tick_size)
+
+
+class BookRegistry:
+    """
+    Process-wide in-memory books, one per stock.
+
+    A book is loaded from the `orders` table on first use and then kept in sync
+    by the writers (place/cancel). Writers must hold lock(stock_id) from the
+    first book access until their transaction has committed, and must call
+    invalidate(stock_id) if the transaction rolls back so the book is rebuilt
+    from committed state on next access.
+
+    With a journal attached, writers also pass each committed change to
+    journal_commit() while still holding the lock. A book loaded from the DB is
+    written to the journal in full (RESET + ACCEPTs) on its first commit, so
+    the journal never depends on state it has not seen.
+    """
+
+    def __init__(self):
+        self._books: dict[int, OrderBook] = {}
+        self._locks: dict[int, threading.RLock] = {}
+        self._guard = threading.Lock()
+        self.journal: Optional[OrderJournal] = None
+        self._unjournaled: set[int] = set()
+
+    def lock(self, stock_id: int) -> threading.RLock:
+        with self._guard:
+            lock = self._locks.get(stock_id)
+            if lock is None:
+                lock = threading.RLock()
+                self._locks[stock_id] = lock
+            return lock
+
+    def get(self, db: Session, stock_id: int, exclude_order_id: Optional[int] = None) -> OrderBook:
+        book = self._books.get(stock_id)
+        if book is None:
+            book = self._load(db, stock_id, exclude_order_id)
+            self._books[stock_id] = book
+            self._unjournaled.add(stock_id)
+        return book
+
+    def best_prices(self, db: Session, stock_id: int) -> tuple[Optional[float], Optional[float]]:
+        """Top of book as float (bid, ask), read from the in-memory book."""
+        book = self.get(db, stock_id)
+        bid, ask = book.best_bid(), book.best_ask()
+        return (
+            from_ticks(bid, book.tick_size) if bid is not None else None,
+            from_ticks(ask, book.tick_size) if ask is not None else None,
+        )
+
+    def user_orders(self, db: Session, stock_id: int, user_id: int, side: Side) -> list[tuple[int, float, int]]:
+        """(order_id, price, remaining_qty) of a user's resting orders on one side."""
+        book = self.get(db, stock_id)
+        return [
+            (e.order_id, from_ticks(e.price, book.tick_size), e.remaining_qty)
+            for e in book.user_entries(user_id, side)
+        ]
+
+    def depth(self, stock_id: int, levels: int) -> Optional[dict]:
+        """Aggregated top `levels` price levels of a loaded book; None if not loaded."""
+        with self.lock(stock_id):
+            book = self._books.get(stock_id)
+            if book is None:
+                return None
+            bids, asks = book.depth(levels)
+
+        def rows(side: list[tuple[int, int, int]]) -> list[dict]:
+            return [
+                {"price": from_ticks(price, book.tick_size), "quantity": qty, "orders": count}
+                for price, qty, count in side
+            ]
+
+        return {"bids": rows(bids), "asks": rows(asks)}
+
+    def invalidate(self, stock_id: int) -> None:
+        self._books.pop(stock_id, None)
+
+    def remove(self, db: Session, stock_id: int, order_id: int) -> list[tuple]:
+        """
+        Drop a resting order ahead of its cancel commit. Returns the journal
+        records to pass to journal_commit() once committed; the caller must
+        invalidate(stock_id) if the transaction rolls back.
+        """
+        self.get(db, stock_id).remove(order_id)
+        return [(CANCEL, order_id)] if self.journal is not None else []
+
+    def discard(self, stock_id: int, order_id: int) -> None:
+        """Drop a resting order from a loaded book (after its cancel committed)."""
+        book = self._books.get(stock_id)
+        if book is not None:
+            book.remove(order_id)
+            self.journal_commit(stock_id, [(CANCEL, order_id)])
+
+    def amend(self, stock_id: int, order_id: int, remaining_qty: int) -> None:
+        """Shrink a resting order in a loaded book (after its amend committed)."""
+        book = self._books.get(stock_id)
+        if book is not None:
+            book.amend(order_id, remaining_qty)
+            self.journal_commit(stock_id, [(AMEND, order_id, remaining_qty)])
+
+    # ---- journal -------------------------------------------------------------
+
+    def order_records(self, incoming: Order, fills: list[Fill]) -> list[tuple]:
+        """Journal records for one matched order; build before commit, write after."""
+        if self.journal is None:
+            return []
+        records: list[tuple] = [(FILL, f.resting_order_id, f.quantity) for f in fills]
+        book = self._books.get(int(incoming.stock_id))
+        entry = book.orders.get(incoming.id) if book is not None else None
+        if entry is not None:
+            records.append((ACCEPT, entry.order_id, entry.user_id, 0 if entry.side == "BUY" else 1, entry.price, entry.remaining_qty))
+        return records
+
+    def journal_commit(self, stock_id: int, records: list[tuple]) -> None:
+        """Append committed changes for a stock. Caller holds lock(stock_id)."""
+        if self.journal is None:
+            return
+        book = self._books.get(stock_id)
+        if book is None:
+            return  # rebuilt from the DB (and journaled in full) on next use
+        if stock_id in self._unjournaled:
+            records = self.journal.reset_records(book)
+            self._unjournaled.discard(stock_id)
+        if not records:
+            return
+        try:
+            seq = self.journal.append(stock_id, records)
+            if self.journal.snapshot_due(stock_id):
+                self.journal.snapshot(book, seq)
+        except OSError as e:
+            # The commit already happened; rewrite this book in full next time
+            logger.error(f"Order journal write failed for stock {stock_id}: {e}")
+            self._unjournaled.add(stock_id)
+
+    def recover(self, db: Session, journal: OrderJournal) -> int:
+        """
+        Attach journal and seed books from it.
+
+        A recovered book is kept only if its order count, open quantity and id
+        checksum match the `orders` table (one grouped query); any other stock
+        falls back to a normal load on first use. Returns the books recovered.
+        """
+        self.journal = journal
+        recovered = journal.recover()
+
+        expected = {
+            stock_id: (int(count), int(qty), int(ids))
+            for stock_id, count, qty, ids in db.query(
+                Order.stock_id,
+                func.count(Order.id),
+                func.coalesce(func.sum(Order.remaining_qty), 0),
+                func.coalesce(func.sum(Order.id), 0),
+            )
+            .filter(
+                Order.status.in_(("OPEN", "PARTIAL")),
+                Order.remaining_qty > 0,
+                Order.price.isnot(None),
+            )
+            .group_by(Order.stock_id)
+        }
+
+        kept = 0
+        for stock_id, book in recovered.items():
+            entries = book.orders.values()
+            actual = (len(entries), sum(e.remaining_qty for e in entries), sum(e.order_id for e in entries))
+            if actual != expected.get(stock_id, (0, 0, 0)):
+                logger.warning(f"Journal book for stock {stock_id} does not match the orders table; reloading")
+                continue
+            with self.lock(stock_id):
+                self._books[stock_id] = book
+                self._unjournaled.discard(stock_id)
+            kept += 1
+        return kept
+
+    def close_journal(self) -> None:
+        """Snapshot every journaled book and close the journal."""
+        if self.journal is None:
+            return
+        for stock_id in list(self._books):
+            with self.lock(stock_id):
+                book = self._books.get(stock_id)
+                if book is not None and stock_id not in self._unjournaled:
+                    self.journal.snapshot(book, self.journal.next_seq - 1)
+        self.journal.close()
+        self.journal = None
+
+    @staticmethod
+    def _load(db: Session, stock_id: int, exclude_order_id: Optional[int]) -> OrderBook:
+        q = db.query(Order.id, Order.user_id, Order.side, Order.price, Order.remaining_qty).filter(
+            Order.stock_id == stock_id,
+            Order.status.in_(("OPEN", "PARTIAL")),
+            Order.remaining_qty > 0,
+            Order.price.isnot(None),
+        )
+        if exclude_order_id is not None:
+            q = q.filter(Order.id != exclude_order_id)
+
+        tick_size = db.query(Stock.tick_size).filter(Stock.stock_id == stock_id).scalar() or DEFAULT_TICK_SIZE
+        book = OrderBook(stock_id, tick_size=tick_size)
+        for order_id, user_id, side, price, remaining_qty in q.order_by(
+            Order.price.asc(), Order.created_at.asc(), Order.id.asc()
+        ):
+            book.add(order_id, user_id, side, to_ticks(price, tick_size), remaining_qty)
+        return book
+
+
+order_books = BookRegistry()
+
 
 class MatchingEngine:
     """
     Pure matching logic. Must be called inside an existing DB transaction.
-    Assumes the caller will insert/lock the incoming Order row.
+    Assumes the caller will insert the incoming Order row and holds
+    order_books.lock(incoming.stock_id) until commit.
+
+    Matching runs against the in-memory book; only the touched resting rows
+    are written back.
     """
 
     @staticmethod
@@ -38,64 +263,69 @@ class MatchingEngine:
         if incoming.order_type == "LIMIT" and (incoming.price is None or incoming.price <= 0):
             raise ValueError("LIMIT orders require price")
 
+        book = order_books.get(db, int(incoming.stock_id), exclude_order_id=incoming.id)
         opposite_side: Side = "SELL" if incoming.side == "BUY" else "BUY"
-
-        q = (
-            db.query(Order)
-            .filter(
-                Order.stock_id == incoming.stock_id,
-                Order.side == opposite_side,
-                Order.status.in_(("OPEN", "PARTIAL")),
-                Order.user_id != incoming.user_id,  # self-trade prevention
-            )
-        )
-
-        # Price-time priority
-        if incoming.side == "BUY":
-            q = q.order_by(Order.price.asc(), Order.created_at.asc())
-        else:
-            q = q.order_by(Order.price.desc(), Order.created_at.asc())
-
-        # Lock only the resting rows we may match against
-        resting_orders: list[Order] = q.with_for_update().all()
+        # Integer tick compares from here on; the float price stays on the Order row.
+        limit_ticks = to_ticks(incoming.price, book.tick_size) if incoming.order_type == "LIMIT" else None
 
         fills: list[Fill] = []
+        touched: dict[int, int] = {}  # resting order id -> remaining qty
         remaining = int(incoming.remaining_qty)
 
-        for resting in resting_orders:
+        # Price-time priority: levels best-first, FIFO within a level
+        for level in book.side(opposite_side).iter_levels():
             if remaining <= 0:
                 break
-            if resting.remaining_qty <= 0:
-                continue
-            if resting.price is None:
-                # Resting orders should always be LIMIT; skip if bad data.
-                continue
 
             # Limit price checks (incoming price is a constraint)
-            if incoming.order_type == "LIMIT":
-                if incoming.side == "BUY" and resting.price > float(incoming.price):
+            if limit_ticks is not None:
+                if incoming.side == "BUY" and level.price > limit_ticks:
                     break  # asks are sorted low->high; no further matches possible
-                if incoming.side == "SELL" and resting.price < float(incoming.price):
+                if incoming.side == "SELL" and level.price < limit_ticks:
                     break  # bids are sorted high->low; no further matches possible
 
-            fill_qty = min(remaining, int(resting.remaining_qty))
-            fill_price = float(resting.price)  # resting sets price
+            entries = level.entries
+            i = 0
+            while remaining > 0 and i < len(entries):
+                resting = entries[i]
+                if resting.remaining_qty <= 0:
+                    i += 1
+                    continue  # tombstone (cancelled or filled)
+                if resting.user_id == incoming.user_id:
+                    i += 1
+                    continue  # self-trade prevention
 
-            fills.append(
-                Fill(
-                    price=fill_price,
-                    quantity=fill_qty,
-                    aggressor_side=incoming.side,
-                    resting_order_id=int(resting.id),
-                    resting_user_id=int(resting.user_id),
+                fill_qty = min(remaining, resting.remaining_qty)
+                fills.append(
+                    Fill(
+                        price_ticks=level.price,  # resting sets price
+                        tick_size=book.tick_size,
+                        quantity=fill_qty,
+                        aggressor_side=incoming.side,
+                        resting_order_id=resting.order_id,
+                        resting_user_id=resting.user_id,
+                    )
                 )
-            )
 
-            # Update resting order state
-            resting.remaining_qty -= fill_qty
-            resting.status = "FILLED" if resting.remaining_qty == 0 else "PARTIAL"
+                book.reduce(resting, fill_qty)
+                touched[resting.order_id] = resting.remaining_qty
+                remaining -= fill_qty
+                # A filled front entry is popped, so i may already point at the next one
+                if i < len(entries) and entries[i] is resting:
+                    i += 1
 
-            remaining -= fill_qty
+        if touched:
+            db.execute(
+                update(Order),
+                [
+                    {
+                        "id": order_id,
+                        "remaining_qty": qty,
+                        "status": "FILLED" if qty == 0 else "PARTIAL",
+                    }
+                    for order_id, qty in touched.items()
+                ],
+            )
 
         incoming.remaining_qty = remaining
 
@@ -108,5 +338,44 @@ class MatchingEngine:
                 incoming.status = "CANCELLED"
             else:
                 incoming.status = "OPEN"
+                book.add(incoming.id, incoming.user_id, incoming.side, limit_ticks, remaining)
+
+        return fills
 
+    @staticmethod
+    def preview(
+        db: Session,
+        stock_id: int,
+        user_id: int,
+        side: Side,
+        order_type: str,
+        quantity: int,
+        price: Optional[float],
+    ) -> list[tuple[float, int]]:
+        """
+        The (price, qty) fills match() would produce for an order, in order,
+        without changing the book. The caller holds order_books.lock(stock_id).
+        """
+        book = order_books.get(db, stock_id)
+        limit_ticks = to_ticks(price, book.tick_size) if order_type == "LIMIT" else None
+        opposite_side: Side = "SELL" if side == "BUY" else "BUY"
+
+        fills: list[tuple[float, int]] = []
+        remaining = int(quantity)
+        for level in book.side(opposite_side).iter_levels():
+            if remaining <= 0:
+                break
+            if limit_ticks is not None:
+                if side == "BUY" and level.price > limit_ticks:
+                    break
+                if side == "SELL" and level.price < limit_ticks:
+                    break
+            for resting in level.entries:
+                if remaining <= 0:
+                    break
+                if resting.remaining_qty <= 0 or resting.user_id == user_id:
+                    continue  # tombstone / self-trade prevention, as in match()
+                fill_qty = min(remaining, resting.remaining_qty)
+                fills.append((from_ticks(level.price, book.tick_size), fill_qty))
+                remaining -= fill_qty
         return fills
@@ -0,0 +1,107 @@
+"""
+OrderArchiver: Moves terminal orders out of the hot `orders` table.
+
+FILLED and CANCELLED orders are never written again, so once they are older
+than ORDER_ARCHIVE_AFTER_S they are copied to `orders_archive` and deleted
+from `orders` in batches, one transaction per batch. `orders` then holds live
+orders plus recent history only, and every query over it stays small no matter
+how many bot quotes have come and gone. Order reads fall back to the archive,
+and cancelling or amending an archived order gets the same 400 as any other
+FILLED / CANCELLED order.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.core.database import background_engine
+from app.models.order import Order
+from app.models.order_archive import OrderArchive
+
+logger = logging.getLogger(__name__)
+
+# Database session factory (background pool)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=background_engine)
+
+_COLUMNS = (
+    "id",
+    "user_id",
+    "stock_id",
+    "side",
+    "order_type",
+    "quantity",
+    "remaining_qty",
+    "price",
+    "status",
+    "created_at",
+    "updated_at",
+)
+
+
+def archive_orders(db: Session, older_than: timedelta, batch_size: int) -> int:
+    """Archive one batch of terminal orders. Returns the number moved."""
+    # Aware: a naive value would be read in the database session's time zone
+    cutoff = datetime.now(timezone.utc) - older_than
+    # Never move the newest row: SQLite would hand its id out again
+    newest = db.query(func.max(Order.id)).scalar()
+    if newest is None:
+        return 0
+
+    ids = [
+        order_id
+        for order_id, in db.query(Order.id)
+        .filter(
+            Order.status.in_(("FILLED", "CANCELLED")),
+            Order.updated_at < cutoff,
+            Order.id < newest,
+        )
+        .order_by(Order.id.asc())
+        .limit(batch_size)
+    ]
+    if not ids:
+        return 0
+
+    source = select(*(getattr(Order, name) for name in _COLUMNS)).where(Order.id.in_(ids))
+    db.execute(insert(OrderArchive).from_select(list(_COLUMNS), source))
+    db.execute(delete(Order).where(Order.id.in_(ids)))
+    db.commit()
+    return len(ids)
+
+
+def _archive_pass() -> int:
+    """Archive until nothing old is left. Returns the total moved."""
+    db = SessionLocal()
+    moved = 0
+    try:
+        while True:
+            batch = archive_orders(
+                db,
+                timedelta(seconds=settings.ORDER_ARCHIVE_AFTER_S),
+                settings.ORDER_ARCHIVE_BATCH,
+            )
+            moved += batch
+            if batch < settings.ORDER_ARCHIVE_BATCH:
+                return moved
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def order_archiver() -> None:
+    """Background task: archive terminal orders every ORDER_ARCHIVE_INTERVAL_S seconds."""
+    logger.info("Order archiver started")
+    while True:
+        try:
+            moved = await asyncio.to_thread(_archive_pass)
+            if moved:
+                logger.info(f"Archived {moved} terminal orders")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Order archiver error: {e}")
+        await asyncio.sleep(settings.ORDER_ARCHIVE_INTERVAL_S)
@@ -0,0 +1,212 @@
+"""
+OrderBook: In-memory price-level book for a single stock.
+
+Design:
+  - Prices are integer ticks (see app.services.ticks); floats never enter the book
+  - Each side keeps a sorted list of active prices plus a dict price -> PriceLevel
+  - Each PriceLevel holds a FIFO deque of resting entries (time priority)
+  - An order-id index gives direct access to any resting entry, and a
+    per-user index lists a user's resting entries (buying-power reservations)
+  - Cancelled and filled entries become tombstones (remaining_qty == 0) that
+    stay in their deque until they reach the front or the level is compacted,
+    so a cancel never scans its level
+  - Each PriceLevel keeps its open quantity and live order count, so aggregated
+    depth (market-by-price) reads touch only the levels returned
+
+The book only mirrors committed state of the `orders` table. Matching walks the
+book instead of querying resting rows; callers persist the result.
+"""
+from __future__ import annotations
+
+import bisect
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Iterator, Literal
+
+from app.services.ticks import DEFAULT_TICK_SIZE
+
+
+Side = Literal["BUY", "SELL"]
+
+
+@dataclass(slots=True, eq=False)  # identity compare: entries are tracked by object, never by value
+class BookEntry:
+    order_id: int
+    user_id: int
+    side: Side
+    price: int  # ticks
+    remaining_qty: int
+
+
+@dataclass(slots=True)
+class PriceLevel:
+    price: int  # ticks
+    entries: deque[BookEntry] = field(default_factory=deque)
+    live: int = 0  # entries that are not tombstones (the level's order count)
+    quantity: int = 0  # open quantity across live entries
+
+
+class BookSide:
+    """One side of the book. Bids iterate high->low, asks low->high."""
+
+    def __init__(self, side: Side):
+        self.side = side
+        self.levels: dict[int, PriceLevel] = {}
+        # Ascending for both sides; bids are walked from the end.
+        self._prices: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    def best_price(self) -> int | None:
+        if not self._prices:
+            return None
+        return self._prices[-1] if self.side == "BUY" else self._prices[0]
+
+    def depth(self, levels: int) -> list[tuple[int, int, int]]:
+        """(price, quantity, orders) for the best `levels` levels, best first."""
+        prices = self._prices[:-levels - 1:-1] if self.side == "BUY" else self._prices[:levels]
+        out = []
+        for price in prices:
+            level = self.levels[price]
+            out.append((price, level.quantity, level.live))
+        return out
+
+    def iter_levels(self) -> Iterator[PriceLevel]:
+        """Yield levels best-first. Safe against removal of the current level."""
+        prices = reversed(self._prices) if self.side == "BUY" else iter(self._prices)
+        for price in list(prices):
+            level = self.levels.get(price)
+            if level is not None:
+                yield level
+
+    def append(self, entry: BookEntry) -> None:
+        level = self.levels.get(entry.price)
+        if level is None:
+            level = PriceLevel(price=entry.price)
+            self.levels[entry.price] = level
+            bisect.insort(self._prices, entry.price)
+        level.entries.append(entry)
+        level.live += 1
+        level.quantity += entry.remaining_qty
+
+    def remove(self, entry: BookEntry) -> None:
+        """
+        Tombstone a live entry in place; the level goes once nothing live is left.
+
+        Callers remove each entry once (OrderBook tracks that via its id index).
+        """
+        level = self.levels.get(entry.price)
+        if level is None:
+            return
+        level.quantity -= entry.remaining_qty
+        entry.remaining_qty = 0
+        level.live -= 1
+        if level.live <= 0:
+            self.drop_level(level)
+            return
+        # Keep the front live so matching and best-price reads never see a tombstone first
+        entries = level.entries
+        while entries[0].remaining_qty <= 0:
+            entries.popleft()
+
+    def shrink(self, entry: BookEntry, qty: int) -> None:
+        """Take qty off a live entry, keeping its level's total in step."""
+        entry.remaining_qty -= qty
+        level = self.levels.get(entry.price)
+        if level is not None:
+            level.quantity -= qty
+
+    def compact(self, price: int) -> None:
+        """Drop tombstones from a level once they outnumber its live entries."""
+        level = self.levels.get(price)
+        if level is not None and len(level.entries) > 2 * level.live:
+            level.entries = deque(e for e in level.entries if e.remaining_qty > 0)
+
+    def drop_level(self, level: PriceLevel) -> None:
+        self.levels.pop(level.price, None)
+        i = bisect.bisect_left(self._prices, level.price)
+        if i < len(self._prices) and self._prices[i] == level.price:
+            del self._prices[i]
+
+
+class OrderBook:
+    """Price-time priority book for one stock. All prices are in ticks."""
+
+    def __init__(self, stock_id: int, tick_size: float = DEFAULT_TICK_SIZE):
+        self.stock_id = stock_id
+        self.tick_size = tick_size
+        self.bids = BookSide("BUY")
+        self.asks = BookSide("SELL")
+        self.orders: dict[int, BookEntry] = {}
+        self.by_user: dict[int, dict[int, BookEntry]] = {}  # user_id -> order_id -> entry
+
+    def side(self, side: Side) -> BookSide:
+        return self.bids if side == "BUY" else self.asks
+
+    def add(self, order_id: int, user_id: int, side: Side, price: int, remaining_qty: int) -> BookEntry:
+        """Rest an order at the back of its price level."""
+        entry = BookEntry(
+            order_id=int(order_id),
+            user_id=int(user_id),
+            side=side,
+            price=int(price),
+            remaining_qty=int(remaining_qty),
+        )
+        self.side(side).append(entry)
+        self.orders[entry.order_id] = entry
+        self.by_user.setdefault(entry.user_id, {})[entry.order_id] = entry
+        return entry
+
+    def _unindex(self, entry: BookEntry) -> None:
+        user_orders = self.by_user.get(entry.user_id)
+        if user_orders is not None:
+            user_orders.pop(entry.order_id, None)
+            if not user_orders:
+                del self.by_user[entry.user_id]
+
+    def user_entries(self, user_id: int, side: Side) -> list[BookEntry]:
+        """A user's resting entries on one side."""
+        return [e for e in self.by_user.get(int(user_id), {}).values() if e.side == side]
+
+    def remove(self, order_id: int) -> BookEntry | None:
+        """Remove a resting order (cancel). Returns the entry if it was resting."""
+        entry = self.orders.pop(int(order_id), None)
+        if entry is not None:
+            self._unindex(entry)
+            side = self.side(entry.side)
+            side.remove(entry)
+            side.compact(entry.price)
+        return entry
+
+    def reduce(self, entry: BookEntry, qty: int) -> None:
+        """
+        Consume qty from a resting entry, tombstoning it once fully filled.
+
+        Never compacts, so a caller walking level.entries by index stays valid.
+        """
+        side = self.side(entry.side)
+        side.shrink(entry, min(qty, entry.remaining_qty))
+        if entry.remaining_qty <= 0 and self.orders.pop(entry.order_id, None) is not None:
+            self._unindex(entry)
+            side.remove(entry)
+
+    def amend(self, order_id: int, remaining_qty: int) -> BookEntry | None:
+        """Shrink a resting order in place, keeping its queue position."""
+        entry = self.orders.get(int(order_id))
+        if entry is not None:
+            if remaining_qty <= 0:
+                return self.remove(order_id)
+            if remaining_qty < entry.remaining_qty:
+                self.side(entry.side).shrink(entry, entry.remaining_qty - int(remaining_qty))
+        return entry
+
+    def best_bid(self) -> int | None:
+        return self.bids.best_price()
+
+    def best_ask(self) -> int | None:
+        return self.asks.best_price()
+
+    def depth(self, levels: int) -> tuple[list[tuple[int, int, int]], list[tuple[int, int, int]]]:
+        """Aggregated (price, quantity, orders) levels for bids and asks, best first."""
+        return self.bids.depth(levels), self.asks.depth(levels)
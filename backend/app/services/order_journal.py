@@ -0,0 +1,271 @@
+"""
+OrderJournal: Append-only binary journal of committed book changes.
+
+Design:
+  - Records are appended after the DB commit that produced them, so the journal
+    only ever describes committed state
+  - Frame: <length:u32><crc32:u32><body>; body starts with <seq:u64><type:u8><stock_id:u32>
+  - Segment files (journal-<first seq>.log) roll over at a size limit
+  - Per-stock snapshots (snapshot-<stock_id>.bin) are written every N records of
+    that stock and record the last seq they include
+  - Recovery loads each snapshot, then replays newer records for that stock;
+    a torn or corrupt tail is truncated at the last good frame
+
+A book enters the journal with a RESET record followed by one ACCEPT per
+resting order, so every stock's history is self-contained from its last RESET
+or snapshot. Segments older than every stock's floor are deleted.
+"""
+import glob
+import logging
+import os
+import struct
+import threading
+import zlib
+from typing import Iterator
+
+from app.services.order_book import OrderBook
+
+logger = logging.getLogger(__name__)
+
+RESET = 1
+ACCEPT = 2
+FILL = 3
+CANCEL = 4
+AMEND = 5
+
+_FRAME = struct.Struct("<II")
+_HEAD = struct.Struct("<QBI")
+_BODIES = {
+    RESET: "d",  # tick_size
+    ACCEPT: "QIBqI",  # order_id, user_id, side, price_ticks, qty
+    FILL: "QI",  # order_id, qty
+    CANCEL: "Q",  # order_id
+    AMEND: "QI",  # order_id, new remaining qty
+}
+# Head + body in one struct per type, so replay decodes a record in one call
+_RECORDS = {rec_type: struct.Struct("<QBI" + body) for rec_type, body in _BODIES.items()}
+_SIDES = ("BUY", "SELL")
+
+_SNAP_HEAD = struct.Struct("<4sHQIdI")  # magic, version, seq, stock_id, tick_size, count
+_SNAP_ENTRY = struct.Struct("<QIBqI")
+_SNAP_MAGIC = b"TSBK"
+_SNAP_VERSION = 1
+
+
+def encode(seq: int, rec_type: int, stock_id: int, *fields) -> bytes:
+    body = _RECORDS[rec_type].pack(seq, rec_type, stock_id, *fields)
+    return _FRAME.pack(len(body), zlib.crc32(body)) + body
+
+
+def apply_record(book: OrderBook, rec_type: int, fields: tuple) -> None:
+    """Apply one journal record to a book (RESET is handled by the caller)."""
+    if rec_type == ACCEPT:
+        order_id, user_id, side, price_ticks, qty = fields
+        book.add(order_id, user_id, _SIDES[side], price_ticks, qty)
+    elif rec_type == FILL:
+        order_id, qty = fields
+        entry = book.orders.get(order_id)
+        if entry is not None:
+            book.reduce(entry, qty)
+    elif rec_type == CANCEL:
+        book.remove(fields[0])
+    elif rec_type == AMEND:
+        order_id, qty = fields
+        book.amend(order_id, qty)
+
+
+class OrderJournal:
+    """Writer and recovery for one journal directory."""
+
+    def __init__(self, path: str, segment_bytes: int = 64 * 1024 * 1024, snapshot_every: int = 10_000, fsync: bool = False):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.next_seq = 1
+        self._lock = threading.Lock()
+        self._file = None
+        self._since_snapshot: dict[int, int] = {}
+        # Oldest seq each stock still needs on replay (its last RESET or snapshot)
+        self._floors: dict[int, int] = {}
+        os.makedirs(path, exist_ok=True)
+
+    # ---- writing -------------------------------------------------------------
+
+    def append(self, stock_id: int, records: list[tuple]) -> int:
+        """Append (type, *fields) records for one stock. Returns the last seq written."""
+        if not records:
+            return self.next_seq - 1
+        with self._lock:
+            first_seq = self.next_seq
+            frames = []
+            for rec_type, *fields in records:
+                if rec_type == RESET:
+                    self._floors[stock_id] = self.next_seq
+                    self._since_snapshot[stock_id] = 0
+                frames.append(encode(self.next_seq, rec_type, stock_id, *fields))
+                self.next_seq += 1
+            self._write(first_seq, b"".join(frames))
+            self._floors.setdefault(stock_id, first_seq)
+            self._since_snapshot[stock_id] = self._since_snapshot.get(stock_id, 0) + len(records)
+            return self.next_seq - 1
+
+    def reset_records(self, book: OrderBook) -> list[tuple]:
+        """RESET + ACCEPT records describing the whole book."""
+        records: list[tuple] = [(RESET, book.tick_size)]
+        for entry in self._iter_entries(book):
+            records.append((ACCEPT, entry.order_id, entry.user_id, _SIDES.index(entry.side), entry.price, entry.remaining_qty))
+        return records
+
+    def snapshot_due(self, stock_id: int) -> bool:
+        return self._since_snapshot.get(stock_id, 0) >= self.snapshot_every
+
+    def snapshot(self, book: OrderBook, seq: int) -> None:
+        """Write a snapshot of book as of journal seq. Caller holds the book lock."""
+        entries = list(self._iter_entries(book))
+        parts = [_SNAP_HEAD.pack(_SNAP_MAGIC, _SNAP_VERSION, seq, book.stock_id, book.tick_size, len(entries))]
+        for e in entries:
+            parts.append(_SNAP_ENTRY.pack(e.order_id, e.user_id, _SIDES.index(e.side), e.price, e.remaining_qty))
+        data = b"".join(parts)
+        data += struct.pack("<I", zlib.crc32(data))
+
+        target = os.path.join(self.path, f"snapshot-{book.stock_id}.bin")
+        tmp = target + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, target)
+
+        with self._lock:
+            self._floors[book.stock_id] = seq + 1
+            self._since_snapshot[book.stock_id] = 0
+            self._prune()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write(self, first_seq: int, data: bytes) -> None:
+        if self._file is None or self._file.tell() >= self.segment_bytes:
+            if self._file is not None:
+                self._file.close()
+            self._file = open(os.path.join(self.path, f"journal-{first_seq:020d}.log"), "ab")
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def _prune(self) -> None:
+        """Delete segments whose records are all below every stock's floor."""
+        if not self._floors:
+            return
+        floor = min(self._floors.values())
+        segments = self._segments()
+        current = self._file.name if self._file is not None else None
+        for i, (first_seq, name) in enumerate(segments):
+            next_first = segments[i + 1][0] if i + 1 < len(segments) else None
+            if next_first is None or next_first > floor or name == current:
+                break
+            os.remove(name)
+
+    @staticmethod
+    def _iter_entries(book: OrderBook):
+        for side in (book.bids, book.asks):
+            for level in sorted(side.levels.values(), key=lambda lvl: lvl.price):
+                yield from (e for e in level.entries if e.remaining_qty > 0)
+
+    def _segments(self) -> list[tuple[int, str]]:
+        out = []
+        for name in glob.glob(os.path.join(self.path, "journal-*.log")):
+            first = int(os.path.basename(name)[len("journal-"):-len(".log")])
+            out.append((first, name))
+        return sorted(out)
+
+    # ---- recovery ------------------------------------------------------------
+
+    def recover(self) -> dict[int, OrderBook]:
+        """Rebuild books from snapshots plus newer journal records."""
+        books: dict[int, OrderBook] = {}
+        applied: dict[int, int] = {}
+
+        for name in glob.glob(os.path.join(self.path, "snapshot-*.bin")):
+            loaded = self._read_snapshot(name)
+            if loaded is None:
+                logger.warning(f"Ignoring unreadable journal snapshot {name}")
+                continue
+            seq, book = loaded
+            books[book.stock_id] = book
+            applied[book.stock_id] = seq
+            self._floors[book.stock_id] = seq + 1
+
+        last_seq = max(applied.values(), default=0)
+        for record in self._iter_records():
+            seq, rec_type, stock_id = record[0], record[1], record[2]
+            last_seq = seq
+            if seq <= applied.get(stock_id, 0):
+                continue
+            if rec_type == RESET:
+                books[stock_id] = OrderBook(stock_id, tick_size=record[3])
+                self._floors[stock_id] = seq
+                self._since_snapshot[stock_id] = 0
+            elif stock_id in books:
+                apply_record(books[stock_id], rec_type, record[3:])
+            applied[stock_id] = seq
+            self._since_snapshot[stock_id] = self._since_snapshot.get(stock_id, 0) + 1
+
+        self.next_seq = max(last_seq, max(applied.values(), default=0)) + 1
+        return books
+
+    def _iter_records(self) -> Iterator[tuple]:
+        """Yield (seq, type, stock_id, *fields) for every intact record, oldest first."""
+        segments = self._segments()
+        for i, (_, name) in enumerate(segments):
+            with open(name, "rb") as f:
+                data = f.read()
+            view = memoryview(data)
+            size = len(data)
+            offset = 0
+            while offset + _FRAME.size <= size:
+                length, crc = _FRAME.unpack_from(data, offset)
+                start = offset + _FRAME.size
+                end = start + length
+                if end > size or length < _HEAD.size or zlib.crc32(view[start:end]) != crc:
+                    break
+                decoder = _RECORDS.get(data[start + 8])
+                if decoder is None or decoder.size != length:
+                    break
+                yield decoder.unpack_from(data, start)
+                offset = end
+
+            if offset != size:
+                # Torn or corrupt frame: nothing after it can be trusted
+                logger.warning(f"Journal truncated at {name}:{offset}")
+                with open(name, "r+b") as f:
+                    f.truncate(offset)
+                for _, later in segments[i + 1:]:
+                    os.remove(later)
+                return
+
+    @staticmethod
+    def _read_snapshot(name: str) -> tuple[int, OrderBook] | None:
+        with open(name, "rb") as f:
+            data = f.read()
+        if len(data) < _SNAP_HEAD.size + 4:
+            return None
+        (crc,) = struct.unpack_from("<I", data, len(data) - 4)
+        if zlib.crc32(data[:-4]) != crc:
+            return None
+        magic, version, seq, stock_id, tick_size, count = _SNAP_HEAD.unpack_from(data)
+        if magic != _SNAP_MAGIC or version != _SNAP_VERSION:
+            return None
+
+        book = OrderBook(stock_id, tick_size=tick_size)
+        offset = _SNAP_HEAD.size
+        for _ in range(count):
+            order_id, user_id, side, price_ticks, qty = _SNAP_ENTRY.unpack_from(data, offset)
+            book.add(order_id, user_id, _SIDES[side], price_ticks, qty)
+            offset += _SNAP_ENTRY.size
+        return seq, book
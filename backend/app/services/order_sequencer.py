@@ -0,0 +1,397 @@
+"""
+OrderSequencer: Single writer per stock for all order-book mutations.
+
+Design:
+  - One asyncio.Queue and one worker task per stock, created on first submit
+    (only for ids that exist in `stocks`, app.services.known_stocks)
+  - Handlers submit a job (place, cancel, bot quote cycle) and await its future
+  - The worker runs jobs strictly in arrival order, one at a time, off the event loop
+
+Because only the worker touches a stock's book and orders, matching no longer
+needs a row lock on `stocks`, and fills for a symbol are produced in a single,
+predictable order. Jobs open their own DB session and return plain data.
+After each job the stock's aggregated depth is read where the books live and
+cached in this process (app.services.book_depth); the levels that changed go
+out to WebSocket subscribers as a book_delta.
+
+Sharded mode (MATCHING_WORKERS > 0):
+  - Jobs run in N single-process shards instead of the API process's threads
+  - Shard = stock_id % N, so each process owns the books for its partition
+  - Jobs and results cross the process boundary by pickling, so jobs must be
+    module-level functions taking and returning plain data
+
+Group commit (ORDER_GROUP_COMMIT_MAX > 1):
+  - When a worker picks up a single-order place, it also takes the places
+    queued right behind it (up to the max, optionally waiting a few ms for
+    more) and runs them as one place_order_batch_job: one transaction, one
+    commit, a savepoint per order
+  - Each caller is answered with its own result or rejection after that commit
+  - Any other job (cancel, amend, ...) ends the batch and runs after it, so
+    per-stock arrival order is unchanged
+
+With ORDER_JOURNAL_DIR set, whichever process owns the books (this one, or each
+shard under <dir>/shard-<n>) recovers them from the journal at start and
+snapshots them at shutdown.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.user import User
+from app.routers.websocket import emit_book_delta
+from app.schemas.order import OrderResponse
+from app.schemas.trade import TradeRequest
+from app.services.book_depth import book_depth
+from app.services.known_stocks import known_stocks
+from app.services.matching_engine import order_books
+from app.services.order_journal import OrderJournal
+from app.services.trade_service import TradeService
+
+logger = logging.getLogger(__name__)
+
+
+class ShardJobError(Exception):
+    """Picklable carrier for an HTTPException raised inside a shard process."""
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def open_order_journal(path: str) -> None:
+    """Attach the order journal at path and recover this process's books from it."""
+    journal = OrderJournal(
+        path,
+        segment_bytes=settings.ORDER_JOURNAL_SEGMENT_MB * 1024 * 1024,
+        snapshot_every=settings.ORDER_JOURNAL_SNAPSHOT_EVERY,
+        fsync=settings.ORDER_JOURNAL_FSYNC,
+    )
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        recovered = order_books.recover(db, journal)
+    finally:
+        db.close()
+    logger.info(f"Recovered {recovered} order books from {path} in {time.perf_counter() - started:.3f}s")
+
+
+def _init_shard(journal_path: str) -> None:
+    """Initializer executed once inside each shard process."""
+    if journal_path:
+        open_order_journal(journal_path)
+
+
+def _close_shard_journal() -> None:
+    order_books.close_journal()
+
+
+def _run_job(stock_id: int, fn: Callable[..., Any], args: tuple) -> tuple[Any, dict | None]:
+    """Run a job where the books live; also return the stock's depth afterwards."""
+    result = fn(*args)
+    return result, order_books.depth(stock_id, settings.BOOK_DEPTH_LEVELS)
+
+
+def _run_shard_job(stock_id: int, fn: Callable[..., Any], args: tuple) -> tuple[Any, dict | None]:
+    """Entry point executed inside a shard process."""
+    try:
+        return _run_job(stock_id, fn, args)
+    except HTTPException as e:
+        raise ShardJobError(e.status_code, e.detail) from None
+
+
+class OrderSequencer:
+    """Routes jobs to a per-stock FIFO worker."""
+
+    def __init__(self, max_queue_size: int = 10_000):
+        self.max_queue_size = max_queue_size
+        self._queues: dict[int, asyncio.Queue] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+        self._shards: list[ProcessPoolExecutor] = []
+        self.group_commit_max = 1
+        self.group_commit_wait_s = 0.0
+
+    def start(
+        self,
+        workers: int = 0,
+        journal_dir: str = "",
+        group_commit_max: int = 1,
+        group_commit_wait_ms: float = 0.0,
+    ) -> None:
+        """Spawn `workers` matching processes; 0 keeps matching in this process."""
+        self.group_commit_max = max(1, group_commit_max)
+        self.group_commit_wait_s = max(0.0, group_commit_wait_ms) / 1000
+        if self._shards:
+            return
+        if workers <= 0:
+            if journal_dir and order_books.journal is None:
+                open_order_journal(journal_dir)
+            return
+        ctx = multiprocessing.get_context("spawn")
+        self._shards = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=ctx,
+                initializer=_init_shard,
+                initargs=(os.path.join(journal_dir, f"shard-{i}") if journal_dir else "",),
+            )
+            for i in range(workers)
+        ]
+        logger.info(f"Order sequencer started with {workers} matching processes")
+
+    def shard_for(self, stock_id: int) -> int | None:
+        if not self._shards:
+            return None
+        return stock_id % len(self._shards)
+
+    async def _run(self, stock_id: int, fn: Callable[..., Any], args: tuple) -> Any:
+        shard = self.shard_for(stock_id)
+        if shard is None:
+            result, depth = await asyncio.to_thread(_run_job, stock_id, fn, args)
+        else:
+            loop = asyncio.get_running_loop()
+            try:
+                result, depth = await loop.run_in_executor(self._shards[shard], _run_shard_job, stock_id, fn, args)
+            except ShardJobError as e:
+                raise HTTPException(status_code=e.status_code, detail=e.detail) from None
+        if depth is not None:
+            delta = book_depth.update(stock_id, depth)
+            if delta is not None:
+                # Published here, in job order, so deltas reach the hub in sequence
+                await emit_book_delta(stock_id, delta)
+        return result
+
+    async def submit(self, stock_id: int, fn: Callable[..., Any], *args: Any) -> Any:
+        """Queue fn(*args) on the stock's worker and wait for its result. 404 for an unknown stock."""
+        stock_id = int(stock_id)
+        # Workers live until shutdown: never start one for an id that is not a stock
+        await known_stocks.require(stock_id)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        await self._queue_for(stock_id).put((fn, args, future))
+        return await future
+
+    def _queue_for(self, stock_id: int) -> asyncio.Queue:
+        queue = self._queues.get(stock_id)
+        if queue is None:
+            queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._queues[stock_id] = queue
+            self._workers[stock_id] = asyncio.create_task(self._worker(stock_id, queue))
+        return queue
+
+    async def _worker(self, stock_id: int, queue: asyncio.Queue) -> None:
+        logger.debug(f"Sequencer worker started for stock {stock_id}")
+        carry = None  # job taken off the queue while filling a batch; runs next
+        while True:
+            job = carry or await queue.get()
+            carry = None
+            fn, args, future = job
+            if future.cancelled():
+                continue
+            if fn is place_order_job and self.group_commit_max > 1:
+                batch, carry = await self._collect_batch(queue, job)
+                if len(batch) > 1:
+                    await self._run_group(stock_id, batch)
+                    continue
+            try:
+                result = await self._run(stock_id, fn, args)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+
+    async def _collect_batch(self, queue: asyncio.Queue, first: tuple) -> tuple[list[tuple], tuple | None]:
+        """
+        Take the place_order jobs queued behind `first`, up to group_commit_max.
+
+        Waits at most group_commit_wait_s once for the batch to fill. Returns the
+        batch and the non-place job that ended it, if any.
+        """
+        batch = [first]
+        waited = self.group_commit_wait_s <= 0
+        while len(batch) < self.group_commit_max:
+            if queue.empty():
+                if waited:
+                    break
+                waited = True
+                await asyncio.sleep(self.group_commit_wait_s)
+                continue
+            job = queue.get_nowait()
+            fn, _, future = job
+            if future.cancelled():
+                continue
+            if fn is not place_order_job:
+                return batch, job
+            batch.append(job)
+        return batch, None
+
+    async def _run_group(self, stock_id: int, batch: list[tuple]) -> None:
+        """Place a batch of single-order jobs in one transaction and answer each caller."""
+        requests = []
+        for _, args, _ in batch:
+            user_id, _, side, order_type, quantity, price = args
+            requests.append(
+                {"user_id": user_id, "side": side, "order_type": order_type, "quantity": quantity, "price": price}
+            )
+
+        try:
+            results = await self._run(stock_id, place_order_batch_job, (stock_id, requests))
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if "detail" in result:
+                future.set_exception(HTTPException(status_code=result["status_code"], detail=result["detail"]))
+            else:
+                future.set_result(result)
+
+    async def shutdown(self) -> None:
+        """Stop all workers. Pending submissions are cancelled."""
+        for task in self._workers.values():
+            task.cancel()
+        for task in self._workers.values():
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        for queue in self._queues.values():
+            while not queue.empty():
+                _, _, future = queue.get_nowait()
+                future.cancel()
+        self._workers.clear()
+        self._queues.clear()
+        loop = asyncio.get_running_loop()
+        for shard in self._shards:
+            try:
+                await loop.run_in_executor(shard, _close_shard_journal)
+            except Exception as e:
+                logger.error(f"Failed to snapshot shard order journal: {e}")
+            shard.shutdown(wait=True, cancel_futures=True)
+        self._shards = []
+        book_depth.clear()
+        order_books.close_journal()
+        logger.info("Order sequencer shutdown")
+
+
+order_sequencer = OrderSequencer()
+
+
+def place_order_job(
+    user_id: int,
+    stock_id: int,
+    side: str,
+    order_type: str,
+    quantity: int,
+    price: float | None,
+) -> dict:
+    """Sequencer job: place one order in its own session and return plain data."""
+    db = SessionLocal()
+    try:
+        incoming, fills, user, accounts = TradeService.place_order_with_accounts(
+            db=db,
+            user_id=user_id,
+            stock_id=stock_id,
+            side=side,
+            order_type=order_type,
+            quantity=quantity,
+            price=price,
+        )
+        return {
+            "order": OrderResponse.model_validate(incoming).model_dump(),
+            "fills": fills,
+            "new_balance": float(user.balance),
+            "available_cash": float(user.available_cash),
+            "accounts": accounts,
+        }
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def place_order_batch_job(stock_id: int, requests: list[dict]) -> list[dict]:
+    """Sequencer job: place several orders for one stock in one transaction."""
+    db = SessionLocal()
+    try:
+        results = TradeService.place_orders(db, stock_id, requests)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    # HTTPException does not survive pickling; ship rejections as plain data
+    return [
+        {"status_code": r["error"].status_code, "detail": r["error"].detail} if "error" in r else r
+        for r in results
+    ]
+
+
+def execute_trade_job(user_id: int, trade_data: TradeRequest, trade_type: str) -> dict:
+    """Sequencer job: legacy /trades buy/sell (a MARKET order)."""
+    db = SessionLocal()
+    try:
+        return TradeService.execute_trade(db, user_id, trade_data, trade_type)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _account(db: Session, user_id: int) -> dict:
+    """The user's committed balance and available cash (for account events)."""
+    user = db.get(User, user_id)
+    return {"user_id": user_id, "balance": float(user.balance), "available_cash": float(user.available_cash)}
+
+
+def cancel_order_job(user_id: int, order_id: int) -> dict:
+    """Sequencer job: cancel a resting order. Returns the order and the released account."""
+    db = SessionLocal()
+    try:
+        order = TradeService.cancel_order(db, user_id=user_id, order_id=order_id)
+        return {"order": OrderResponse.model_validate(order).model_dump(), "accounts": [_account(db, user_id)]}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def amend_order_job(user_id: int, order_id: int, quantity: int) -> dict:
+    """Sequencer job: reduce a resting order's quantity, keeping its queue position."""
+    db = SessionLocal()
+    try:
+        order = TradeService.amend_order(db, user_id=user_id, order_id=order_id, quantity=quantity)
+        return {"order": OrderResponse.model_validate(order).model_dump(), "accounts": [_account(db, user_id)]}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def load_book_job(stock_id: int) -> None:
+    """Sequencer job: make sure the stock's book is loaded (its depth is returned with it)."""
+    db = SessionLocal()
+    try:
+        order_books.get(db, stock_id)
+    finally:
+        db.close()
@@ -0,0 +1,90 @@
+"""
+ReplicaMonitor: Heartbeats on the primary, replication lag on each read replica.
+
+Every READ_REPLICA_CHECK_INTERVAL_S the monitor stamps the heartbeat row on the
+primary, then reads the row on every replica and hands what it saw to the
+read router. A replica that cannot be reached, or has not replayed the table
+yet, is reported as unknown and gets no reads until a later check succeeds.
+Only started when READ_REPLICA_URLS is set.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.core.database import background_engine
+from app.core.engines import db_engines
+from app.core.read_routing import read_router
+from app.models.replication_heartbeat import ReplicationHeartbeat
+
+logger = logging.getLogger(__name__)
+
+# Database session factory (background pool)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=background_engine)
+
+HEARTBEAT_ID = 1
+
+_unavailable: set[str] = set()  # replicas whose last check failed (logged once)
+
+
+def beat() -> None:
+    """Write the current time to the heartbeat row on the primary."""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        stamp = update(ReplicationHeartbeat).where(ReplicationHeartbeat.id == HEARTBEAT_ID).values(beat_at=now)
+        if db.execute(stamp).rowcount == 0:
+            try:
+                db.execute(insert(ReplicationHeartbeat).values(id=HEARTBEAT_ID, beat_at=now))
+            except IntegrityError:
+                # Another process created the row first
+                db.rollback()
+                db.execute(stamp)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def replica_heartbeat(name: str) -> Optional[datetime]:
+    """The heartbeat a replica has replayed, None if it has none."""
+    with Session(db_engines.sync_engine(name)) as db:
+        return db.scalar(select(ReplicationHeartbeat.beat_at).where(ReplicationHeartbeat.id == HEARTBEAT_ID))
+
+
+def check_replicas() -> None:
+    """One heartbeat, then every replica's lag into the read router."""
+    beat()
+    for name in read_router.replicas:
+        try:
+            beat_at = replica_heartbeat(name)
+        except Exception as e:
+            if name not in _unavailable:
+                logger.warning(f"Read replica {name} unavailable: {e}")
+                _unavailable.add(name)
+            beat_at = None
+        else:
+            if name in _unavailable:
+                logger.info(f"Read replica {name} reachable again")
+                _unavailable.discard(name)
+        read_router.observe(name, beat_at)
+
+
+async def replica_monitor() -> None:
+    """Background task: check replica lag every READ_REPLICA_CHECK_INTERVAL_S seconds."""
+    logger.info(f"Replica monitor started ({len(read_router.replicas)} replicas)")
+    while True:
+        try:
+            await asyncio.to_thread(check_replicas)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Replica monitor error: {e}")
+        await asyncio.sleep(settings.READ_REPLICA_CHECK_INTERVAL_S)
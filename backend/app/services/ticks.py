@@ -0,0 +1,40 @@
+"""
+Fixed-point prices: integer ticks per stock.
+
+Matching and the in-memory book work in integer ticks (price / tick_size), so
+price levels are exact dict keys and comparisons are integer compares. Float
+prices exist only at the edges (API schemas, DB columns, events).
+"""
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_UP
+
+DEFAULT_TICK_SIZE = 0.01
+
+
+def _ratio(price: float, tick_size: float) -> Decimal:
+    return Decimal(str(price)) / Decimal(str(tick_size))
+
+
+def is_on_tick(price: float, tick_size: float) -> bool:
+    """True if price is an exact multiple of tick_size."""
+    ratio = _ratio(price, tick_size)
+    return ratio == ratio.to_integral_value()
+
+
+def to_ticks(price: float, tick_size: float) -> int:
+    """Convert a price to the nearest whole tick."""
+    return int(_ratio(price, tick_size).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def floor_ticks(price: float, tick_size: float) -> int:
+    """Convert a price to ticks, rounding down (passive bid side)."""
+    return int(_ratio(price, tick_size).to_integral_value(rounding=ROUND_FLOOR))
+
+
+def ceil_ticks(price: float, tick_size: float) -> int:
+    """Convert a price to ticks, rounding up (passive ask side)."""
+    return int(_ratio(price, tick_size).to_integral_value(rounding=ROUND_CEILING))
+
+
+def from_ticks(ticks: int, tick_size: float) -> float:
+    """Convert ticks back to a float price for the API edge."""
+    return float(Decimal(int(ticks)) * Decimal(str(tick_size)))
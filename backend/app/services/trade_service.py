@@ -1,42 +1,72 @@
-import asyncio
 import logging
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
+from dataclasses import replace
 from datetime import datetime
 from app.models.user import User
 from app.models.stock import Stock
-from app.models.transaction import Transaction
 from app.models.portfolio import Portfolio
 from app.models.order import Order
+from app.models.order_archive import OrderArchive
 from app.models.executed_trade import ExecutedTrade
-from app.models.trade_history import TradeHistory
 from app.schemas.trade import TradeRequest
-from app.services.matching_engine import MatchingEngine, Fill
-from app.routers.websocket import emit_price_update, emit_trade_tick, emit_book_snapshot, emit_order_update
+from app.schemas.order import OrderResponse
+from app.services.account_cache import Account, CachedPosition, account_cache
+from app.services.matching_engine import MatchingEngine, Fill, order_books
+from app.services.ticks import DEFAULT_TICK_SIZE, is_on_tick
 
 logger = logging.getLogger(__name__)
 
+# Float slack for cash checks; reservations are added and released in pieces
+CASH_EPSILON = 1e-6
+
 class TradeService:
     """
     V2 trade engine: prices move only when orders match.
 
-    For backward compatibility, execute_trade() maps to a MARKET order and records
-    Transaction rows for both counterparties per fill (so /transactions keeps working).
+    For backward compatibility, execute_trade() maps to a MARKET order. Each fill
+    writes one ExecutedTrade row; /transactions and price history are projected
+    from it (app.services.execution_history).
+
+    Buying power is reserved while a LIMIT order rests (users.reserved_cash):
+    a buy holds price x remaining, and the user's resting sells on a stock hold
+    short margin for the shares their long position does not cover
+    (portfolio.reserved_margin). Holds are taken when the order is accepted and
+    released as it fills or is cancelled, so a resting order always has the
+    cash its fills need.
     """
 
     @staticmethod
-    def _get_or_create_position(db: Session, user_id: int, stock_id: int) -> Portfolio:
-        pos = (
-            db.query(Portfolio)
-            .filter(Portfolio.user_id == user_id, Portfolio.stock_id == stock_id)
+    def _lock_positions(db: Session, user_ids: list[int], stock_id: int) -> dict[int, Portfolio]:
+        """Lock (creating where missing) the stock's positions for user_ids, in user_id order."""
+        ids = sorted(set(int(x) for x in user_ids))
+        positions = {
+            pos.user_id: pos
+            for pos in db.query(Portfolio)
+            .filter(Portfolio.stock_id == stock_id, Portfolio.user_id.in_(ids))
+            .order_by(Portfolio.user_id.asc())
             .with_for_update()
-            .first()
-        )
-        if pos:
-            return pos
-        pos = Portfolio(user_id=user_id, stock_id=stock_id, quantity=0, avg_entry_price=0.0, margin_held=0.0)
-        db.add(pos)
-        return pos
+        }
+        missing = [
+            Portfolio(
+                user_id=user_id,
+                stock_id=stock_id,
+                quantity=0,
+                avg_entry_price=0.0,
+                margin_held=0.0,
+                reserved_margin=0.0,
+            )
+            for user_id in ids
+            if user_id not in positions
+        ]
+        if missing:
+            db.add_all(missing)
+            # Sessions run with autoflush off; flush so a later order in this
+            # transaction finds the rows instead of inserting duplicates.
+            db.flush()
+            positions.update((pos.user_id, pos) for pos in missing)
+        return positions
 
     @staticmethod
     def _lock_users(db: Session, user_ids: list[int]) -> list[User]:
@@ -47,121 +77,160 @@ class TradeService:
             .filter(User.user_id.in_(ids))
             .order_by(User.user_id.asc())
             .with_for_update()
+            .populate_existing()
             .all()
         )
 
     @staticmethod
-    def _apply_fill(
-        db: Session,
-        stock: Stock,
-        incoming_order: Order,
-        fill: Fill,
-    ) -> None:
-        # Determine buyer/seller by aggressor side
-        if incoming_order.side == "BUY":
-            buyer_id = incoming_order.user_id
-            seller_id = fill.resting_user_id
-            buy_order_id = incoming_order.id
-            sell_order_id = fill.resting_order_id
-        else:
-            buyer_id = fill.resting_user_id
-            seller_id = incoming_order.user_id
-            buy_order_id = fill.resting_order_id
-            sell_order_id = incoming_order.id
+    def _resting_sells(
+        db: Session, stock_id: int, user_id: int, pending: dict[int, int] | None = None
+    ) -> list[tuple[float, int]]:
+        """
+        (price, remaining_qty) of the user's resting sells on the stock.
 
-        users = TradeService._lock_users(db, [buyer_id, seller_id])
-        user_map = {u.user_id: u for u in users}
-        buyer = user_map[buyer_id]
-        seller = user_map[seller_id]
+        pending overrides remaining quantities for orders whose book update
+        waits for commit (amends, the bot's cancels).
+        """
+        pending = pending or {}
+        sells = []
+        for order_id, price, remaining in order_books.user_orders(db, stock_id, user_id, "SELL"):
+            remaining = pending.get(order_id, remaining)
+            if remaining > 0:
+                sells.append((price, remaining))
+        return sells
 
-        total = float(fill.price) * int(fill.quantity)
+    @staticmethod
+    def _sell_reserve(long_qty: int, sells: list[tuple[float, int]]) -> float:
+        """
+        Short margin to hold for resting sells: long shares cover the cheapest
+        sells, every uncovered share holds its own price (the most any fill
+        order could need).
+        """
+        covered = max(int(long_qty), 0)
+        reserve = 0.0
+        for price, qty in sorted(sells):
+            cover = min(covered, qty)
+            covered -= cover
+            reserve += price * (qty - cover)
+        return reserve
 
-        # BUYER: debit cash (use available_cash so margin is respected)
-        if buyer.available_cash < total:
+    @staticmethod
+    def _hold_sell_margin(user, pos, sells: list[tuple[float, int]]) -> None:
+        """Re-price the position's sell reservation; works on ORM rows and cached accounts alike."""
+        reserve = TradeService._sell_reserve(pos.quantity, sells)
+        user.reserved_cash = float(user.reserved_cash or 0.0) + reserve - float(pos.reserved_margin or 0.0)
+        pos.reserved_margin = reserve
+
+    @staticmethod
+    def _check_holds(user) -> None:
+        if user.available_cash < -CASH_EPSILON:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Insufficient available cash to fill order",
+                detail="Insufficient available cash to hold this order",
             )
-        buyer.balance -= total
 
-        # SELLER: credit cash (shorting margin handled by position logic below)
-        seller.balance += total
+    @staticmethod
+    def _settle_fills(
+        db: Session,
+        stock: Stock,
+        incoming_order: Order,
+        fills: list[Fill],
+    ) -> list[tuple[User, Portfolio]]:
+        """
+        Settle every fill of one incoming order.
 
-        # Update portfolios (positions). We keep avg_entry_price + margin_held but for now
-        # apply simple rules (full margin enforcement for increasing shorts).
-        buyer_pos = TradeService._get_or_create_position(db, buyer_id, stock.stock_id)
-        seller_pos = TradeService._get_or_create_position(db, seller_id, stock.stock_id)
+        Counterparty users and positions are locked once each (stable order),
+        fills are applied to them in memory in fill order, and the executed
+        trades go in as one multi-row insert, so round trips grow with the
+        number of distinct counterparties rather than the number of fills.
 
-        # Buyer receives shares
-        TradeService._adjust_position_for_trade(
-            db=db,
-            user=buyer,
-            pos=buyer_pos,
-            side="BUY",
-            qty=int(fill.quantity),
-            price=float(fill.price),
-        )
+        Sell reservations are released up front and re-priced from the
+        post-match book afterwards; a resting buy's reservation is released
+        as it fills. Returns the settled (user, position) pairs for the
+        account cache.
+        """
+        if not fills:
+            return []
+
+        user_ids = [incoming_order.user_id] + [f.resting_user_id for f in fills]
+        user_map = {u.user_id: u for u in TradeService._lock_users(db, user_ids)}
+        positions = TradeService._lock_positions(db, user_ids, stock.stock_id)
+
+        for user_id, user in user_map.items():
+            pos = positions[user_id]
+            user.reserved_cash = float(user.reserved_cash or 0.0) - float(pos.reserved_margin or 0.0)
+            pos.reserved_margin = 0.0
+
+        executed: list[dict] = []
+
+        for fill in fills:
+            # Determine buyer/seller by aggressor side
+            if incoming_order.side == "BUY":
+                buyer_id = incoming_order.user_id
+                seller_id = fill.resting_user_id
+                buy_order_id = incoming_order.id
+                sell_order_id = fill.resting_order_id
+            else:
+                buyer_id = fill.resting_user_id
+                seller_id = incoming_order.user_id
+                buy_order_id = fill.resting_order_id
+                sell_order_id = incoming_order.id
+
+            buyer = user_map[buyer_id]
+            seller = user_map[seller_id]
+            qty = int(fill.quantity)
+            price = fill.price  # ticks -> float once, at the settlement edge
+            total = price * qty
+
+            if incoming_order.side == "SELL":
+                # The resting buy held exactly this much
+                buyer.reserved_cash -= total
+
+            # BUYER: debit cash (use available_cash so margin is respected)
+            if buyer.available_cash < total - CASH_EPSILON:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Insufficient available cash to fill order",
+                )
+            buyer.balance -= total
 
-        # Seller delivers shares (may open/increase short)
-        TradeService._adjust_position_for_trade(
-            db=db,
-            user=seller,
-            pos=seller_pos,
-            side="SELL",
-            qty=int(fill.quantity),
-            price=float(fill.price),
-        )
+            # SELLER: credit cash (shorting margin handled by position logic below)
+            seller.balance += total
 
-        # Executed trade record
-        db.add(
-            ExecutedTrade(
-                stock_id=stock.stock_id,
-                buy_order_id=buy_order_id,
-                sell_order_id=sell_order_id,
-                buyer_id=buyer_id,
-                seller_id=seller_id,
-                price=float(fill.price),
-                quantity=int(fill.quantity),
-                aggressor_side=incoming_order.side,
+            # Buyer receives shares; seller delivers (may open/increase short)
+            TradeService._adjust_position_for_trade(
+                db=db, user=buyer, pos=positions[buyer_id], side="BUY", qty=qty, price=price
             )
-        )
-
-        # Keep legacy transaction rows for history UI
-        now = datetime.utcnow()
-        db.add(
-            Transaction(
-                user_id=buyer_id,
-                stock_id=stock.stock_id,
-                type="BUY",
-                quantity=int(fill.quantity),
-                price_at_transaction=float(fill.price),
-                timestamp=now,
+            TradeService._adjust_position_for_trade(
+                db=db, user=seller, pos=positions[seller_id], side="SELL", qty=qty, price=price
             )
-        )
-        db.add(
-            Transaction(
-                user_id=seller_id,
-                stock_id=stock.stock_id,
-                type="SELL",
-                quantity=int(fill.quantity),
-                price_at_transaction=float(fill.price),
-                timestamp=now,
+
+            executed.append(
+                {
+                    "stock_id": stock.stock_id,
+                    "buy_order_id": buy_order_id,
+                    "sell_order_id": sell_order_id,
+                    "buyer_id": buyer_id,
+                    "seller_id": seller_id,
+                    "price": price,
+                    "quantity": qty,
+                    "aggressor_side": incoming_order.side,
+                }
             )
-        )
 
-        # Persist raw trade history so daily/weekly candle aggregation can use it.
-        db.add(
-            TradeHistory(
-                stock_id=stock.stock_id,
-                price=float(fill.price),
-                quantity=int(fill.quantity),
-                timestamp=now,
+        for user_id, user in user_map.items():
+            TradeService._hold_sell_margin(
+                user, positions[user_id], TradeService._resting_sells(db, stock.stock_id, user_id)
             )
-        )
+
+        # The only row a fill writes; transactions and ticks are read from it
+        db.execute(insert(ExecutedTrade), executed)
 
         # Price update: only fills move price
-        stock.last_traded_price = float(fill.price)
-        stock.price = float(fill.price)  # backward compat
+        stock.last_traded_price = executed[-1]["price"]
+        stock.price = stock.last_traded_price  # backward compat
+
+        return [(user_map[user_id], positions[user_id]) for user_id in user_map]
 
     @staticmethod
     def _adjust_position_for_trade(db: Session, user: User, pos: Portfolio, side: str, qty: int, price: float) -> None:
@@ -209,7 +278,7 @@ class TradeService:
             if qty > 0:
                 # Opening or increasing short requires margin = notional (100% paper margin)
                 margin_required = price * qty
-                if user.available_cash < margin_required:
+                if user.available_cash < margin_required - CASH_EPSILON:
                     raise HTTPException(
                         status_code=status.HTTP_400_BAD_REQUEST,
                         detail=f"Insufficient margin. Need {margin_required:.2f} to short {qty} shares.",
@@ -225,18 +294,117 @@ class TradeService:
                 user.margin_held += margin_required
 
     @staticmethod
-    def place_order(db: Session, user_id: int, stock_id: int, side: str, order_type: str, quantity: int, price: float | None):
-        stock = db.query(Stock).filter(Stock.stock_id == stock_id).with_for_update().first()
+    def _get_stock(db: Session, stock_id: int) -> Stock:
+        stock = db.query(Stock).filter(Stock.stock_id == stock_id).first()
         if not stock:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Stock not found")
+        return stock
 
-        user = db.query(User).filter(User.user_id == user_id).with_for_update().first()
+    @staticmethod
+    def _get_user(db: Session, user_id: int) -> User:
+        user = db.query(User).filter(User.user_id == user_id).first()
         if not user:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+        return user
 
+    @staticmethod
+    def _simulate_order(
+        account: Account,
+        stock_id: int,
+        side: str,
+        fills: list[tuple[float, int]],
+        rest: tuple[float, int] | None,
+        sells: list[tuple[float, int]],
+    ) -> None:
+        """
+        Run the incoming user's side of settlement and holds on a copy of
+        account; raises as settlement would. rest is the (price, qty) left
+        resting, sells the user's other resting sells on the stock.
+        """
+        user = replace(account)
+        pos = replace(account.positions.get(stock_id) or CachedPosition())
+        user.reserved_cash -= pos.reserved_margin
+        pos.reserved_margin = 0.0
+        for price, qty in fills:
+            total = price * qty
+            if side == "BUY":
+                if user.available_cash < total - CASH_EPSILON:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Insufficient available cash to fill order",
+                    )
+                user.balance -= total
+            else:
+                user.balance += total
+            TradeService._adjust_position_for_trade(db=None, user=user, pos=pos, side=side, qty=qty, price=price)
+
+        if rest is not None:
+            if side == "BUY":
+                user.reserved_cash += rest[0] * rest[1]
+            else:
+                sells = sells + [rest]
+        TradeService._hold_sell_margin(user, pos, sells)
+        TradeService._check_holds(user)
+
+    @staticmethod
+    def _validate_order(
+        db: Session,
+        stock: Stock,
+        user_id: int,
+        side: str,
+        order_type: str,
+        quantity: int,
+        price: float | None,
+    ) -> None:
+        """
+        Pre-trade checks, run before the order is inserted or matched.
+
+        Buying power: the fills the order would get are read off the book and
+        settled, together with the hold on any resting remainder, against the
+        user's cached account. A rejection is re-checked against a fresh load,
+        so a stale cache entry never causes one.
+        """
+        tick_size = stock.tick_size or DEFAULT_TICK_SIZE
+        if order_type == "LIMIT" and price is not None and not is_on_tick(price, tick_size):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Price must be a multiple of the tick size ({tick_size})",
+            )
+
+        fills = MatchingEngine.preview(db, stock.stock_id, user_id, side, order_type, quantity, price)
+        remaining = quantity - sum(qty for _, qty in fills)
+        rest = (price, remaining) if order_type == "LIMIT" and remaining > 0 else None
+        if not fills and rest is None:
+            return
+        account = account_cache.get(db, user_id)
+        if account is None:
+            return
+        sells = TradeService._resting_sells(db, stock.stock_id, user_id)
+        try:
+            TradeService._simulate_order(account, stock.stock_id, side, fills, rest, sells)
+        except HTTPException:
+            account = account_cache.load(db, user_id)
+            if account is not None:
+                TradeService._simulate_order(account, stock.stock_id, side, fills, rest, sells)
+
+    @staticmethod
+    def _submit_order(
+        db: Session,
+        stock: Stock,
+        user_id: int,
+        side: str,
+        order_type: str,
+        quantity: int,
+        price: float | None,
+    ) -> tuple[Order, list[Fill], list[tuple[User, Portfolio]]]:
+        """
+        Insert, match and settle one validated order inside the caller's transaction.
+
+        Returns the order, its fills and the settled (user, position) pairs.
+        """
         incoming = Order(
             user_id=user_id,
-            stock_id=stock_id,
+            stock_id=stock.stock_id,
             side=side,
             order_type=order_type,
             quantity=quantity,
@@ -248,86 +416,283 @@ class TradeService:
         db.flush()  # ensure incoming.id
 
         fills = MatchingEngine.match(db, incoming)
-        for f in fills:
-            TradeService._apply_fill(db, stock, incoming, f)
+        settled = TradeService._settle_fills(db, stock, incoming, fills)
+        settled = TradeService._hold_incoming(db, stock, incoming, settled)
 
         # Ensure order status/remaining_qty updates are visible to subsequent queries
         db.flush()
+        return incoming, fills, settled
 
-        # Update bid/ask from top of book (best levels only)
-        TradeService._update_best_prices(db, stock_id=stock.stock_id, stock=stock)
+    @staticmethod
+    def _hold_incoming(
+        db: Session, stock: Stock, incoming: Order, settled: list[tuple[User, Portfolio]]
+    ) -> list[tuple[User, Portfolio | None]]:
+        """
+        Reserve buying power for the incoming order's resting remainder and
+        confirm the user can carry every hold. Returns settled, plus the
+        incoming user's rows when settlement did not touch them.
+        """
+        rests = incoming.order_type == "LIMIT" and incoming.remaining_qty > 0
+        rows = {user.user_id: (user, pos) for user, pos in settled}
+        if incoming.user_id in rows:
+            user, pos = rows[incoming.user_id]
+            # Settlement already re-priced the sell reservation from the book
+            if incoming.side == "BUY" and rests:
+                user.reserved_cash += float(incoming.price) * incoming.remaining_qty
+        elif not rests:
+            return settled
+        else:
+            # Nothing filled, so these rows carry no unflushed changes to lose
+            user = TradeService._lock_users(db, [incoming.user_id])[0]
+            if incoming.side == "BUY":
+                pos = None
+                user.reserved_cash = float(user.reserved_cash or 0.0) + float(incoming.price) * incoming.remaining_qty
+            else:
+                pos = TradeService._lock_positions(db, [incoming.user_id], stock.stock_id)[incoming.user_id]
+                TradeService._hold_sell_margin(
+                    user, pos, TradeService._resting_sells(db, stock.stock_id, incoming.user_id)
+                )
+            settled = settled + [(user, pos)]
 
-        db.flush()
+        TradeService._check_holds(user)
+        return settled
 
-        order_payload = {
-            "order_id": int(incoming.id),
-            "stock_id": int(incoming.stock_id),
-            "status": incoming.status,
-            "filled_qty": int(incoming.quantity - incoming.remaining_qty),
-            "remaining_qty": int(incoming.remaining_qty),
-            "order_type": incoming.order_type,
-            "side": incoming.side,
-            "price": float(incoming.price) if incoming.price is not None else None,
-        }
+    @staticmethod
+    def release_holds(db: Session, stock_id: int, user_id: int, orders: list[tuple[Order, int]]) -> None:
+        """
+        Release the reservations of resting orders that are being cancelled or
+        reduced, before commit. orders pairs each Order (still carrying its old
+        remaining_qty) with the remaining quantity it keeps.
+        """
+        released = sum(
+            float(order.price) * (order.remaining_qty - keep)
+            for order, keep in orders
+            if order.side == "BUY" and order.price is not None
+        )
+        pending = {int(order.id): keep for order, keep in orders if order.side == "SELL"}
+
+        user = TradeService._lock_users(db, [user_id])[0]
+        user.reserved_cash = float(user.reserved_cash or 0.0) - released
+        if pending:
+            pos = TradeService._lock_positions(db, [user_id], stock_id)[user_id]
+            TradeService._hold_sell_margin(
+                user, pos, TradeService._resting_sells(db, stock_id, user_id, pending=pending)
+            )
+        account_cache.invalidate(user_id)
 
-        db.commit()
+    @staticmethod
+    def place_order(db: Session, user_id: int, stock_id: int, side: str, order_type: str, quantity: int, price: float | None):
+        incoming, fills, user, _ = TradeService.place_order_with_accounts(
+            db, user_id, stock_id, side, order_type, quantity, price
+        )
+        return incoming, fills, user
 
-        TradeService._schedule_event_broadcast(stock.stock_id, fills, order_payload)
+    @staticmethod
+    def place_order_with_accounts(
+        db: Session, user_id: int, stock_id: int, side: str, order_type: str, quantity: int, price: float | None
+    ) -> tuple[Order, list[Fill], User, list[dict]]:
+        """place_order, plus the committed balances of every user it settled (AccountCache.balances)."""
+        # The in-memory book for this stock is only consistent with committed state,
+        # so hold its lock until commit and drop it if anything fails.
+        with order_books.lock(stock_id):
+            try:
+                # No row locks here: all writes for a stock are serialized by the order
+                # sequencer (and the book lock); counterparties are locked at settlement.
+                stock = TradeService._get_stock(db, stock_id)
+                user = TradeService._get_user(db, user_id)
+
+                TradeService._validate_order(db, stock, user_id, side, order_type, quantity, price)
+                incoming, fills, settled = TradeService._submit_order(
+                    db, stock, user_id, side, order_type, quantity, price
+                )
+
+                # Update bid/ask from top of book (best levels only)
+                TradeService._update_best_prices(db, stock_id=stock.stock_id, stock=stock)
+
+                db.flush()
+
+                journal_records = order_books.order_records(incoming, fills)
+                accounts = account_cache.snapshot(stock_id, settled)
+
+                db.commit()
+                order_books.journal_commit(stock_id, journal_records)
+                account_cache.store(accounts)
+            except Exception:
+                order_books.invalidate(stock_id)
+                raise
 
         db.refresh(user)
         db.refresh(incoming)
-        return incoming, fills, user
+        return incoming, fills, user, account_cache.balances(accounts)
 
     @staticmethod
-    def _schedule_event_broadcast(stock_id: int, fills: list[Fill], incoming_order: dict) -> None:
-        try:
-            loop = asyncio.get_running_loop()
-        except RuntimeError:
-            return
-
-        if fills:
-            for fill in fills:
-                loop.create_task(
-                    emit_trade_tick(
-                        stock_id=stock_id,
-                        price=float(fill.price),
-                        quantity=int(fill.quantity),
-                        aggressor_side=fill.aggressor_side,
+    def place_orders(db: Session, stock_id: int, requests: list[dict]) -> list[dict]:
+        """
+        Place several orders for one stock in a single transaction.
+
+        Each request is a dict with user_id, side, order_type, quantity, price.
+        Every order runs in its own savepoint, so a rejected order (HTTPException)
+        is rolled back alone and reported in its slot; the rest commit together.
+        Returns one dict per request: {"order", "fills", "new_balance",
+        "available_cash", "accounts"} or {"error": HTTPException}, where accounts
+        are the balances of the users the order settled (AccountCache.balances).
+        """
+        results: list[dict] = []
+        journal_records: list[tuple] = []
+        accounts: list[tuple] = []
+        with order_books.lock(stock_id):
+            try:
+                stock = TradeService._get_stock(db, stock_id)
+                users: dict[int, User] = {}
+
+                for req in requests:
+                    user_id = int(req["user_id"])
+                    order = (user_id, req["side"], req["order_type"], int(req["quantity"]), req.get("price"))
+                    try:
+                        if user_id not in users:
+                            users[user_id] = TradeService._get_user(db, user_id)
+                        TradeService._validate_order(db, stock, *order)
+                    except HTTPException as e:
+                        results.append({"error": e})  # rejected before touching the book
+                        continue
+
+                    savepoint = db.begin_nested()
+                    try:
+                        incoming, fills, settled = TradeService._submit_order(db, stock, *order)
+                        savepoint.commit()
+                    except HTTPException as e:
+                        savepoint.rollback()
+                        # The book may hold this order's partial effects; rebuild it from
+                        # the transaction's current state on the next match.
+                        order_books.invalidate(stock_id)
+                        results.append({"error": e})
+                        continue
+
+                    journal_records.extend(order_books.order_records(incoming, fills))
+                    order_accounts = account_cache.snapshot(stock_id, settled)
+                    accounts.extend(order_accounts)
+
+                    # Serialized before commit: server defaults were returned on insert,
+                    # so no per-order refresh round trip is needed afterwards.
+                    user = users[user_id]
+                    results.append(
+                        {
+                            "order": OrderResponse.model_validate(incoming).model_dump(),
+                            "fills": fills,
+                            "new_balance": float(user.balance),
+                            "available_cash": float(user.available_cash),
+                            "accounts": account_cache.balances(order_accounts),
+                        }
                     )
+
+                TradeService._update_best_prices(db, stock_id=stock.stock_id, stock=stock)
+                db.commit()
+                order_books.journal_commit(stock_id, journal_records)
+                account_cache.store(accounts)
+            except Exception:
+                order_books.invalidate(stock_id)
+                raise
+
+        return results
+
+    @staticmethod
+    def cancel_order(db: Session, user_id: int, order_id: int) -> Order:
+        """Cancel the remaining quantity of a resting order and drop it from the book."""
+        order = db.query(Order).filter(Order.id == order_id, Order.user_id == user_id).first()
+        if not order:
+            TradeService._raise_if_archived(db, user_id, order_id, "cancel")
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
+
+        stock_id = int(order.stock_id)
+        with order_books.lock(stock_id):
+            db.refresh(order, with_for_update=True)
+            if order.status in ("FILLED", "CANCELLED"):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Cannot cancel order with status {order.status}",
                 )
 
-        loop.create_task(emit_price_update(stock_id=stock_id))
-        loop.create_task(emit_book_snapshot(stock_id=stock_id))
-        loop.create_task(emit_order_update(incoming_order))
+            try:
+                TradeService.release_holds(db, stock_id, user_id, [(order, 0)])
+
+                # If partially filled, canceling leaves the filled part as-is and cancels remaining
+                order.status = "CANCELLED"
+                order.updated_at = datetime.utcnow()
+
+                # Take it out of the book first so the new top of book commits with the cancel
+                journal_records = order_books.remove(db, stock_id, order.id)
+                TradeService._update_best_prices(db, stock_id=stock_id, stock=TradeService._get_stock(db, stock_id))
+                db.commit()
+                order_books.journal_commit(stock_id, journal_records)
+            except Exception:
+                order_books.invalidate(stock_id)
+                raise
+
+        return order
 
     @staticmethod
-    def _update_best_prices(db: Session, stock_id: int, stock: Stock) -> None:
-        best_bid = (
-            db.query(Order.price)
-            .filter(
-                Order.stock_id == stock_id,
-                Order.side == "BUY",
-                Order.status.in_(("OPEN", "PARTIAL")),
-                Order.remaining_qty > 0,
-            )
-            .order_by(Order.price.desc(), Order.created_at.asc())
-            .limit(1)
+    def _raise_if_archived(db: Session, user_id: int, order_id: int, action: str) -> None:
+        """An archived order is terminal: reject the action as for any FILLED / CANCELLED order."""
+        archived_status = (
+            db.query(OrderArchive.status)
+            .filter(OrderArchive.id == order_id, OrderArchive.user_id == user_id)
             .scalar()
         )
-        best_ask = (
-            db.query(Order.price)
-            .filter(
-                Order.stock_id == stock_id,
-                Order.side == "SELL",
-                Order.status.in_(("OPEN", "PARTIAL")),
-                Order.remaining_qty > 0,
+        if archived_status is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot {action} order with status {archived_status}",
             )
-            .order_by(Order.price.asc(), Order.created_at.asc())
-            .limit(1)
-            .scalar()
-        )
-        stock.bid_price = float(best_bid) if best_bid is not None else None
-        stock.ask_price = float(best_ask) if best_ask is not None else None
+
+    @staticmethod
+    def amend_order(db: Session, user_id: int, order_id: int, quantity: int) -> Order:
+        """
+        Reduce a resting order's total quantity in place.
+
+        The order keeps its place in the queue, so only decreases are allowed;
+        quantity must stay above what has already filled (cancel instead).
+        """
+        order = db.query(Order).filter(Order.id == order_id, Order.user_id == user_id).first()
+        if not order:
+            TradeService._raise_if_archived(db, user_id, order_id, "amend")
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
+
+        with order_books.lock(order.stock_id):
+            db.refresh(order, with_for_update=True)
+            if order.status in ("FILLED", "CANCELLED"):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Cannot amend order with status {order.status}",
+                )
+            filled = order.quantity - order.remaining_qty
+            if quantity >= order.quantity:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Amend can only reduce quantity; cancel and re-place to increase it",
+                )
+            if quantity <= filled:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Quantity must exceed the {filled} already filled; cancel instead",
+                )
+
+            TradeService.release_holds(db, order.stock_id, user_id, [(order, quantity - filled)])
+            order.quantity = quantity
+            order.remaining_qty = quantity - filled
+            order.updated_at = datetime.utcnow()
+            db.commit()
+            order_books.amend(order.stock_id, order.id, order.remaining_qty)
+
+        return order
+
+    @staticmethod
+    def _update_best_prices(db: Session, stock_id: int, stock: Stock) -> None:
+        """Copy top of book onto the stock row, touching only fields that changed."""
+        best_bid, best_ask = order_books.best_prices(db, stock_id)
+        if stock.bid_price != best_bid:
+            stock.bid_price = best_bid
+        if stock.ask_price != best_ask:
+            stock.ask_price = best_ask
 
     @staticmethod
     def execute_trade(db: Session, user_id: int, trade_data: TradeRequest, trade_type: str):
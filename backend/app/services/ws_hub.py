@@ -2,27 +2,85 @@
 WebSocket Hub: Central event broadcaster for all market events.
 
 Design:
-  - Global broadcast_queue: Matches push events from trade engine
+  - Global broadcast_queue: Matches push events from trade engine, each
+    JSON-encoded once on the way in (Frame)
   - Per-client queues: Each connected client has its own queue
-  - Hub task: Reads from broadcast and fans out to all subscribers
-  - Client task: Each client reads from its queue and sends over WS
+  - Topics: Clients subscribe to (channel, stock_id, resolution); a None field
+    matches any value. The channel is the event type.
+  - Hub task: Reads from broadcast and fans out to the subscribers of the
+    event's topics only (topic -> queues index, no scan over all clients)
+  - Private events: A client authenticated as a user is also indexed by
+    user_id; send_to_user events (order updates, fills, balances) go to that
+    user's connections only and need no subscription
+  - Client task: Each client reads from its queue and sends the shared text over WS
+  - Client buffers: WebSocket clients queue into a ClientBuffer, which keeps
+    only the newest pending state event per key and a bounded ring of the
+    rest, so a slow client falls behind on ticks, never on current state
 
 This decouples the trade engine (fast path) from WebSocket I/O (potentially slow).
 """
+from __future__ import annotations
+
 import asyncio
+import itertools
 import json
 import logging
-from typing import Callable
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Iterable, Optional
 from datetime import datetime
 
+from app.services.candle_service import CandleService
+
 logger = logging.getLogger(__name__)
 
+# Public channels; private events (order_update, fill, balance_update) are per user
+CHANNELS = ("price_update", "trade_tick", "book_delta", "candle_update")
+MAX_TOPICS_PER_CLIENT = 200
+
+# Events that carry the full current state of their key; a newer one replaces a pending one.
+# book_delta is not one: each builds on the last, so a dropped one shows as a seq gap.
+CONFLATED_TYPES = ("price_update", "book_snapshot", "candle_update", "balance_update")
+
+# (channel, stock_id, resolution); None matches every stock / resolution
+Topic = tuple[str, Optional[int], Optional[str]]
+
 # Global state
 broadcast_queue: asyncio.Queue | None = None
-client_queues: set[asyncio.Queue] = set()
+client_queues: dict[asyncio.Queue | ClientBuffer, set[Topic]] = {}  # client -> its topics
+subscribers: dict[Topic, set[asyncio.Queue | ClientBuffer]] = {}  # topic -> clients
+user_clients: dict[int, set[asyncio.Queue | ClientBuffer]] = {}  # user_id -> its authenticated clients
+client_users: dict[asyncio.Queue | ClientBuffer, int] = {}  # authenticated client -> user_id
 hub_task: asyncio.Task | None = None
 
 
+def topic(channel: str, stock_id: Optional[int] = None, resolution: Optional[str] = None) -> Topic:
+    """Validate and build a topic. Raises ValueError."""
+    if channel not in CHANNELS:
+        raise ValueError(f"Unknown channel: {channel}. Must be one of {', '.join(CHANNELS)}.")
+    if stock_id is not None and (isinstance(stock_id, bool) or not isinstance(stock_id, int)):
+        raise ValueError("stock_id must be an integer")
+    if resolution is not None:
+        if channel != "candle_update":
+            raise ValueError("resolution only applies to candle_update")
+        if resolution not in CandleService.RESOLUTIONS:
+            raise ValueError(f"Invalid resolution. Must be one of {', '.join(CandleService.RESOLUTIONS)}.")
+    return (channel, stock_id, resolution)
+
+
+def event_topics(event: dict) -> set[Topic]:
+    """Every topic an event is delivered to: exact and wildcard stock / resolution."""
+    channel = event.get("type")
+    stock_id = event.get("stock_id")
+    resolution = event.get("resolution")
+    return {
+        (channel, stock_id, resolution),
+        (channel, None, resolution),
+        (channel, stock_id, None),
+        (channel, None, None),
+    }
+
+
 def event_to_json(event: dict) -> str:
     """Serialize an event dict to JSON, handling datetime objects."""
     def default_serializer(obj):
@@ -30,7 +88,78 @@ def event_to_json(event: dict) -> str:
             return obj.isoformat()
         raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
     
-    return json.dumps(event, default=default_serializer)
+    # Same compact form as WebSocket.send_json
+    return json.dumps(event, default=default_serializer, separators=(",", ":"), ensure_ascii=False)
+
+
+@dataclass(frozen=True, slots=True)
+class Frame:
+    """An event and its JSON text, encoded once and shared by every client queue."""
+
+    event: dict
+    text: str
+    user_id: Optional[int] = None  # private: only this user's connections
+
+
+def frame(event: dict, user_id: Optional[int] = None) -> Frame:
+    return Frame(event, event_to_json(event), user_id)
+
+
+class ClientBuffer:
+    """
+    Outbox of one WebSocket client, in place of a bounded asyncio.Queue.
+
+    State events (CONFLATED_TYPES) are keyed by type, stock_id and resolution
+    (candles also by bar open_time, so a closed bar's last update survives the
+    next bar). A new frame for a pending key replaces it and moves to the back,
+    after the events it follows. Other events (trade ticks, order updates,
+    replies) go through a ring of ring_size; when it is full the oldest one is
+    dropped. Memory is bounded by the state keys a client subscribes to plus
+    the ring, and a client that keeps up sees every event, in order.
+    """
+
+    def __init__(self, ring_size: int = 100):
+        self._pending: OrderedDict = OrderedDict()  # key -> Frame, in send order
+        self._ring: deque = deque()  # keys of pending non-state frames, oldest first
+        self._ring_size = ring_size
+        self._seq = itertools.count()
+        self._ready = asyncio.Event()
+        self.conflated = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @staticmethod
+    def state_key(event: dict) -> Optional[tuple]:
+        event_type = event.get("type")
+        if event_type not in CONFLATED_TYPES:
+            return None
+        bar = event["candle"].get("open_time") if event_type == "candle_update" else None
+        return (event_type, event.get("stock_id"), event.get("resolution"), bar)
+
+    def put_nowait(self, item: Frame) -> None:
+        key = self.state_key(item.event)
+        if key is not None:
+            if self._pending.pop(key, None) is not None:
+                self.conflated += 1
+        else:
+            if len(self._ring) >= self._ring_size:
+                del self._pending[self._ring.popleft()]
+                self.dropped += 1
+            key = next(self._seq)
+            self._ring.append(key)
+        self._pending[key] = item
+        self._ready.set()
+
+    async def get(self) -> Frame:
+        while not self._pending:
+            self._ready.clear()
+            await self._ready.wait()
+        key, item = self._pending.popitem(last=False)
+        if self._ring and self._ring[0] == key:
+            self._ring.popleft()
+        return item
 
 
 async def broadcast(event: dict) -> None:
@@ -38,7 +167,7 @@ async def broadcast(event: dict) -> None:
     Emit an event to all connected WebSocket clients.
     
     Called from trade engine after fills commit.
-    Non-blocking: puts event on broadcast queue and returns immediately.
+    Non-blocking: encodes the event, puts it on broadcast queue and returns immediately.
     """
     global broadcast_queue
     if broadcast_queue is None:
@@ -46,7 +175,23 @@ async def broadcast(event: dict) -> None:
         return
     
     try:
-        broadcast_queue.put_nowait(event)
+        broadcast_queue.put_nowait(frame(event))
+    except asyncio.QueueFull:
+        logger.error("broadcast_queue full; dropping event")
+
+
+async def send_to_user(user_id: int, event: dict) -> None:
+    """
+    Emit a private event to one user's authenticated connections.
+
+    Goes through the broadcast queue, so it stays in order with market events.
+    """
+    if broadcast_queue is None:
+        logger.warning("broadcast_queue not initialized; dropping event")
+        return
+
+    try:
+        broadcast_queue.put_nowait(frame(event, user_id))
     except asyncio.QueueFull:
         logger.error("broadcast_queue full; dropping event")
 
@@ -64,14 +209,21 @@ async def hub_task_runner() -> None:
     while True:
         try:
             # Wait for next event from trade engine
-            event = await broadcast_queue.get()
+            item = await broadcast_queue.get()
             
-            # Fan out to all connected clients
-            for q in list(client_queues):
+            # Fan out to the user's connections, or to the clients subscribed
+            # to one of the event's topics
+            if item.user_id is not None:
+                targets = user_clients.get(item.user_id, ())
+            else:
+                targets: set[asyncio.Queue | ClientBuffer] = set()
+                for key in event_topics(item.event):
+                    targets.update(subscribers.get(key, ()))
+            for q in targets:
                 try:
-                    q.put_nowait(event)
+                    q.put_nowait(item)
                 except asyncio.QueueFull:
-                    # Client's queue full; likely dead or slow. Log and skip.
+                    # Internal consumer's queue full (WebSocket clients conflate instead)
                     logger.warning(f"Client queue full; client may be disconnected")
         except Exception as e:
             logger.error(f"Hub task error: {e}")
@@ -103,15 +255,54 @@ async def shutdown_hub() -> None:
     logger.info("Hub shutdown")
 
 
-def register_client(q: asyncio.Queue) -> None:
-    """Register a new client connection."""
+def register_client(
+    q: asyncio.Queue | ClientBuffer, topics: Iterable[Topic] = (), user_id: Optional[int] = None
+) -> None:
+    """Register a new client connection, optionally subscribed to topics and authenticated as a user."""
     global client_queues
-    client_queues.add(q)
+    client_queues.setdefault(q, set())
+    for key in topics:
+        subscribe(q, key)
+    if user_id is not None:
+        client_users[q] = user_id
+        user_clients.setdefault(user_id, set()).add(q)
     logger.debug(f"Client registered. Total clients: {len(client_queues)}")
 
 
-def unregister_client(q: asyncio.Queue) -> None:
-    """Unregister a client on disconnect."""
+def unregister_client(q: asyncio.Queue | ClientBuffer) -> None:
+    """Unregister a client on disconnect, dropping its subscriptions."""
     global client_queues
-    client_queues.discard(q)
+    for key in client_queues.pop(q, ()):
+        _remove_subscriber(key, q)
+    user_id = client_users.pop(q, None)
+    if user_id is not None:
+        connections = user_clients[user_id]
+        connections.discard(q)
+        if not connections:
+            del user_clients[user_id]
     logger.debug(f"Client unregistered. Total clients: {len(client_queues)}")
+
+
+def subscribe(q: asyncio.Queue | ClientBuffer, key: Topic) -> None:
+    """Deliver events of a topic to a registered client. Raises ValueError past the limit."""
+    topics = client_queues[q]
+    if key not in topics and len(topics) >= MAX_TOPICS_PER_CLIENT:
+        raise ValueError(f"At most {MAX_TOPICS_PER_CLIENT} subscriptions per connection")
+    topics.add(key)
+    subscribers.setdefault(key, set()).add(q)
+
+
+def unsubscribe(q: asyncio.Queue | ClientBuffer, key: Topic) -> None:
+    """Stop delivering a topic to a client (no-op if it was not subscribed)."""
+    topics = client_queues.get(q)
+    if topics is not None and key in topics:
+        topics.discard(key)
+        _remove_subscriber(key, q)
+
+
+def _remove_subscriber(key: Topic, q: asyncio.Queue | ClientBuffer) -> None:
+    queues = subscribers.get(key)
+    if queues is not None:
+        queues.discard(q)
+        if not queues:
+            del subscribers[key]
@@ -2,7 +2,6 @@ from sqlalchemy.orm import Session
 from app.core.database import engine, Base
 from app.models.user import User
 from app.models.stock import Stock
-from app.models.transaction import Transaction
 from app.models.portfolio import Portfolio
 
 
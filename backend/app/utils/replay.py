@@ -0,0 +1,290 @@
+"""
+Offline replay of a historical order stream through matching and settlement.
+
+Places and cancels are read from the `orders` and `orders_archive` tables of a
+database (cancels are taken from CANCELLED limit orders at their updated_at) or
+from a CSV file, and applied in timestamp order via TradeService against a fresh in-memory SQLite
+store. No HTTP, WebSocket or event loop is involved, so the replay runs as
+fast as matching and settlement allow. Candles are built from the fills at the
+original event timestamps.
+
+    python -m app.utils.replay --db sqlite:///./stock_market.db --since 2024-05-01T09:00
+    python -m app.utils.replay --csv orders.csv --balance 1000000 --out report.json
+
+CSV columns: ts, action (PLACE | CANCEL), order_id, user_id, stock_id, side,
+order_type, quantity, price. CANCEL rows only need ts, action, order_id and
+user_id; order_id refers to the id of an earlier PLACE row.
+"""
+import argparse
+import csv
+import json
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.core.database import Base
+from app.models import Candle, ExecutedTrade, Order, OrderArchive, Portfolio, Stock, User
+from app.services.candle_service import CandleService
+from app.services.trade_service import TradeService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class ReplayEvent:
+    ts: datetime
+    action: str  # PLACE | CANCEL
+    order_id: int
+    user_id: int
+    stock_id: int = 0
+    side: str = ""
+    order_type: str = ""
+    quantity: int = 0
+    price: Optional[float] = None
+
+
+def load_events_from_db(
+    db: Session, since: Optional[datetime] = None, until: Optional[datetime] = None
+) -> list[ReplayEvent]:
+    events: list[ReplayEvent] = []
+    # Terminal orders may have been moved to the archive
+    for model in (OrderArchive, Order):
+        q = db.query(model)
+        if since is not None:
+            q = q.filter(model.created_at >= since)
+        if until is not None:
+            q = q.filter(model.created_at < until)
+
+        for o in q.order_by(model.created_at.asc(), model.id.asc()).yield_per(10_000):
+            events.append(
+                ReplayEvent(o.created_at, "PLACE", o.id, o.user_id, o.stock_id, o.side, o.order_type, o.quantity, o.price)
+            )
+            if o.status == "CANCELLED" and o.order_type == "LIMIT":
+                events.append(ReplayEvent(o.updated_at, "CANCEL", o.id, o.user_id, o.stock_id))
+
+    # Stable sort: a place always precedes its own cancel
+    events.sort(key=lambda e: (e.ts, e.action != "PLACE", e.order_id))
+    return events
+
+
+def load_events_from_csv(path: str) -> list[ReplayEvent]:
+    events: list[ReplayEvent] = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            action = row["action"].strip().upper()
+            event = ReplayEvent(
+                ts=datetime.fromisoformat(row["ts"]),
+                action=action,
+                order_id=int(row["order_id"]),
+                user_id=int(row["user_id"]),
+            )
+            if action == "PLACE":
+                event.stock_id = int(row["stock_id"])
+                event.side = row["side"].strip().upper()
+                event.order_type = row["order_type"].strip().upper()
+                event.quantity = int(row["quantity"])
+                event.price = float(row["price"]) if row.get("price") else None
+            events.append(event)
+    events.sort(key=lambda e: e.ts)
+    return events
+
+
+def create_replay_store():
+    """Fresh in-memory database with the full schema. Returns a session factory."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def seed_store(db: Session, events: list[ReplayEvent], balance: float, stocks: Optional[list[Stock]] = None) -> None:
+    """Create the stocks and users the stream refers to."""
+    stock_ids = {e.stock_id for e in events if e.action == "PLACE"}
+    by_id = {s.stock_id: s for s in stocks or []}
+    first_price = {}
+    for e in events:
+        if e.action == "PLACE" and e.price is not None:
+            first_price.setdefault(e.stock_id, e.price)
+
+    for stock_id in sorted(stock_ids):
+        src = by_id.get(stock_id)
+        price = first_price.get(stock_id, src.price if src else 100.0)
+        db.add(
+            Stock(
+                stock_id=stock_id,
+                name=src.name if src else f"Stock {stock_id}",
+                symbol=src.symbol if src else f"S{stock_id}",
+                price=price,
+                last_traded_price=price,
+                tick_size=src.tick_size if src else 0.01,
+            )
+        )
+
+    for user_id in sorted({e.user_id for e in events}):
+        db.add(
+            User(
+                user_id=user_id,
+                email=f"replay-{user_id}@tradesphere.internal",
+                password="",
+                balance=balance,
+                margin_held=0.0,
+                is_verified=True,
+            )
+        )
+    db.commit()
+
+
+def replay(db: Session, events: list[ReplayEvent]) -> dict:
+    """Apply events in order. Returns counters, the fills and the elapsed time."""
+    order_ids: dict[int, int] = {}  # source order id -> replay order id
+    fills: list[dict] = []
+    rejected: Counter = Counter()
+    placed = cancelled = 0
+
+    started = time.perf_counter()
+    for e in events:
+        try:
+            if e.action == "PLACE":
+                incoming, order_fills, _ = TradeService.place_order(
+                    db, e.user_id, e.stock_id, e.side, e.order_type, e.quantity, e.price
+                )
+                order_ids[e.order_id] = incoming.id
+                placed += 1
+                for f in order_fills:
+                    CandleService.update(db, e.stock_id, f.price, f.quantity, e.ts)
+                    fills.append(
+                        {
+                            "ts": e.ts.isoformat(),
+                            "stock_id": e.stock_id,
+                            "price": f.price,
+                            "quantity": f.quantity,
+                            "aggressor_side": f.aggressor_side,
+                            "source_order_id": e.order_id,
+                        }
+                    )
+                if order_fills:
+                    db.commit()
+            elif e.action == "CANCEL":
+                replay_id = order_ids.get(e.order_id)
+                if replay_id is None:
+                    rejected["Unknown order"] += 1
+                    continue
+                TradeService.cancel_order(db, user_id=e.user_id, order_id=replay_id)
+                cancelled += 1
+        except HTTPException as exc:
+            db.rollback()
+            rejected[str(exc.detail)] += 1
+    elapsed = time.perf_counter() - started
+
+    return {
+        "events": len(events),
+        "placed": placed,
+        "cancelled": cancelled,
+        "rejected": dict(rejected),
+        "fills": fills,
+        "elapsed_s": elapsed,
+    }
+
+
+def collect_results(db: Session) -> dict:
+    candles = [
+        {
+            "stock_id": c.stock_id,
+            "resolution": c.resolution,
+            "open_time": c.open_time.isoformat(),
+            "open": c.open,
+            "high": c.high,
+            "low": c.low,
+            "close": c.close,
+            "volume": c.volume,
+        }
+        for c in db.query(Candle).order_by(Candle.stock_id, Candle.resolution, Candle.open_time)
+    ]
+    positions = [
+        {
+            "user_id": p.user_id,
+            "stock_id": p.stock_id,
+            "quantity": p.quantity,
+            "avg_entry_price": p.avg_entry_price,
+            "margin_held": p.margin_held,
+        }
+        for p in db.query(Portfolio).filter(Portfolio.quantity != 0).order_by(Portfolio.user_id, Portfolio.stock_id)
+    ]
+    balances = {user_id: balance for user_id, balance in db.query(User.user_id, User.balance)}
+    return {"candles": candles, "positions": positions, "balances": balances}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--db", default=None, help="source database URL (default: DATABASE_URL)")
+    source.add_argument("--csv", default=None, help="CSV order stream")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--balance", type=float, default=50_000.0, help="starting cash for every user")
+    parser.add_argument("--out", default=None, help="write fills, candles and final positions as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    source_stocks: list[Stock] = []
+    source_fills = None
+    if args.csv:
+        events = load_events_from_csv(args.csv)
+    else:
+        source_engine = create_engine(args.db or settings.DATABASE_URL)
+        src = sessionmaker(bind=source_engine)()
+        try:
+            events = load_events_from_db(src, args.since, args.until)
+            source_stocks = src.query(Stock).all()
+            src.expunge_all()
+            q = src.query(func.count(ExecutedTrade.id), func.coalesce(func.sum(ExecutedTrade.quantity), 0))
+            if args.since is not None:
+                q = q.filter(ExecutedTrade.timestamp >= args.since)
+            if args.until is not None:
+                q = q.filter(ExecutedTrade.timestamp < args.until)
+            count, volume = q.one()
+            source_fills = {"fills": int(count), "volume": int(volume)}
+        finally:
+            src.close()
+            source_engine.dispose()
+
+    store = create_replay_store()
+    db = store()
+    try:
+        seed_store(db, events, args.balance, source_stocks)
+        result = replay(db, events)
+        collected = collect_results(db)
+    finally:
+        db.close()
+
+    fills = result.pop("fills")
+    elapsed = result.pop("elapsed_s")
+    summary = {
+        **result,
+        "fills": len(fills),
+        "fill_volume": sum(f["quantity"] for f in fills),
+        "candles": len(collected["candles"]),
+        "open_positions": len(collected["positions"]),
+        "elapsed_s": round(elapsed, 3),
+        "events_per_s": round(len(events) / elapsed) if elapsed > 0 else None,
+    }
+    if source_fills is not None:
+        summary["source"] = source_fills
+    print(json.dumps(summary, indent=2))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"summary": summary, "fills": fills, **collected}, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
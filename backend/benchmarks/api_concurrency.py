@@ -0,0 +1,175 @@
+"""
+Benchmark how many requests sync and async handlers keep waiting on the database.
+
+Both routes do one user lookup for the bearer token and return the user:
+
+  sync    GET /balance   def handler, sync Session (runs on the threadpool)
+  async   GET /auth/me   async def handler, AsyncSession (aiosqlite)
+
+The app runs in-process behind httpx's ASGI transport against a temporary
+SQLite database, with --concurrency clients issuing --requests requests per
+case. Every statement sleeps --db-latency-ms in its connection's thread,
+standing in for the round trip to a networked database, and the peak number
+of statements waiting at once is reported. Sync handlers stop at the
+threadpool size (40 by default); async ones are bounded by --concurrency.
+
+The client shares the process (and the GIL) with the app, so ops/s is also
+capped by CPU; the gap shows once latency x threadpool size is the tighter
+limit (e.g. 250ms: the sync case cannot pass 40 / 0.25s = 160 ops/s).
+
+    python -m benchmarks.api_concurrency --concurrency 200 --requests 2000 --db-latency-ms 250
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import sqlalchemy
+
+
+class StatementLatency:
+    """sqlite3 trace callback: sleep per statement and track how many wait at once."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.waiting = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, statement: str) -> None:
+        with self._lock:
+            self.waiting += 1
+            self.peak = max(self.peak, self.waiting)
+        time.sleep(self.seconds)
+        with self._lock:
+            self.waiting -= 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.peak = self.waiting
+
+
+def _install(latency: StatementLatency) -> None:
+    """Trace every new connection of the sync and async engines."""
+    from sqlalchemy import event
+
+    from app.core.database import async_engine, engine
+
+    @event.listens_for(engine, "connect")
+    def _sync_connect(dbapi_connection, connection_record):
+        dbapi_connection.set_trace_callback(latency)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _async_connect(dbapi_connection, connection_record):
+        dbapi_connection.run_async(lambda conn: conn.set_trace_callback(latency))
+
+
+def _seed(users: int) -> list[dict]:
+    """Create the schema and verified users. Returns one auth header per user."""
+    from app.core.database import Base, SessionLocal, engine
+    from app.core.security import create_access_token
+    from app.models import User
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        emails = [f"bench{i}@example.com" for i in range(users)]
+        db.add_all(User(email=email, password="x", is_verified=True) for email in emails)
+        db.commit()
+    finally:
+        db.close()
+    engine.dispose()  # later connections are opened with the latency hook
+    return [{"Authorization": "Bearer " + create_access_token({"sub": email})} for email in emails]
+
+
+async def _run_case(client, path: str, headers: list[dict], requests: int, concurrency: int) -> tuple[list[int], float]:
+    latencies: list[int] = []
+    next_request = iter(range(requests))
+
+    async def worker() -> None:
+        for i in next_request:
+            start = time.perf_counter_ns()
+            response = await client.get(path, headers=headers[i % len(headers)])
+            latencies.append(time.perf_counter_ns() - start)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+async def run(args: argparse.Namespace, headers: list[dict], latency: StatementLatency) -> dict:
+    import anyio.to_thread
+    import httpx
+
+    from app.core.engines import db_engines
+    from app.main import app
+    from benchmarks.matching import summarize
+
+    results = {"threadpool_threads": int(anyio.to_thread.current_default_thread_limiter().total_tokens)}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for case, path in (("sync", "/balance"), ("async", "/auth/me")):
+            await _run_case(client, path, headers, min(args.requests, args.concurrency), args.concurrency)  # warm up
+            latency.reset()
+            latencies, elapsed = await _run_case(client, path, headers, args.requests, args.concurrency)
+            results[case] = {"path": path, **summarize(latencies, elapsed), "peak_waiting_on_db": latency.peak}
+    results["pools"] = db_engines.stats()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200, help="clients with a request in flight")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per case")
+    parser.add_argument("--db-latency-ms", type=float, default=250.0, help="added to every statement")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--label", default="", help="free-form tag stored with the results, e.g. a release")
+    parser.add_argument("--out", default=None, help="write results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as path:
+        # Settings are read when app.core.database is first imported
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(path, 'bench.db')}"
+        os.environ["ASYNC_DATABASE_URL"] = ""
+        # Enough sync connections that the threadpool, not the pool, is the limit
+        os.environ["DB_API_POOL_SIZE"] = str(args.concurrency)
+        os.environ["DB_API_MAX_OVERFLOW"] = "0"
+        os.environ.setdefault("MAIL_FROM", "bench@example.com")
+        os.environ.setdefault("MOCK_EMAIL", "true")
+
+        headers = _seed(args.users)
+        latency = StatementLatency(args.db_latency_ms / 1000)
+        _install(latency)
+
+        results = {
+            "label": args.label,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "config": {
+                "concurrency": args.concurrency,
+                "requests": args.requests,
+                "db_latency_ms": args.db_latency_ms,
+                "users": args.users,
+            },
+            "results": asyncio.run(run(args, headers, latency)),
+        }
+
+        from app.core.engines import db_engines
+
+        asyncio.run(db_engines.dispose())
+
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
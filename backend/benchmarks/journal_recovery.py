@@ -0,0 +1,103 @@
+"""
+Measure order-journal recovery time.
+
+Writes N journal records (accepts, fills and cancels spread over several
+stocks) to a temporary directory, then times a cold OrderJournal.recover().
+
+    python -m benchmarks.journal_recovery --entries 1000000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from app.services.order_book import OrderBook
+from app.services.order_journal import ACCEPT, CANCEL, FILL, RESET, OrderJournal, apply_record
+
+
+def write_journal(path: str, entries: int, stocks: int, snapshot_every: int, seed: int) -> int:
+    rng = random.Random(seed)
+    journal = OrderJournal(path, snapshot_every=snapshot_every)
+    resting: dict[int, list[list[int]]] = {stock_id: [] for stock_id in range(1, stocks + 1)}
+    books = {stock_id: OrderBook(stock_id) for stock_id in resting}
+    for stock_id in resting:
+        journal.append(stock_id, [(RESET, 0.01)])
+
+    written = stocks
+    next_order_id = 1
+    batch = 1000
+    while written < entries:
+        stock_id = rng.randint(1, stocks)
+        book = resting[stock_id]
+        records = []
+        for _ in range(min(batch, entries - written)):
+            roll = rng.random()
+            if book and roll < 0.3:
+                order = book[rng.randrange(len(book))]
+                qty = rng.randint(1, order[2])
+                order[2] -= qty
+                records.append((FILL, order[0], qty))
+                if order[2] == 0:
+                    book.remove(order)
+            elif book and roll < 0.45:
+                order = book.pop(rng.randrange(len(book)))
+                records.append((CANCEL, order[0]))
+            else:
+                side = rng.randint(0, 1)
+                price = 10_000 + rng.randint(-200, 200) + (100 if side else -100)
+                qty = rng.randint(1, 100)
+                book.append([next_order_id, side, qty])
+                records.append((ACCEPT, next_order_id, rng.randint(1, 500), side, price, qty))
+                next_order_id += 1
+        seq = journal.append(stock_id, records)
+        written += len(records)
+
+        # Mirror the live writer: keep a real book so snapshots can be taken
+        for rec_type, *fields in records:
+            apply_record(books[stock_id], rec_type, tuple(fields))
+        if journal.snapshot_due(stock_id):
+            journal.snapshot(books[stock_id], seq)
+    journal.close()
+    return sum(len(book) for book in resting.values())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--stocks", type=int, default=20)
+    parser.add_argument("--snapshot-every", type=int, default=10**12, help="records per stock between snapshots (default: never)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as path:
+        started = time.perf_counter()
+        expected_resting = write_journal(path, args.entries, args.stocks, args.snapshot_every, args.seed)
+        write_s = time.perf_counter() - started
+        size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+        started = time.perf_counter()
+        books = OrderJournal(path).recover()
+        recover_s = time.perf_counter() - started
+
+    resting = sum(len(book.orders) for book in books.values())
+    assert resting == expected_resting, f"recovered {resting} resting orders, expected {expected_resting}"
+    print(
+        json.dumps(
+            {
+                "entries": args.entries,
+                "stocks": args.stocks,
+                "journal_bytes": size,
+                "write_s": round(write_s, 3),
+                "recover_s": round(recover_s, 3),
+                "recover_entries_per_s": round(args.entries / recover_s),
+                "resting_orders": resting,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Benchmark matching, settlement and candle aggregation on real databases.
+
+Runs a seeded synthetic order flow (benchmarks.orderflow) against a fresh
+store per database and case, and reports throughput and per-call latency for:
+
+  match          MatchingEngine.match alone (order rows inserted, no settlement)
+  place_order    TradeService.place_order (match + settlement + commit)
+  cancel_order   TradeService.cancel_order for the flow's cancels
+  candle_update  CandleService.update + commit for every fill of the run above
+
+    python -m benchmarks.matching --orders 20000 --out bench.json
+    python -m benchmarks.matching --db sqlite --db postgresql://localhost/tradesphere_bench
+    python -m benchmarks.matching --out new.json --compare bench.json --tolerance 0.15
+
+"sqlite" uses a temporary database file. A Postgres URL must point at a
+database you can create schemas in; each run works in its own schema and drops
+it afterwards. With --compare, any case whose ops/s fell by more than
+--tolerance against the baseline file is reported and the exit code is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterator
+
+import sqlalchemy
+from fastapi import HTTPException
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.database import Base
+from app.models import Order
+from app.services.account_cache import account_cache
+from app.services.candle_service import CandleService
+from app.services.matching_engine import MatchingEngine, order_books
+from app.services.trade_service import TradeService
+from app.utils.replay import ReplayEvent, seed_store
+
+from benchmarks.orderflow import OrderFlow, OrderFlowConfig, generate
+
+BALANCE = 1_000_000_000.0  # large enough that settlement never rejects on cash
+
+
+@contextmanager
+def open_store(url: str) -> Iterator[sessionmaker]:
+    """Yield a session factory bound to an empty schema; remove it on exit."""
+    if url == "sqlite":
+        with tempfile.TemporaryDirectory() as path:
+            engine = create_engine(
+                f"sqlite:///{os.path.join(path, 'bench.db')}", connect_args={"check_same_thread": False}
+            )
+            try:
+                Base.metadata.create_all(bind=engine)
+                yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            finally:
+                engine.dispose()
+        return
+
+    schema = f"bench_{uuid.uuid4().hex[:12]}"
+    engine = create_engine(url, connect_args={"options": f"-csearch_path={schema}"})
+    with engine.begin() as conn:
+        conn.execute(text(f'CREATE SCHEMA "{schema}"'))
+    try:
+        Base.metadata.create_all(bind=engine)
+        yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    finally:
+        engine.dispose()
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP SCHEMA "{schema}" CASCADE'))
+        engine.dispose()
+
+
+def summarize(latencies_ns: list[int], elapsed_s: float) -> dict:
+    ordered = sorted(latencies_ns)
+
+    def pct(p: float) -> float | None:
+        if not ordered:
+            return None
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] / 1000, 1)
+
+    return {
+        "ops": len(ordered),
+        "elapsed_s": round(elapsed_s, 4),
+        "ops_per_s": round(len(ordered) / elapsed_s) if elapsed_s > 0 else None,
+        "p50_us": pct(0.50),
+        "p95_us": pct(0.95),
+        "p99_us": pct(0.99),
+        "max_us": pct(1.0),
+    }
+
+
+def _reset_books(flow: OrderFlow) -> None:
+    for stock_id in {e.stock_id for e in flow.seed_events}:
+        order_books.invalidate(stock_id)
+    account_cache.clear()
+
+
+def _prepare(db: Session, flow: OrderFlow) -> dict[int, int]:
+    """Seed stocks, users and the resting book. Returns flow order id -> row id."""
+    seed_store(db, flow.seed_events + flow.events, BALANCE)
+    _reset_books(flow)
+    order_ids: dict[int, int] = {}
+    for e in flow.seed_events:
+        incoming, _, _ = TradeService.place_order(db, e.user_id, e.stock_id, e.side, e.order_type, e.quantity, e.price)
+        order_ids[e.order_id] = incoming.id
+    return order_ids
+
+
+def _cancel(db: Session, e: ReplayEvent, order_ids: dict[int, int]) -> bool:
+    order_id = order_ids.get(e.order_id)
+    if order_id is None:
+        return False
+    try:
+        TradeService.cancel_order(db, user_id=e.user_id, order_id=order_id)
+    except HTTPException:
+        db.rollback()  # already filled or cancelled
+        return False
+    return True
+
+
+def bench_match(db: Session, flow: OrderFlow) -> dict:
+    order_ids = _prepare(db, flow)
+    latencies: list[int] = []
+    clock = time.perf_counter_ns
+
+    for e in flow.events:
+        if e.action == "CANCEL":
+            _cancel(db, e, order_ids)
+            continue
+        with order_books.lock(e.stock_id):
+            incoming = Order(
+                user_id=e.user_id,
+                stock_id=e.stock_id,
+                side=e.side,
+                order_type=e.order_type,
+                quantity=e.quantity,
+                remaining_qty=e.quantity,
+                price=e.price,
+                status="OPEN",
+            )
+            db.add(incoming)
+            db.flush()
+            started = clock()
+            MatchingEngine.match(db, incoming)
+            latencies.append(clock() - started)
+            db.commit()
+        order_ids[e.order_id] = incoming.id
+
+    return {"match": summarize(latencies, sum(latencies) / 1e9)}
+
+
+def bench_place_order(db: Session, flow: OrderFlow) -> tuple[dict, list[tuple]]:
+    """Returns the place/cancel results and the fills as (stock_id, price, qty, ts)."""
+    order_ids = _prepare(db, flow)
+    place: list[int] = []
+    cancel: list[int] = []
+    rejected = 0
+    trades: list[tuple] = []
+    clock = time.perf_counter_ns
+
+    for e in flow.events:
+        started = clock()
+        if e.action == "CANCEL":
+            if _cancel(db, e, order_ids):
+                cancel.append(clock() - started)
+            continue
+        try:
+            incoming, fills, _ = TradeService.place_order(
+                db, e.user_id, e.stock_id, e.side, e.order_type, e.quantity, e.price
+            )
+        except HTTPException:
+            db.rollback()
+            rejected += 1
+            continue
+        place.append(clock() - started)
+        order_ids[e.order_id] = incoming.id
+        trades.extend((e.stock_id, f.price, f.quantity, e.ts) for f in fills)
+
+    results = {
+        "place_order": {**summarize(place, sum(place) / 1e9), "fills": len(trades), "rejected": rejected},
+        "cancel_order": summarize(cancel, sum(cancel) / 1e9),
+    }
+    return results, trades
+
+
+def bench_candle_update(db: Session, flow: OrderFlow, trades: list[tuple]) -> dict:
+    seed_store(db, flow.seed_events + flow.events, BALANCE)
+    latencies: list[int] = []
+    clock = time.perf_counter_ns
+    for stock_id, price, qty, ts in trades:
+        started = clock()
+        CandleService.update(db, stock_id, price, qty, ts)
+        db.commit()
+        latencies.append(clock() - started)
+    return {"candle_update": summarize(latencies, sum(latencies) / 1e9)}
+
+
+@contextmanager
+def fresh_session(url: str, flow: OrderFlow) -> Iterator[Session]:
+    """A session on an empty store, with the process-wide books dropped afterwards."""
+    with open_store(url) as store:
+        db = store()
+        try:
+            yield db
+        finally:
+            db.close()
+            _reset_books(flow)
+
+
+def run_database(url: str, flow: OrderFlow) -> dict:
+    results: dict = {}
+    with fresh_session(url, flow) as db:
+        results.update(bench_match(db, flow))
+    with fresh_session(url, flow) as db:
+        placed, trades = bench_place_order(db, flow)
+        results.update(placed)
+    with fresh_session(url, flow) as db:
+        results.update(bench_candle_update(db, flow, trades))
+    return results
+
+
+def db_label(url: str) -> str:
+    return "sqlite" if url == "sqlite" else sqlalchemy.engine.make_url(url).get_backend_name()
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Cases whose ops/s dropped by more than tolerance against baseline."""
+    regressions = []
+    for db, cases in results["results"].items():
+        for case, stats in cases.items():
+            before = baseline.get("results", {}).get(db, {}).get(case, {}).get("ops_per_s")
+            after = stats.get("ops_per_s")
+            if before and after is not None and after < before * (1 - tolerance):
+                regressions.append(f"{db}/{case}: {after} ops/s vs {before} baseline ({after / before - 1:+.1%})")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", action="append", default=None, help='"sqlite" or a Postgres URL (repeatable)')
+    parser.add_argument("--symbols", type=int, default=OrderFlowConfig.symbols)
+    parser.add_argument("--depth", type=int, default=OrderFlowConfig.depth)
+    parser.add_argument("--orders", type=int, default=OrderFlowConfig.orders)
+    parser.add_argument("--market-ratio", type=float, default=OrderFlowConfig.market_ratio)
+    parser.add_argument("--cancel-ratio", type=float, default=OrderFlowConfig.cancel_ratio)
+    parser.add_argument("--users", type=int, default=OrderFlowConfig.users)
+    parser.add_argument("--seed", type=int, default=OrderFlowConfig.seed)
+    parser.add_argument("--label", default="", help="free-form tag stored with the results, e.g. a release")
+    parser.add_argument("--out", default=None, help="write results as JSON")
+    parser.add_argument("--compare", default=None, help="baseline results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed ops/s drop against --compare")
+    args = parser.parse_args()
+
+    config = OrderFlowConfig(
+        symbols=args.symbols,
+        depth=args.depth,
+        orders=args.orders,
+        market_ratio=args.market_ratio,
+        cancel_ratio=args.cancel_ratio,
+        users=args.users,
+        seed=args.seed,
+    )
+    flow = generate(config)
+
+    results = {
+        "label": args.label,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "config": config.to_dict(),
+        "results": {db_label(url): run_database(url, flow) for url in args.db or ["sqlite"]},
+    }
+    print(json.dumps(results, indent=2))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Seeded synthetic order flow for benchmarks.
+
+A flow is a list of ReplayEvent (the same events app.utils.replay applies): a
+seeding phase that rests `depth` limit orders per side on every symbol,
+followed by `orders` events mixing MARKET and LIMIT places with cancels of
+earlier resting orders. The same config and seed always produce the same
+events, so runs are comparable across releases.
+"""
+import random
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+
+from app.utils.replay import ReplayEvent
+
+START_TS = datetime(2024, 1, 2, 9, 30)
+
+
+@dataclass(frozen=True)
+class OrderFlowConfig:
+    symbols: int = 5
+    depth: int = 20  # resting price levels per side seeded before the flow
+    orders: int = 5_000  # events after seeding (places and cancels)
+    market_ratio: float = 0.2  # share of places that are MARKET orders
+    cancel_ratio: float = 0.2  # share of events that cancel an earlier resting order
+    users: int = 50
+    mid_price: float = 100.0
+    tick_size: float = 0.01
+    max_qty: int = 100
+    seed: int = 42
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class OrderFlow:
+    seed_events: list[ReplayEvent]
+    events: list[ReplayEvent]
+
+
+def generate(config: OrderFlowConfig) -> OrderFlow:
+    """Build the seeding events and the timed flow for config."""
+    rng = random.Random(config.seed)
+    next_order_id = 1
+    ts = START_TS
+    resting: list[ReplayEvent] = []  # limit places that may still rest (fills are not tracked)
+
+    def place(stock_id: int, side: str, order_type: str, price_ticks: int | None) -> ReplayEvent:
+        nonlocal next_order_id
+        event = ReplayEvent(
+            ts=ts,
+            action="PLACE",
+            order_id=next_order_id,
+            user_id=rng.randint(1, config.users),
+            stock_id=stock_id,
+            side=side,
+            order_type=order_type,
+            quantity=rng.randint(1, config.max_qty),
+            price=round(price_ticks * config.tick_size, 8) if price_ticks is not None else None,
+        )
+        next_order_id += 1
+        if order_type == "LIMIT":
+            resting.append(event)
+        return event
+
+    mid = round(config.mid_price / config.tick_size)
+    symbols = range(1, config.symbols + 1)
+
+    seed_events: list[ReplayEvent] = []
+    for stock_id in symbols:
+        for level in range(1, config.depth + 1):
+            seed_events.append(place(stock_id, "BUY", "LIMIT", mid - level))
+            seed_events.append(place(stock_id, "SELL", "LIMIT", mid + level))
+
+    events: list[ReplayEvent] = []
+    spread = max(config.depth, 1)
+    for _ in range(config.orders):
+        ts += timedelta(milliseconds=rng.randint(1, 50))
+        if resting and rng.random() < config.cancel_ratio:
+            target = resting.pop(rng.randrange(len(resting)))
+            events.append(ReplayEvent(ts=ts, action="CANCEL", order_id=target.order_id, user_id=target.user_id))
+            continue
+
+        stock_id = rng.choice(symbols)
+        side = rng.choice(("BUY", "SELL"))
+        if rng.random() < config.market_ratio:
+            events.append(place(stock_id, side, "MARKET", None))
+            continue
+        # Mostly passive, sometimes crossing a few levels
+        offset = rng.randint(-spread // 4, spread)
+        price_ticks = mid - offset if side == "BUY" else mid + offset
+        events.append(place(stock_id, side, "LIMIT", max(price_ticks, 1)))
+
+    return OrderFlow(seed_events=seed_events, events=events)
@@ -0,0 +1,153 @@
+"""
+Benchmark WebSocket fan-out cost per event as the number of clients grows.
+
+Events go through the real hub (ws_hub.broadcast -> hub task -> client queues)
+to --clients subscribers, each drained by a sender loop like market_ws's that
+writes to an in-memory socket. Two ways of producing the frame are compared:
+
+  per_client  json.dumps of the event dict in every sender (WebSocket.send_json)
+  shared      the text encoded once by ws_hub.broadcast (WebSocket.send_text)
+
+Both cases include the hub's own work (topic lookup, one queue put per client),
+so the gap between them is the encoding saved. The default event is a
+book_delta changing --changes levels, the event sent for every book change.
+
+    python -m benchmarks.ws_fanout --clients 10 --clients 100 --clients 1000 --clients 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import time
+from datetime import datetime, timezone
+
+MODES = ("per_client", "shared")
+
+
+class NullSocket:
+    """Stands in for a client connection: counts what would be written."""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+
+    async def send_text(self, data: str) -> None:
+        self.frames += 1
+        self.bytes += len(data)
+
+    async def send_json(self, data: dict) -> None:
+        # What starlette's WebSocket.send_json does before sending text
+        await self.send_text(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+
+def book_event(stock_id: int, changes: int) -> dict:
+    return {
+        "type": "book_delta",
+        "stock_id": stock_id,
+        "seq": 1,
+        "changes": [
+            {"action": "update", "side": "bid", "price": round(150.0 - i * 0.05, 2), "quantity": 100 + i, "orders": 1 + i % 4}
+            for i in range(changes)
+        ],
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def tick_event(stock_id: int) -> dict:
+    return {
+        "type": "trade_tick",
+        "stock_id": stock_id,
+        "price": 150.05,
+        "quantity": 10,
+        "aggressor_side": "BUY",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+async def _sender(socket: NullSocket, queue: asyncio.Queue, mode: str, events: int) -> None:
+    for _ in range(events):
+        item = await queue.get()
+        if mode == "shared":
+            await socket.send_text(item.text)
+        else:
+            await socket.send_json(item.event)
+
+
+async def run_case(mode: str, clients: int, events: int, event: dict) -> dict:
+    from app.services import ws_hub
+
+    await ws_hub.init_hub(max_broadcast_queue_size=events + 1)
+    topic = ws_hub.topic(event["type"], event["stock_id"])
+    sockets = [NullSocket() for _ in range(clients)]
+    queues = [asyncio.Queue(maxsize=events + 1) for _ in range(clients)]  # no drops
+    for queue in queues:
+        ws_hub.register_client(queue, [topic])
+    senders = [asyncio.create_task(_sender(s, q, mode, events)) for s, q in zip(sockets, queues)]
+    try:
+        cpu_start, start = time.process_time(), time.perf_counter()
+        for _ in range(events):
+            await ws_hub.broadcast(event)
+            await asyncio.sleep(0)  # let the hub and senders keep up, as between real events
+        await asyncio.gather(*senders)
+        elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+    finally:
+        for queue in queues:
+            ws_hub.unregister_client(queue)
+        await ws_hub.shutdown_hub()
+        ws_hub.broadcast_queue = None
+
+    frames = sum(s.frames for s in sockets)
+    assert frames == clients * events, f"{frames} of {clients * events} frames sent"
+    return {
+        "frames": frames,
+        "frame_bytes": sockets[0].bytes // events,
+        "elapsed_s": round(elapsed, 4),
+        "cpu_s": round(cpu, 4),
+        "us_per_event": round(1e6 * elapsed / events, 1),
+        "us_per_frame": round(1e6 * elapsed / frames, 3),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    event = book_event(1, args.changes) if args.event == "book_delta" else tick_event(1)
+    results = {}
+    for clients in args.clients:
+        # Fewer events for many clients keeps each case to a similar number of frames
+        events = max(10, args.frames // clients)
+        case = {mode: await run_case(mode, clients, events, event) for mode in MODES}
+        case["events"] = events
+        case["speedup"] = round(case["per_client"]["elapsed_s"] / case["shared"]["elapsed_s"], 2)
+        results[str(clients)] = case
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, action="append", help="subscribed clients (repeatable)")
+    parser.add_argument("--frames", type=int, default=200_000, help="frames sent per case (events x clients)")
+    parser.add_argument("--event", choices=("book_delta", "trade_tick"), default="book_delta")
+    parser.add_argument("--changes", type=int, default=1, help="levels changed by a book_delta")
+    parser.add_argument("--label", default="", help="free-form tag stored with the results, e.g. a release")
+    parser.add_argument("--out", default=None, help="write results as JSON")
+    args = parser.parse_args()
+    args.clients = args.clients or [10, 100, 1000, 5000]
+
+    os.environ.setdefault("MAIL_FROM", "bench@example.com")
+    os.environ.setdefault("MOCK_EMAIL", "true")
+
+    results = {
+        "label": args.label,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {"frames": args.frames, "event": args.event, "changes": args.changes},
+        "results": asyncio.run(run(args)),
+    }
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
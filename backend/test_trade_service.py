@@ -1,9 +1,11 @@
 import logging
+from fastapi import HTTPException
 from app.core.database import SessionLocal
 from app.models.user import User
 from app.models.stock import Stock
 from app.models.portfolio import Portfolio
-from app.models.transaction import Transaction
+from app.models.order import Order
+from app.models.executed_trade import ExecutedTrade
 from app.schemas.trade import TradeRequest
 from app.services.trade_service import TradeService
 
@@ -26,6 +28,18 @@ def run_tests():
                 is_verified=True
             )
             db.add(user)
+
+        # Counterparty: prices only move when orders match, so someone has to quote
+        maker_email = "test_trade_service_maker@example.com"
+        maker = db.query(User).filter(User.email == maker_email).first()
+        if not maker:
+            maker = User(
+                email=maker_email,
+                password="dummy_password",
+                balance=100000.0,
+                is_verified=True
+            )
+            db.add(maker)
             
         test_stock_symbol = "TEST_TS"
         stock = db.query(Stock).filter(Stock.symbol == test_stock_symbol).first()
@@ -36,6 +50,7 @@ def run_tests():
         db.commit()
         db.refresh(user)
         db.refresh(stock)
+        db.refresh(maker)
         
         user_id = user.user_id
         stock_id = stock.stock_id
@@ -43,8 +58,9 @@ def run_tests():
         
         print(f"Initial State: User Balance=${user.balance}, Stock Price=${initial_price}")
         
-        # 2. Test BUY
+        # 2. Test BUY against a resting ask
         print("\n--- Testing BUY 10 shares ---")
+        TradeService.place_order(db, maker.user_id, stock_id, "SELL", "LIMIT", 10, 101.0)
         trade_req = TradeRequest(stock_id=stock_id, quantity=10)
         res = TradeService.execute_trade(db, user_id, trade_req, "BUY")
         
@@ -54,10 +70,11 @@ def run_tests():
         print(f"Post-Buy State: User Balance=${user.balance}, Stock Price=${stock.price}")
         
         assert user.balance < 100000.0, "Balance should have decreased"
-        assert stock.price > initial_price, "Stock price should have increased due to buy impact"
+        assert stock.price == 101.0, "Stock price should be the ask the buy filled against"
         
-        # 3. Test SELL
+        # 3. Test SELL into a resting bid
         print("\n--- Testing SELL 5 shares ---")
+        TradeService.place_order(db, maker.user_id, stock_id, "BUY", "LIMIT", 5, 99.0)
         trade_req_sell = TradeRequest(stock_id=stock_id, quantity=5)
         res_sell = TradeService.execute_trade(db, user_id, trade_req_sell, "SELL")
         
@@ -65,7 +82,64 @@ def run_tests():
         db.refresh(user)
         print(f"Sell Result: {res_sell}")
         print(f"Post-Sell State: User Balance=${user.balance}, Stock Price=${stock.price}")
-        
+
+        assert stock.price == 99.0, "Stock price should be the bid the sell filled against"
+
+        # 4. Test holds for a resting LIMIT BUY: price x remaining, released by amend and cancel
+        print("\n--- Testing LIMIT BUY hold, amend and cancel ---")
+        held_before = user.reserved_cash
+        order, _, _ = TradeService.place_order(db, user_id, stock_id, "BUY", "LIMIT", 10, 90.0)
+        db.refresh(user)
+        print(f"Resting BUY 10 @ 90: Reserved=${user.reserved_cash}")
+        assert user.reserved_cash == held_before + 900.0, "A resting buy should hold price x remaining"
+
+        TradeService.amend_order(db, user_id, order.id, 4)
+        db.refresh(user)
+        print(f"Amended to 4: Reserved=${user.reserved_cash}")
+        assert user.reserved_cash == held_before + 360.0, "Amend should release the reduced quantity"
+
+        TradeService.cancel_order(db, user_id, order.id)
+        db.refresh(user)
+        print(f"Cancelled: Reserved=${user.reserved_cash}")
+        assert user.reserved_cash == held_before, "Cancel should release the whole hold"
+
+        # 5. Test short-sell holds: the long position covers the cheapest resting sells
+        print("\n--- Testing LIMIT SELL margin hold ---")
+        position = db.query(Portfolio).filter(Portfolio.user_id == user_id, Portfolio.stock_id == stock_id).first()
+        assert position.quantity == 5, "User should be long the 5 shares left after the sell"
+        covered, _, _ = TradeService.place_order(db, user_id, stock_id, "SELL", "LIMIT", 5, 200.0)
+        db.refresh(user)
+        db.refresh(position)
+        print(f"Resting SELL 5 @ 200: Reserved=${user.reserved_cash}, Margin=${position.reserved_margin}")
+        assert position.reserved_margin == 0.0, "Sells covered by the long position should hold nothing"
+        assert user.reserved_cash == held_before, "Covered sells should not reserve cash"
+
+        short, _, _ = TradeService.place_order(db, user_id, stock_id, "SELL", "LIMIT", 3, 210.0)
+        db.refresh(user)
+        db.refresh(position)
+        print(f"Resting SELL 3 @ 210: Reserved=${user.reserved_cash}, Margin=${position.reserved_margin}")
+        assert position.reserved_margin == 630.0, "Uncovered shares should hold their price as margin"
+        assert user.reserved_cash == held_before + 630.0, "Short margin should count against cash"
+
+        TradeService.cancel_order(db, user_id, short.id)
+        TradeService.cancel_order(db, user_id, covered.id)
+        db.refresh(user)
+        assert user.reserved_cash == held_before, "Cancelling the sells should release the margin"
+
+        # 6. Test that holds limit buying power: a second order beyond available cash is rejected
+        print("\n--- Testing orders beyond available cash ---")
+        quantity = int(user.available_cash * 0.6 // 50.0)
+        TradeService.place_order(db, user_id, stock_id, "BUY", "LIMIT", quantity, 50.0)
+        db.refresh(user)
+        print(f"Resting BUY {quantity} @ 50: Available=${user.available_cash}")
+        try:
+            TradeService.place_order(db, user_id, stock_id, "BUY", "LIMIT", quantity, 50.0)
+        except HTTPException as e:
+            print(f"Second order rejected: {e.detail}")
+            assert e.detail == "Insufficient available cash to hold this order", "Unexpected rejection"
+        else:
+            raise AssertionError("An order beyond available cash should be rejected")
+
         print("\nAll tests executed successfully. Trade logic is working.")
 
     except Exception as e:
@@ -73,11 +147,14 @@ def run_tests():
         db.rollback()
     finally:
         # Cleanup
-        if 'user' in locals() and user:
-            # Delete transactions and portfolio
-            db.query(Transaction).filter(Transaction.user_id == user.user_id).delete()
-            db.query(Portfolio).filter(Portfolio.user_id == user.user_id).delete()
-            db.query(User).filter(User.user_id == user.user_id).delete()
+        if 'user' in locals() and user and 'maker' in locals() and maker:
+            # Delete trades, orders and portfolio
+            user_ids = [user.user_id, maker.user_id]
+            stock_ids = [s.stock_id for s in db.query(Stock).filter(Stock.symbol == "TEST_TS")]
+            db.query(ExecutedTrade).filter(ExecutedTrade.stock_id.in_(stock_ids)).delete()
+            db.query(Order).filter(Order.user_id.in_(user_ids)).delete()
+            db.query(Portfolio).filter(Portfolio.user_id.in_(user_ids)).delete()
+            db.query(User).filter(User.user_id.in_(user_ids)).delete()
             db.query(Stock).filter(Stock.symbol == "TEST_TS").delete()
             db.commit()
         db.close()
@@ -2,11 +2,30 @@ import { useState, useEffect, useRef, useCallback } from 'react'
 import { Terminal } from 'lucide-react'
 import axios from 'axios'
 import { API_BASE_URL, WS_BASE_URL } from '../utils/axiosAuthSetup'
+import { auth } from '../utils/auth'
 import TradingStockList from './TradingStockList'
 import TradingOrderPanel from './TradingOrderPanel'
 import TradingChartModal from './TradingChartModal'
 import CandleChart from './CandleChart'
 
+// Resolutions the backend streams candle_update events for
+const LIVE_CANDLE_RESOLUTIONS = ['1m', '5m', '1h']
+
+// Apply a book_delta's level changes; sides stay sorted best price first
+function applyBookDelta(book, changes) {
+  const next = { bids: book?.bids ?? [], asks: book?.asks ?? [] }
+  changes.forEach((change) => {
+    const key = change.side === 'bid' ? 'bids' : 'asks'
+    const levels = next[key].filter((level) => level.price !== change.price)
+    if (change.action !== 'delete') {
+      levels.push({ price: change.price, quantity: change.quantity, orders: change.orders })
+    }
+    levels.sort((a, b) => (key === 'bids' ? b.price - a.price : a.price - b.price))
+    next[key] = levels
+  })
+  return next
+}
+
 function Trading({ user, updateBalance }) {
   const [stocks, setStocks] = useState([])
   const [portfolio, setPortfolio] = useState([])
@@ -30,6 +49,9 @@ function Trading({ user, updateBalance }) {
   const socketRef = useRef(null)
   const selectedStockRef = useRef(null)
   const candleResolutionRef = useRef('5m')
+  const updateBalanceRef = useRef(updateBalance)
+  const fetchDataRef = useRef(null)
+  const bookSeqRef = useRef(null) // seq of the streamed book shown, null until its snapshot arrives
 
   const handleSocketEvent = useCallback((event) => {
     try {
@@ -99,10 +121,37 @@ function Trading({ user, updateBalance }) {
       }
 
       if (event.type === 'book_snapshot' && selectedStockRef.current?.stock_id === event.stock_id) {
+        bookSeqRef.current = event.seq
         setOrderBook({ bids: event.bids, asks: event.asks })
         return
       }
 
+      if (event.type === 'book_delta' && selectedStockRef.current?.stock_id === event.stock_id) {
+        const seq = bookSeqRef.current
+        // Deltas before the snapshot are already in it
+        if (seq === null || event.seq <= seq) return
+        if (event.seq !== seq + 1) {
+          // Missed a delta: ask for a fresh snapshot and ignore deltas until it arrives
+          bookSeqRef.current = null
+          socketRef.current?.send(JSON.stringify({ action: 'snapshot', channel: 'book_delta', stock_id: event.stock_id }))
+          return
+        }
+        bookSeqRef.current = event.seq
+        setOrderBook((prev) => applyBookDelta(prev, event.changes))
+        return
+      }
+
+      // Private events of the logged-in user (authenticated socket)
+      if (event.type === 'balance_update') {
+        updateBalanceRef.current?.(event.balance)
+        return
+      }
+
+      if (event.type === 'fill') {
+        fetchDataRef.current?.(false)
+        return
+      }
+
       if (event.type === 'trade_tick') {
         setStocks((prev) => prev.map((stock) => {
           if (stock.stock_id !== event.stock_id) return stock
@@ -132,14 +181,25 @@ function Trading({ user, updateBalance }) {
     candleResolutionRef.current = candleResolution
   }, [candleResolution])
 
+  useEffect(() => {
+    updateBalanceRef.current = updateBalance
+  }, [updateBalance])
+
   useEffect(() => {
     if (!user?.user_id) return
 
     try {
-      const socket = new WebSocket(`${WS_BASE_URL}/ws/market`)
+      // The token authenticates the socket for this user's order, fill and balance events
+      const token = auth.getToken()
+      const socket = new WebSocket(`${WS_BASE_URL}/ws/market${token ? `?token=${encodeURIComponent(token)}` : ''}`)
       socketRef.current = socket
 
-      socket.addEventListener('open', () => setSocketStatus('connected'))
+      socket.addEventListener('open', () => {
+        // Prices and trades of every stock feed the stock list
+        socket.send(JSON.stringify({ action: 'subscribe', channel: 'price_update' }))
+        socket.send(JSON.stringify({ action: 'subscribe', channel: 'trade_tick' }))
+        setSocketStatus('connected')
+      })
       socket.addEventListener('close', () => setSocketStatus('disconnected'))
       socket.addEventListener('error', () => setSocketStatus('error'))
 
@@ -165,13 +225,44 @@ function Trading({ user, updateBalance }) {
     }
   }, [user?.user_id])
 
+  // Book deltas only for the selected stock; subscribing sends its snapshot first
+  useEffect(() => {
+    const socket = socketRef.current
+    if (socketStatus !== 'connected' || !socket || !selectedStockId) return
+
+    const topic = { channel: 'book_delta', stock_id: selectedStockId }
+    socket.send(JSON.stringify({ action: 'subscribe', ...topic }))
+
+    return () => {
+      bookSeqRef.current = null
+      if (socket.readyState !== WebSocket.OPEN) return
+      socket.send(JSON.stringify({ action: 'unsubscribe', ...topic }))
+    }
+  }, [socketStatus, selectedStockId])
+
+  // Candle events only for the selected stock and resolution
+  useEffect(() => {
+    const socket = socketRef.current
+    if (socketStatus !== 'connected' || !socket || !selectedStockId) return
+    if (!LIVE_CANDLE_RESOLUTIONS.includes(candleResolution)) return
+
+    const topic = { channel: 'candle_update', stock_id: selectedStockId, resolution: candleResolution }
+    socket.send(JSON.stringify({ action: 'subscribe', ...topic }))
+
+    return () => {
+      if (socket.readyState !== WebSocket.OPEN) return
+      socket.send(JSON.stringify({ action: 'unsubscribe', ...topic }))
+    }
+  }, [socketStatus, selectedStockId, candleResolution])
+
   const fetchOrderBook = useCallback(async (stockId) => {
     try {
       const response = await axios.get(`${API_BASE_URL}/stocks/${stockId}/book`)
-      setOrderBook(response.data)
+      // The streamed book, once its snapshot is in, is newer than this response
+      if (bookSeqRef.current === null) setOrderBook(response.data)
     } catch (error) {
       console.error('Error fetching order book:', error)
-      setOrderBook(null)
+      if (bookSeqRef.current === null) setOrderBook(null)
     }
   }, [])
 
@@ -260,6 +351,10 @@ function Trading({ user, updateBalance }) {
     }
   }, [])
 
+  useEffect(() => {
+    fetchDataRef.current = fetchData
+  }, [fetchData])
+
   useEffect(() => {
     if (!user?.user_id) return
 
@@ -460,8 +555,8 @@ function Trading({ user, updateBalance }) {
                             {Array.from({ length: 5 }).map((_, index) => {
                               const bid = orderBook.bids?.[index]
                               const ask = orderBook.asks?.[index]
-                              const bidMax = orderBook.bids?.length ? Math.max(...orderBook.bids.map((level) => level.quantity || 1)) : 1
-                              const askMax = orderBook.asks?.length ? Math.max(...orderBook.asks.map((level) => level.quantity || 1)) : 1
+                              const bidMax = orderBook.bids?.length ? Math.max(...orderBook.bids.slice(0, 5).map((level) => level.quantity || 1)) : 1
+                              const askMax = orderBook.asks?.length ? Math.max(...orderBook.asks.slice(0, 5).map((level) => level.quantity || 1)) : 1
                               const bidWidth = bid ? Math.min(100, Math.max(20, (bid.quantity / bidMax) * 100)) : 0
                               const askWidth = ask ? Math.min(100, Math.max(20, (ask.quantity / askMax) * 100)) : 0
                               return (